@@ -0,0 +1,64 @@
+'''
+Strong scaling of the parallel state evolution: steps per second of
+Network.run(engine='numba', parallel=True) for each network size and number
+of threads, and speedup with respect to a single thread.
+
+  python benchmarks/parallel_scaling.py --sizes 10000 100000 --threads 1 2 4 8
+'''
+
+import time
+import argparse
+import numba
+
+from socmodel.source.network import Network
+from socmodel.source.state import RandomState
+from socmodel.source.connectivity import RandomConnectivity
+
+
+def time_run (n, threads, evolution_steps, tau, degree, packed, seed):
+
+  numba.set_num_threads(threads)
+  p = degree / (2 * n)
+  net = Network(n=n, alpha=0.9, beta=5., tau=tau, sigma_init=RandomState(),
+                C_init=RandomConnectivity(pPlus=p, pMinus=p), seed=seed,
+                packed=packed, parallel=True)
+
+  # the first call compiles the kernels
+  net.run(evolution_steps=1, progressbar=False, engine='numba')
+
+  start = time.perf_counter()
+  net.run(evolution_steps=evolution_steps, progressbar=False, engine='numba')
+
+  return evolution_steps / (time.perf_counter() - start)
+
+
+def main ():
+
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+  parser.add_argument('--threads', type=int, nargs='+', default=None,
+                      help='numbers of threads (default: powers of 2 up to numba.config.NUMBA_NUM_THREADS)')
+  parser.add_argument('--steps', type=int, default=200, help='evolution steps of each run')
+  parser.add_argument('--tau', type=int, default=10)
+  parser.add_argument('--degree', type=float, default=10., help='initial mean number of links per neuron')
+  parser.add_argument('--packed', action='store_true', help='bit-packed state vector')
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+
+  threads = args.threads
+  if threads is None:
+    threads = [2**k for k in range(numba.config.NUMBA_NUM_THREADS.bit_length())]
+  threads = [t for t in threads if t <= numba.config.NUMBA_NUM_THREADS]
+
+  print(f'{"n":>10} {"threads":>8} {"steps/s":>10} {"speedup":>8}')
+
+  for n in args.sizes:
+    base = None
+    for t in threads:
+      rate = time_run(n, t, args.steps, args.tau, args.degree, args.packed, args.seed)
+      base = base or rate
+      print(f'{n:>10} {t:>8} {rate:>10.1f} {rate/base:>8.2f}')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,263 @@
+'''
+Benchmark suite of the simulation kernels and of full Network runs over a grid
+of sizes n, time scales tau and RandomConnectivity densities.
+Each benchmark records its throughput (calls or evolution steps per second,
+best of the repeats) and the peak memory traced while building and running
+it. The results can be saved as a JSON baseline and compared against a stored
+one: the script exits with status 1 if any throughput drops below
+(1 - tolerance) times the baseline, so it can gate dependency upgrades.
+
+  python benchmarks/run_benchmarks.py --preset quick --compare benchmarks/baselines/quick.json
+  python benchmarks/run_benchmarks.py --preset full --save results.json
+'''
+
+import sys
+import json
+import time
+import argparse
+import platform
+import itertools
+import tracemalloc
+import numpy as np
+import numba
+
+from socmodel.source.network import Network
+from socmodel.source.state import RandomState
+from socmodel.source.connectivity import RandomConnectivity
+from socmodel.source.numbafunc import compute_signal
+from socmodel.source.numbafunc import compute_signal_dense
+from socmodel.source.numbafunc import update_state
+from socmodel.source.numbafunc import evolve_connectivity
+
+
+presets = {
+  'quick': dict(sizes=[100, 1000], taus=[1, 10], densities=[0.01, 0.1], steps=200),
+  'full':  dict(sizes=[100, 1000, 10000, 100000], taus=[1, 10, 100], densities=[0.001, 0.01, 0.1], steps=1000),
+}
+
+# largest number of links of a benchmark network (above it the grid point is skipped)
+max_links = 5 * 10**7
+
+
+def make_network (n, tau, density, seed=0, **kwargs):
+
+  p = density / 2
+  return Network(n=n, alpha=0.9, beta=5., tau=tau, sigma_init=RandomState(),
+                 C_init=RandomConnectivity(pPlus=p, pMinus=p), seed=seed, **kwargs)
+
+
+def bench_construct (n, tau, density):
+
+  def call ():
+    make_network(n, tau, density)
+
+  return call
+
+
+def bench_compute_signal (n, tau, density):
+
+  net = make_network(n, tau, density)
+  C, sigma, signal = net.C, net.sigma.copy(), net.signal
+
+  def call ():
+    compute_signal(n=n, sigma=sigma, index=C.index, weight=C.weight, count=C.count, signal=signal)
+
+  return call
+
+
+def bench_compute_signal_dense (n, tau, density):
+
+  net = make_network(n, tau, density, backend='dense')
+  dense, sigma, signal = net.dense, net.sigma.copy(), net.signal
+
+  def call ():
+    compute_signal_dense(n=n, sigma=sigma, dense=dense, signal=signal)
+
+  return call
+
+
+def bench_update_state (n, tau, density):
+
+  net = make_network(n, tau, density)
+  sigma, signal, flips = net.sigma.copy(), net.signal, np.empty(0, dtype=np.int32)
+  prob = net._firing_probabilities()
+
+  def call ():
+    update_state(n=n, prob=prob, signal=signal, sigma=sigma, numActive=0, rng=net.rng, flips=flips)
+
+  return call
+
+
+def bench_link_mutation (n, tau, density):
+
+  net = make_network(n, tau, density)
+  C = net.C
+
+  def call ():
+    i, _, _, _ = evolve_connectivity(n=n, epsilon=net.epsilon, avgActivity=net.avgActivity,
+                                     index=C.index, weight=C.weight, count=C.count, dense=net.dense,
+                                     rng=net.rng)
+    C.reserve(i)
+
+  return call
+
+
+def bench_run (engine, **kwargs):
+
+  def bench (n, tau, density, steps):
+
+    net = make_network(n, tau, density, **kwargs)
+
+    def call ():
+      net.run(evolution_steps=steps, progressbar=False, engine=engine)
+
+    return call
+
+  return bench
+
+
+kernels = {
+  'construct'       : bench_construct,
+  'compute_signal'  : bench_compute_signal,
+  'compute_signal_dense' : bench_compute_signal_dense,
+  'update_state'    : bench_update_state,
+  'link_mutation'   : bench_link_mutation,
+}
+
+runs = {
+  'run_numba'             : bench_run('numba'),
+  'run_numba_incremental' : bench_run('numba', update='incremental'),
+  'run_numba_active'      : bench_run('numba', update='active'),
+  'run_numba_dense'       : bench_run('numba', backend='dense'),
+  'run_python'            : bench_run('python'),
+}
+
+
+def measure (setup, repeat, number):
+
+  '''
+  Time the callable built by setup and trace the peak memory of setup plus
+  one call (after a first untraced warm-up that compiles the kernels).
+  Return the best rate in calls per second and the peak memory in MB.
+  '''
+
+  setup()()
+
+  tracemalloc.start()
+  call = setup()
+  call()
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+
+  best = np.inf
+  for _ in range(repeat):
+    start = time.perf_counter()
+    for _ in range(number):
+      call()
+    best = min(best, (time.perf_counter() - start) / number)
+
+  return 1. / best, peak / 2**20
+
+
+def run_suite (sizes, taus, densities, steps, repeat=3, only=None):
+
+  results = {}
+
+  for n, tau, density in itertools.product(sizes, taus, densities):
+
+    if density * n * (n - 1) > max_links:
+      continue
+
+    key = f'n={n},tau={tau},density={density}'
+
+    for name, bench in itertools.chain(kernels.items(), runs.items()):
+
+      if only is not None and name not in only:
+        continue
+
+      # the python engine is only timed on small networks, and the kernels do not depend on tau
+      if name == 'run_python' and n * tau > 10**5:
+        continue
+      if name in kernels and tau != taus[0]:
+        continue
+      # the dense backend stores n^2 bytes
+      if 'dense' in name and n > Network.denseMaxN:
+        continue
+
+      if name in kernels:
+        setup = lambda: bench(n, tau, density)
+        rate, peak = measure(setup, repeat=repeat, number=max(1, 10**6 // (n * (1 + int(density*n)))))
+        unit = 'calls/s'
+      else:
+        run_steps = steps if name != 'run_python' else max(steps // 10, 1)
+        setup = lambda: bench(n, tau, density, run_steps)
+        rate, peak = measure(setup, repeat=repeat, number=1)
+        rate *= run_steps
+        unit = 'steps/s'
+
+      results[f'{name}[{key}]'] = {'rate': rate, 'unit': unit, 'peak_mb': peak}
+      print(f'{name:>22} {key:<32} {rate:>14.1f} {unit:<8} {peak:>10.1f} MB', flush=True)
+
+  return results
+
+
+def compare (results, baseline, tolerance):
+
+  '''
+  Print the ratio between the current and the baseline throughputs and return
+  the names of the benchmarks slower than (1 - tolerance) times the baseline.
+  '''
+
+  regressions = []
+  print(f'\n{"benchmark":<58} {"ratio":>8}')
+
+  for name, result in results.items():
+    if name not in baseline:
+      continue
+    ratio = result['rate'] / baseline[name]['rate']
+    flag = '' if ratio >= 1. - tolerance else '  REGRESSION'
+    print(f'{name:<58} {ratio:>8.2f}{flag}')
+    if flag:
+      regressions.append(name)
+
+  return regressions
+
+
+def main ():
+
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--preset', choices=list(presets), default='quick')
+  parser.add_argument('--sizes', type=int, nargs='+', default=None)
+  parser.add_argument('--taus', type=int, nargs='+', default=None)
+  parser.add_argument('--densities', type=float, nargs='+', default=None)
+  parser.add_argument('--steps', type=int, default=None, help='evolution steps of the full runs')
+  parser.add_argument('--repeat', type=int, default=3)
+  parser.add_argument('--only', nargs='+', default=None, help='names of the benchmarks to run')
+  parser.add_argument('--save', default=None, help='save the results to this JSON file')
+  parser.add_argument('--compare', default=None, help='baseline JSON file to compare against')
+  parser.add_argument('--tolerance', type=float, default=0.2)
+  args = parser.parse_args()
+
+  grid = dict(presets[args.preset])
+  for key in ('sizes', 'taus', 'densities', 'steps'):
+    if getattr(args, key) is not None:
+      grid[key] = getattr(args, key)
+
+  results = run_suite(**grid, repeat=args.repeat, only=args.only)
+
+  if args.save is not None:
+    meta = {'python': platform.python_version(), 'numpy': np.__version__,
+            'numba': numba.__version__, 'machine': platform.machine(),
+            'processor': platform.processor(), 'grid': grid}
+    with open(args.save, 'w') as file:
+      json.dump({'meta': meta, 'results': results}, file, indent=2)
+
+  if args.compare is not None:
+    with open(args.compare) as file:
+      baseline = json.load(file)['results']
+    if compare(results, baseline, args.tolerance):
+      sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,43 @@
+def warmup (parallel=True, ensemble=True):
+
+  '''
+  Compile, or load from the on-disk cache of Numba, the kernels used by the
+  runs of Network (every combination of update, packed, backend and engine) and of
+  NetworkEnsemble, by evolving tiny networks for a few steps. Calling it once
+  at the start of a process (e.g. of a worker of a process pool) moves the
+  compilation out of the first simulation; after the first call on a
+  machine, the kernels are only loaded from the cache (see NUMBA_CACHE_DIR).
+
+  Parameters
+  ----------
+    parallel : bool, default=True
+      Warm up the parallel kernels too
+
+    ensemble : bool, default=True
+      Warm up the kernels of NetworkEnsemble too
+  '''
+
+  # imported here, so that importing socmodel does not load Numba
+  from socmodel.source.state import RandomState
+  from socmodel.source.connectivity import RandomConnectivity
+  from socmodel.source.network import Network
+  from socmodel.source.ensemble import NetworkEnsemble
+
+  params = {'n': 8, 'alpha': 0.2, 'tau': 2, 'sigma_init': RandomState(),
+            'C_init': RandomConnectivity(pPlus=0.2, pMinus=0.2), 'seed': 0}
+
+  configurations = [(update, packed, False, 'sparse') for update in ('full', 'incremental') for packed in (False, True)]
+  configurations += [('active', False, False, 'sparse'), ('full', False, False, 'dense')]
+  if parallel:
+    configurations += [('full', packed, True, 'sparse') for packed in (False, True)]
+    configurations += [('full', False, True, 'dense')]
+
+  for update, packed, parallel, backend in configurations:
+    for engine in ('numba', 'python'):
+      net = Network(beta=5., update=update, packed=packed, parallel=parallel, backend=backend,
+                    **params)
+      net.run(evolution_steps=2, progressbar=False, engine=engine)
+
+  if ensemble:
+    net = NetworkEnsemble(betas=[5.], replicas=1, **params)
+    net.run(evolution_steps=2, progressbar=False)
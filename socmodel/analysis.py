@@ -1,23 +1,26 @@
 import numpy as np
-import matplotlib.pyplot as plt
-
-from tqdm import trange
-from scipy.special import factorial
-from scipy.optimize import curve_fit
 
 from socmodel.source.state import RandomState
 from socmodel.source.connectivity import RandomConnectivity
 from socmodel.source.network import Network
+from socmodel.source.ensemble import NetworkEnsemble
+from socmodel.sweep import sweep
 from socmodel.plotting import adjust_plot
 
 
 def plot_degree_distribution (savefig=False):
 
+  # the plotting and fitting dependencies are imported on use, so that importing this module
+  # (e.g. in a worker process) does not load them
+  import matplotlib.pyplot as plt
+  from scipy.special import factorial
+  from scipy.optimize import curve_fit
+
   socmodel = Network(n=2000, alpha=0.2, beta=10., tau=10)
   print(socmodel, flush=True)
   socmodel.run(evolution_steps=20000)
 
-  Kin = np.sum(np.abs(socmodel.C.toarray()), axis=0)
+  Kin = socmodel.degree_stats()['in']['degrees']
   mean_Kin = round(np.mean(Kin), 3)
   bins = np.arange(Kin.min() - 0.5, Kin.max() + 1.5)
 
@@ -45,23 +48,24 @@ def plot_degree_distribution (savefig=False):
 
 def plot_degree_convergence (savefig=False):
 
+  import matplotlib.pyplot as plt
+
   connectivity = [{'prob':0., 'col':'tab:blue'},
                   {'prob':0.002, 'col':'tab:orange'},
                   {'prob':0.004, 'col':'tab:green'}]
 
+  n = 1000
+  grid = {'C_init': [RandomConnectivity(pPlus=c['prob'], pMinus=c['prob']) for c in connectivity]}
+  records = sweep(grid, evolution_steps=30000, n=n, alpha=0.2, beta=10., tau=10)
+
   fig1, ax1 = plt.subplots(figsize=(8,6))
   fig2, ax2 = plt.subplots(figsize=(8,6))
 
-  for c in connectivity:
+  for c, record in zip(connectivity, records):
 
-    socmodel = Network(n=1000, alpha=0.2, beta=10., tau=10,
-                       C_init=RandomConnectivity(pPlus=c['prob'], pMinus=c['prob']))
-    print(socmodel, flush=True)
-    Kplus, Kminus, _ = socmodel.run(evolution_steps=30000)
-
-    k = c['prob'] * socmodel.n
-    ax1.plot(Kplus, color=c['col'], label=r'$\langle K_{+} \rangle ^{ini} \simeq$ ' + str(k))
-    ax2.plot(Kminus, color=c['col'], label=r'$\langle K_{-} \rangle ^{ini} \simeq$ ' + str(k))
+    k = c['prob'] * n
+    ax1.plot(record['Kplus'], color=c['col'], label=r'$\langle K_{+} \rangle ^{ini} \simeq$ ' + str(k))
+    ax2.plot(record['Kminus'], color=c['col'], label=r'$\langle K_{-} \rangle ^{ini} \simeq$ ' + str(k))
 
   ax1.set_xlabel('Evolution steps', fontsize=16)
   ax1.set_ylabel(r'In-degree $\langle K_{+} \rangle$', fontsize=16)
@@ -82,22 +86,20 @@ def plot_degree_convergence (savefig=False):
 
 def plot_degree_vs_beta (savefig=False):
 
+  import matplotlib.pyplot as plt
+
   betas = np.linspace(start=0., stop=20., num=60)
-  mean_Kplus = np.empty_like(betas)
-  std_Kplus = np.empty_like(betas)
-  mean_Kminus = np.empty_like(betas)
-  std_Kminus = np.empty_like(betas)
-
-  for i in trange(betas.size, desc='Running simulations'):
-
-    socmodel = Network(n=400, alpha=0.2, beta=betas[i], tau=10,
-                       sigma_init=RandomState(),
-                       C_init=RandomConnectivity(pPlus=0.005, pMinus=0.005))
-    Kplus, Kminus, _ = socmodel.run(evolution_steps=10000, progressbar=False)
-    mean_Kplus[i] = np.mean(Kplus[-1000:])
-    std_Kplus[i] = np.std(Kplus[-1000:])
-    mean_Kminus[i] = np.mean(Kminus[-1000:])
-    std_Kminus[i] = np.std(Kminus[-1000:])
+
+  ensemble = NetworkEnsemble(n=400, alpha=0.2, betas=betas, replicas=1, tau=10,
+                             sigma_init=RandomState(),
+                             C_init=RandomConnectivity(pPlus=0.005, pMinus=0.005))
+  print(ensemble, flush=True)
+  Kplus, Kminus, _ = ensemble.run(evolution_steps=10000)
+
+  mean_Kplus = np.mean(Kplus[:, 0, -1000:], axis=1)
+  std_Kplus = np.std(Kplus[:, 0, -1000:], axis=1)
+  mean_Kminus = np.mean(Kminus[:, 0, -1000:], axis=1)
+  std_Kminus = np.std(Kminus[:, 0, -1000:], axis=1)
 
   fig1, ax1 = plt.subplots(figsize=(8,6))
   fig2, ax2 = plt.subplots(figsize=(8,6))
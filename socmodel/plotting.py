@@ -1,9 +1,11 @@
 import numpy as np
-import pylab as plt
 
 
 def show_simulation (Kplus, Kminus, branchPar, savefig=False):
 
+  # imported on use, so that importing this module does not load matplotlib
+  import pylab as plt
+
   fig, ax = plt.subplots(figsize=(8,6))
 
   x = np.arange(Kplus.size)
@@ -0,0 +1,171 @@
+import os
+import numpy as np
+from scipy import sparse
+
+from socmodel.source.numbafunc import count_columns
+from socmodel.source.numbafunc import transpose_links
+
+
+class AdjacencyList:
+
+  '''
+  Mutable sparse storage of the connectivity matrix.
+  Each row i of the matrix is stored in preallocated arrays together with its
+  number of links: the column indices are index[i,:count[i]] and the link
+  weights are weight[i,:count[i]]. Links are unordered inside a row, so they
+  can be inserted and removed in O(degree) time without touching other rows.
+
+  Parameters
+  ----------
+    n : int
+      Number of rows (and columns) of the connectivity matrix
+
+    capacity : int, default=8
+      Initial number of preallocated link slots per row.
+      It is always kept strictly greater than the largest row count (unless
+      it already equals n), so that a link can always be inserted in any row
+
+    dtype : numpy dtype, default=np.int8
+      Data type of the link weights
+
+    path : str, default=None
+      If given, index and weight are memory-mapped .npy files named
+      path + ".index.npy" and path + ".weight.npy" (overwritten if they
+      exist), so that they can be larger than the available memory
+  '''
+
+  def __init__ (self, n, capacity=8, dtype=np.int8, path=None):
+
+    self.n        = n
+    self.capacity = int(min(max(capacity, 1), n))
+    self.path     = path
+
+    self.index  = self._allocate('index', capacity=self.capacity, dtype=np.int32)
+    self.weight = self._allocate('weight', capacity=self.capacity, dtype=dtype)
+    self.count  = np.zeros(shape=n, dtype=np.int32)
+
+
+  def _allocate (self, name, capacity, dtype, suffix=''):
+
+    # zero-filled (n, capacity) array, memory-mapped if path is set
+    if self.path is None:
+      return np.zeros(shape=(self.n,capacity), dtype=dtype)
+
+    return np.lib.format.open_memmap(f'{self.path}.{name}{suffix}.npy', mode='w+', dtype=dtype,
+                                     shape=(self.n,capacity))
+
+
+  def __repr__ (self):
+
+    class_name = self.__class__.__qualname__
+    return f'{class_name}(n={self.n}, capacity={self.capacity}, nnz={self.nnz})'
+
+
+  @classmethod
+  def from_coo (cls, n, row, col, data, dtype=np.int8, path=None):
+
+    row = np.asarray(row, dtype=np.int64)
+    count = np.bincount(row, minlength=n).astype(np.int32)
+    adjacency = cls(n=n, capacity=int(count.max(initial=0)) + 1, dtype=dtype, path=path)
+
+    order = np.argsort(row, kind='stable')
+    offsets = np.cumsum(count) - count
+    slots = np.arange(row.size) - np.repeat(offsets, count)
+    adjacency.index[row[order], slots] = np.asarray(col)[order]
+    adjacency.weight[row[order], slots] = np.asarray(data)[order]
+    adjacency.count[:] = count
+
+    return adjacency
+
+
+  @classmethod
+  def from_dense (cls, matrix):
+
+    matrix = np.asarray(matrix)
+    row, col = np.nonzero(matrix)
+
+    return cls.from_coo(n=matrix.shape[0], row=row, col=col,
+                        data=matrix[row,col], dtype=matrix.dtype)
+
+
+  @property
+  def nnz (self):
+    return int(self.count.sum())
+
+
+  def grow (self, capacity=None):
+
+    if capacity is None:
+      capacity = 2 * self.capacity
+    capacity = int(min(capacity, self.n))
+
+    if capacity <= self.capacity:
+      return
+
+    # memory-mapped arrays are copied to new files, which then replace the old ones
+    index = self._allocate('index', capacity=capacity, dtype=self.index.dtype, suffix='.tmp')
+    weight = self._allocate('weight', capacity=capacity, dtype=self.weight.dtype, suffix='.tmp')
+    index[:, :self.capacity] = self.index
+    weight[:, :self.capacity] = self.weight
+
+    if self.path is not None:
+      for name in ('index', 'weight'):
+        os.replace(f'{self.path}.{name}.tmp.npy', f'{self.path}.{name}.npy')
+
+    self.index = index
+    self.weight = weight
+    self.capacity = capacity
+
+
+  def reserve (self, i):
+
+    '''
+    Make room for one more link in row i, growing the arrays if needed.
+    Return True if they were reallocated.
+    '''
+
+    if self.count[i] >= self.capacity:
+      self.grow()
+      return True
+
+    return False
+
+
+  def copy (self, path=None):
+
+    adjacency = AdjacencyList(n=self.n, capacity=self.capacity, dtype=self.weight.dtype, path=path)
+    adjacency.index[:]  = self.index
+    adjacency.weight[:] = self.weight
+    adjacency.count[:]  = self.count
+
+    return adjacency
+
+
+  def transpose (self, path=None):
+
+    # built row by row, without the sparse matrix of the links
+    columns = np.zeros(shape=self.n, dtype=np.int32)
+    count_columns(index=self.index, count=self.count, columns=columns)
+    adjacency = AdjacencyList(n=self.n, capacity=int(columns.max(initial=0)) + 1,
+                              dtype=self.weight.dtype, path=path)
+    transpose_links(index=self.index, weight=self.weight, count=self.count,
+                    outIndex=adjacency.index, outWeight=adjacency.weight, outCount=adjacency.count)
+
+    return adjacency
+
+
+  def tocoo (self):
+
+    mask = np.arange(self.capacity) < self.count[:, None]
+    row = np.repeat(np.arange(self.n, dtype=np.int32), self.count)
+
+    return sparse.coo_matrix((self.weight[mask], (row, self.index[mask])),
+                             shape=(self.n,self.n))
+
+
+  def tocsr (self):
+    return self.tocoo().tocsr()
+
+
+  def toarray (self):
+    return self.tocoo().toarray()
@@ -0,0 +1,127 @@
+import numpy as np
+
+from socmodel.source.numbafunc import detect_avalanches
+
+
+class AvalancheDetector ():
+
+  '''
+  Online detector of neuronal avalanches, fed with the number of active
+  neurons of each substep of the state evolution (see Network.run).
+  An avalanche is a maximal run of consecutive substeps with more than
+  threshold active neurons: its duration is the number of substeps and its
+  size is the sum of the active neurons in excess of threshold.
+  Sizes and durations are accumulated in log2-binned histograms (bin k holds
+  the values in [2^k, 2^(k+1))) together with the sufficient statistics of
+  the power-law exponents, so the memory footprint does not depend on the
+  length of the run.
+
+  Parameters
+  ----------
+    threshold : int, default=0
+      Number of active neurons at or below which the network is considered
+      quiescent
+
+    xmin : int, default=1
+      Lower cutoff of the sizes and durations used to estimate the exponents
+  '''
+
+  bins = 64
+
+  def __init__ (self, threshold=0, xmin=1):
+
+    if not threshold >= 0:
+      raise ValueError('Invalid "threshold" passed. "threshold" must be greater or equal than 0.')
+
+    if not xmin >= 1:
+      raise ValueError('Invalid "xmin" passed. "xmin" must be greater or equal than 1.')
+
+    self.threshold = int(threshold)
+    self.xmin = int(xmin)
+
+    # size and duration of the avalanche in progress
+    self.state = np.zeros(2, dtype=np.int64)
+    self.sizeHist = np.zeros(self.bins, dtype=np.int64)
+    self.durationHist = np.zeros(self.bins, dtype=np.int64)
+    # number and sum of the logarithms of the sizes and of the durations >= xmin
+    self.moments = np.zeros(4, dtype=np.float64)
+
+
+  def __repr__ (self):
+    class_name = self.__class__.__qualname__
+    return f'{class_name}(threshold={self.threshold}, xmin={self.xmin}, avalanches={self.count})'
+
+
+  @property
+  def count (self):
+    return int(self.sizeHist.sum())
+
+
+  def update (self, activity):
+
+    '''
+    Feed the detector with the number of active neurons of consecutive
+    substeps. An avalanche still in progress at the end of the array is
+    completed by the following calls.
+
+    Parameters
+    ----------
+      activity : array_like of int
+        Number of active neurons of each substep
+    '''
+
+    activity = np.ascontiguousarray(activity, dtype=np.int64)
+    detect_avalanches(activity=activity, threshold=self.threshold, xmin=self.xmin,
+                      state=self.state, sizeHist=self.sizeHist,
+                      durationHist=self.durationHist, moments=self.moments)
+
+
+  def histograms (self):
+
+    '''
+    Return the histograms of the completed avalanches.
+
+    Returns
+    -------
+      edges : array of length 65
+        Bin edges, 2^k for k = 0, ..., 64
+
+      sizes : array of length 64
+        Number of avalanches with size in each bin
+
+      durations : array of length 64
+        Number of avalanches with duration in each bin
+    '''
+
+    edges = 2.**np.arange(self.bins + 1)
+    return edges, self.sizeHist.copy(), self.durationHist.copy()
+
+
+  def exponents (self):
+
+    '''
+    Estimate the exponents of the power laws P(x) ~ x^-a of the sizes and
+    of the durations >= xmin with the maximum likelihood estimator of
+    discrete data (Clauset et al., 2009)
+
+      a = 1 + N / sum_i ln(x_i / (xmin - 1/2))
+
+    with standard error (a - 1) / sqrt(N).
+
+    Returns
+    -------
+      dict with the keys "size" and "duration", each holding the tuple
+      (exponent, standard error), both nan if there are no avalanches
+    '''
+
+    shift = np.log(self.xmin - 0.5)
+    result = {}
+
+    for key, (N, sumLog) in zip(('size', 'duration'), self.moments.reshape(2, 2)):
+      if N > 0:
+        a = 1. + N / (sumLog - N * shift)
+        result[key] = (a, (a - 1.) / np.sqrt(N))
+      else:
+        result[key] = (np.nan, np.nan)
+
+    return result
@@ -1,12 +1,31 @@
 import numpy as np
 
+from socmodel.source.numbafunc import barabasi_albert
+
 
 class BaseConnectivity ():
 
   '''
   Base class for connectivity matrix initialization.
+  Subclasses implement get(shape, rng=None) and draw random numbers from rng
+  only, never from the global NumPy state. Subclasses whose matrices are
+  sparse also override get_sparse(n, rng=None), so that large networks are
+  initialized without building the dense matrix.
   '''
 
+  def get_sparse (self, n, rng=None):
+
+    '''
+    Return the nonzero elements of an n x n connectivity matrix as the arrays
+    (row, col, data), sorted by row and then by column.
+    The default implementation builds the dense matrix with get.
+    '''
+
+    connectivity = self.get(shape=(n,n), rng=rng)
+    row, col = np.nonzero(connectivity)
+
+    return row.astype(np.int32), col.astype(np.int32), connectivity[row,col]
+
 
 class ZerosConnectivity (BaseConnectivity):
 
@@ -18,9 +37,12 @@ class ZerosConnectivity (BaseConnectivity):
   def __init__ (self):
     super(ZerosConnectivity, self).__init__()
 
-  def get (self, shape):
+  def get (self, shape, rng=None):
     return np.zeros(shape=shape, dtype=np.int8)
 
+  def get_sparse (self, n, rng=None):
+    return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int8)
+
 
 class OnesConnectivity (BaseConnectivity):
 
@@ -34,7 +56,7 @@ class OnesConnectivity (BaseConnectivity):
     self.negative = negative
     super(OnesConnectivity, self).__init__()
 
-  def get (self, shape):
+  def get (self, shape, rng=None):
     connectivity = np.ones(shape=shape, dtype=np.int8)
     np.fill_diagonal(connectivity, val=0)
     return connectivity if not self.negative else -connectivity
@@ -46,6 +68,10 @@ class RandomConnectivity (BaseConnectivity):
   Initialize randomly the connectivity matrix with 1s, -1s (or 0s) according
   to their link creation probabilities.
   It corresponds to the generation of a directed random network with no loops.
+  get_sparse draws the numbers of positive and negative links from the
+  multinomial distribution over the n(n-1) off-diagonal elements and their
+  positions without replacement, so the matrix is built in O(nnz) time and
+  memory (with a different random stream than get).
   '''
 
   def __init__ (self, pPlus=0.5, pMinus=0.5):
@@ -53,9 +79,288 @@ class RandomConnectivity (BaseConnectivity):
     self.pMinus = pMinus
     super(RandomConnectivity, self).__init__()
 
-  def get (self, shape):
+  def get (self, shape, rng=None):
+    rng = np.random.default_rng(rng)
     pZero = 1. - (self.pPlus + self.pMinus)
-    connectivity = (np.random.choice([-1,0,1], size=shape,
-                                     p=[self.pMinus,pZero,self.pPlus])).astype(np.int8)
+    connectivity = (rng.choice([-1,0,1], size=shape,
+                               p=[self.pMinus,pZero,self.pPlus])).astype(np.int8)
     np.fill_diagonal(connectivity, val=0)
     return connectivity
+
+  def get_sparse (self, n, rng=None):
+
+    rng = np.random.default_rng(rng)
+    pZero = max(1. - (self.pPlus + self.pMinus), 0.)
+    positions = n * (n - 1)
+    numPlus, numMinus, _ = rng.multinomial(positions, [self.pPlus, self.pMinus, pZero])
+
+    # the positions are drawn in random order, so the first numPlus links are the positive ones
+    k = rng.choice(positions, size=numPlus+numMinus, replace=False)
+    data = np.ones(k.size, dtype=np.int8)
+    data[numPlus:] = -1
+
+    # the off-diagonal position k is in row i = k // (n-1) and, skipping the diagonal, in
+    # column k % (n-1) (+1 if it is not smaller than i): sorting k sorts by row and column
+    order = np.argsort(k)
+    k, data = k[order], data[order]
+    row = k // max(n - 1, 1)
+    col = k % max(n - 1, 1)
+    col += (col >= row)
+
+    return row.astype(np.int32), col.astype(np.int32), data
+
+
+class SparseConnectivity (BaseConnectivity):
+
+  '''
+  Base class of the initializers defined by a list of links, built directly
+  in sparse form (see BaseConnectivity.get_sparse).
+  Subclasses implement _links(n, rng), returning the rows and columns of the
+  links: self-loops and repeated links are dropped, and each link is
+  negative with probability pMinus (positive otherwise).
+
+  Parameters
+  ----------
+    pMinus : float, default=0.
+      Probability that a link is negative
+  '''
+
+  def __init__ (self, pMinus=0.):
+
+    if not 0. <= pMinus <= 1.:
+      raise ValueError('Invalid "pMinus" passed. "pMinus" must be a float in [0,1].')
+
+    self.pMinus = pMinus
+    super(SparseConnectivity, self).__init__()
+
+  def get (self, shape, rng=None):
+    row, col, data = self.get_sparse(n=shape[0], rng=rng)
+    connectivity = np.zeros(shape=shape, dtype=np.int8)
+    connectivity[row,col] = data
+    return connectivity
+
+  def get_sparse (self, n, rng=None):
+    rng = np.random.default_rng(rng)
+    row, col = self._links(n=n, rng=rng)
+    row, col = _unique_links(n, row, col)
+    data = np.where(rng.random(row.size) < self.pMinus, -1, 1).astype(np.int8)
+    return row, col, data
+
+
+def _unique_links (n, row, col):
+
+  # drop the self-loops and the repeated links, sorting by row and column
+  row = np.asarray(row, dtype=np.int64)
+  col = np.asarray(col, dtype=np.int64)
+  key = np.unique(row[row != col] * n + col[row != col])
+  return (key // max(n, 1)).astype(np.int32), (key % max(n, 1)).astype(np.int32)
+
+
+class LatticeConnectivity (SparseConnectivity):
+
+  '''
+  Initialize the connectivity matrix as a 2D square lattice: the n neurons
+  are placed on a grid with width columns and each of them is linked, in
+  both directions, to its 4 nearest neighbours.
+
+  Parameters
+  ----------
+    width : int, default=None
+      Number of columns of the grid, which must divide n
+      (default: the integer square root of n)
+
+    periodic : bool, default=True
+      Periodic boundary conditions
+
+    pMinus : float, default=0.
+      Probability that a link is negative
+  '''
+
+  def __init__ (self, width=None, periodic=True, pMinus=0.):
+    self.width = width
+    self.periodic = periodic
+    super(LatticeConnectivity, self).__init__(pMinus=pMinus)
+
+  def _links (self, n, rng):
+
+    width = self.width if self.width is not None else int(np.sqrt(n))
+    if not width >= 1 or n % width != 0:
+      raise ValueError(f'Invalid "width" passed. "width" must divide n = {n}.')
+
+    height = n // width
+    r, c = np.divmod(np.arange(n), width)
+    rows, cols = [], []
+
+    for dr, dc in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
+      nr, nc = r + dr, c + dc
+      if self.periodic:
+        nr, nc = nr % height, nc % width
+        inside = np.ones(n, dtype=bool)
+      else:
+        inside = (nr >= 0) & (nr < height) & (nc >= 0) & (nc < width)
+      rows.append(np.arange(n)[inside])
+      cols.append((nr * width + nc)[inside])
+
+    return np.concatenate(rows), np.concatenate(cols)
+
+
+class WattsStrogatzConnectivity (SparseConnectivity):
+
+  '''
+  Initialize the connectivity matrix as a Watts-Strogatz small-world
+  network: the neurons are placed on a ring and each of them is linked to
+  its k nearest neighbours (k/2 on each side), then the column of each link
+  is rewired with probability p to a uniformly drawn neuron, avoiding
+  self-loops and repeated links.
+
+  Parameters
+  ----------
+    k : int, default=4
+      Number of links of each neuron on the ring (even)
+
+    p : float, default=0.1
+      Rewiring probability
+
+    pMinus : float, default=0.
+      Probability that a link is negative
+  '''
+
+  def __init__ (self, k=4, p=0.1, pMinus=0.):
+
+    if not (k >= 2 and k % 2 == 0):
+      raise ValueError('Invalid "k" passed. "k" must be an even int greater or equal than 2.')
+
+    if not 0. <= p <= 1.:
+      raise ValueError('Invalid "p" passed. "p" must be a float in [0,1].')
+
+    self.k = k
+    self.p = p
+    super(WattsStrogatzConnectivity, self).__init__(pMinus=pMinus)
+
+  def _links (self, n, rng):
+
+    if not self.k < n - 1:
+      raise ValueError(f'Invalid "k" passed. "k" must be smaller than n - 1 = {n - 1}.')
+
+    offsets = np.concatenate([np.arange(1, self.k // 2 + 1), -np.arange(1, self.k // 2 + 1)])
+    row = np.repeat(np.arange(n, dtype=np.int64), offsets.size)
+    col = (row + np.tile(offsets, n)) % n
+
+    # redraw the rewired columns until none of them is a self-loop or a repeated link
+    fixed = rng.random(row.size) >= self.p
+    todo = np.flatnonzero(~fixed)
+
+    while todo.size > 0:
+      col[todo] = rng.integers(0, n, size=todo.size)
+      key = row * n + col
+      order = np.lexsort((~fixed, key))
+      repeated = np.zeros(row.size, dtype=bool)
+      repeated[order[1:]] = key[order[1:]] == key[order[:-1]]
+      bad = (row[todo] == col[todo]) | repeated[todo]
+      fixed[todo[~bad]] = True
+      todo = todo[bad]
+
+    return row, col
+
+
+class BarabasiAlbertConnectivity (SparseConnectivity):
+
+  '''
+  Initialize the connectivity matrix as a Barabasi-Albert scale-free
+  network: the neurons are added one at a time, each of them linked to m
+  distinct older neurons chosen with probability proportional to their
+  degree. The links are set in both directions.
+
+  Parameters
+  ----------
+    m : int, default=2
+      Number of links of each added neuron
+
+    pMinus : float, default=0.
+      Probability that a link is negative
+  '''
+
+  def __init__ (self, m=2, pMinus=0.):
+
+    if not m >= 1:
+      raise ValueError('Invalid "m" passed. "m" must be greater or equal than 1.')
+
+    self.m = m
+    super(BarabasiAlbertConnectivity, self).__init__(pMinus=pMinus)
+
+  def _links (self, n, rng):
+
+    if not self.m < n:
+      raise ValueError(f'Invalid "m" passed. "m" must be smaller than n = {n}.')
+
+    src, dst = barabasi_albert(n, self.m, rng)
+    return np.concatenate([src, dst]), np.concatenate([dst, src])
+
+
+class EdgeListConnectivity (SparseConnectivity):
+
+  '''
+  Initialize the connectivity matrix from a list of links C[row,col] != 0,
+  given as arrays or loaded from a .npz file (with the arrays "row", "col"
+  and optionally "data") or from a text file (one link per line, with the
+  columns row, col and optionally data).
+  The weights in data must be 1 or -1; without them, each link is negative
+  with probability pMinus.
+
+  Parameters
+  ----------
+    row, col : array_like of int, default=None
+      Rows and columns of the links
+
+    data : array_like of int, default=None
+      Weights of the links
+
+    path : str, default=None
+      Path of a .npz or text file, used instead of the arrays
+
+    pMinus : float, default=0.
+      Probability that a link is negative, if the weights are not given
+  '''
+
+  def __init__ (self, row=None, col=None, data=None, path=None, pMinus=0.):
+
+    if path is not None:
+      if str(path).endswith('.npz'):
+        with np.load(path) as file:
+          row, col = file['row'], file['col']
+          data = file['data'] if 'data' in file else None
+      else:
+        edges = np.loadtxt(path, dtype=np.int64, ndmin=2)
+        row, col = edges[:,0], edges[:,1]
+        data = edges[:,2] if edges.shape[1] > 2 else None
+
+    if row is None or col is None or np.shape(row) != np.shape(col):
+      raise ValueError('Invalid "row" and "col" passed. They must be arrays of the same length.')
+
+    if data is not None and (np.shape(data) != np.shape(row) or not np.isin(data, (-1, 1)).all()):
+      raise ValueError('Invalid "data" passed. "data" must be an array of 1s and -1s like "row".')
+
+    self.row = np.asarray(row, dtype=np.int64)
+    self.col = np.asarray(col, dtype=np.int64)
+    self.data = np.asarray(data, dtype=np.int8) if data is not None else None
+    super(EdgeListConnectivity, self).__init__(pMinus=pMinus)
+
+  def _links (self, n, rng):
+
+    if self.row.size > 0 and not (min(self.row.min(), self.col.min()) >= 0 and
+                                  max(self.row.max(), self.col.max()) < n):
+      raise ValueError(f'Invalid "row" and "col" passed. The indices must be in [0,{n}).')
+
+    return self.row, self.col
+
+  def get_sparse (self, n, rng=None):
+
+    if self.data is None:
+      return super(EdgeListConnectivity, self).get_sparse(n=n, rng=rng)
+
+    # keep the weight of the first occurrence of each link
+    self._links(n=n, rng=rng)
+    valid = self.row != self.col
+    key, first = np.unique(self.row[valid] * n + self.col[valid], return_index=True)
+
+    return (key // n).astype(np.int32), (key % n).astype(np.int32), self.data[valid][first]
@@ -0,0 +1,123 @@
+import numpy as np
+
+
+class StationarityCriterion ():
+
+  '''
+  Online stationarity test of the observables of a run (see
+  Network.run(until_converged=...)).
+  The evolution steps are split in consecutive windows of window steps, and
+  the mean and the variance of each observable are accumulated over each
+  window. The run is declared converged at the end of a window if, for
+  patience consecutive pairs of windows and for every observable, the
+  difference between the means of the two windows is at most
+  rtol * |mean| + atol.
+
+  Parameters
+  ----------
+    window : int, default=1000
+      Number of evolution steps of each window
+
+    rtol : float, default=0.01
+      Relative tolerance on the change of the windowed means
+
+    atol : float, default=1e-3
+      Absolute tolerance on the change of the windowed means
+
+    patience : int, default=2
+      Number of consecutive pairs of windows satisfying the criterion
+
+    observables : sequence of str, default=('Kplus', 'Kminus', 'branchPar')
+      Observables tested, among "Kplus", "Kminus", "branchPar" and "activity"
+  '''
+
+  def __init__ (self, window=1000, rtol=0.01, atol=1e-3, patience=2,
+                observables=('Kplus', 'Kminus', 'branchPar')):
+
+    if not window >= 1:
+      raise ValueError('Invalid "window" passed. "window" must be greater or equal than 1.')
+
+    if not (rtol >= 0. and atol >= 0.):
+      raise ValueError('Invalid "rtol" or "atol" passed. The tolerances must be greater or equal than 0.')
+
+    if not patience >= 1:
+      raise ValueError('Invalid "patience" passed. "patience" must be greater or equal than 1.')
+
+    if not set(observables) <= {'Kplus', 'Kminus', 'branchPar', 'activity'}:
+      raise ValueError('Invalid "observables" passed. They must be "Kplus", "Kminus", "branchPar" or "activity".')
+
+    self.window = int(window)
+    self.rtol = rtol
+    self.atol = atol
+    self.patience = int(patience)
+    self.observables = tuple(observables)
+    self.reset()
+
+
+  def __repr__ (self):
+    class_name = self.__class__.__qualname__
+    return (f'{class_name}(window={self.window}, rtol={self.rtol}, atol={self.atol}, '
+            f'patience={self.patience}, observables={self.observables})')
+
+
+  def reset (self):
+
+    '''
+    Forget the accumulated windows, before a new run.
+    '''
+
+    # sums of the values and of their squares over the current window
+    self.sums = np.zeros(shape=(2,len(self.observables)), dtype=np.float64)
+    self.steps = 0
+    self.passed = 0
+    self.converged = None
+    # mean and variance of each observable over each completed window
+    self.means = []
+    self.variances = []
+
+
+  def update (self, chunk):
+
+    '''
+    Accumulate the observables of a chunk of consecutive evolution steps.
+    Return True once the criterion holds: converged then holds the number of
+    steps, counted from the last reset, at the end of the window where the
+    criterion was first met.
+
+    Parameters
+    ----------
+      chunk : dict of arrays
+        Observables of each step of the chunk (see BaseRecorder.record)
+    '''
+
+    values = np.stack([np.asarray(chunk[key], dtype=np.float64) for key in self.observables])
+    start = 0
+
+    while start < values.shape[1] and self.converged is None:
+
+      stop = min(start + self.window - self.steps % self.window, values.shape[1])
+      self.sums[0] += values[:,start:stop].sum(axis=1)
+      self.sums[1] += (values[:,start:stop]**2).sum(axis=1)
+      self.steps += stop - start
+      start = stop
+
+      if self.steps % self.window == 0:
+        self._close_window()
+
+    return self.converged is not None
+
+
+  def _close_window (self):
+
+    mean = self.sums[0] / self.window
+    self.means.append(mean)
+    self.variances.append(np.maximum(self.sums[1] / self.window - mean**2, 0.))
+    self.sums[:] = 0.
+
+    if len(self.means) >= 2:
+      previous = self.means[-2]
+      stationary = np.abs(mean - previous) <= self.rtol * np.abs(previous) + self.atol
+      self.passed = self.passed + 1 if stationary.all() else 0
+
+    if self.passed >= self.patience:
+      self.converged = self.steps
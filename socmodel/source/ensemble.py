@@ -0,0 +1,226 @@
+import numpy as np
+from tqdm import tqdm
+
+from socmodel.source.state import ZerosState
+from socmodel.source.connectivity import ZerosConnectivity
+from socmodel.source.adjacency import AdjacencyList
+from socmodel.source.numbafunc import firing_probabilities
+from socmodel.source.numbafunc import evolve_ensemble
+from socmodel.source.numbafunc import compute_branching_par
+
+
+class NetworkEnsemble:
+
+  '''
+  Collection of independent Network replicas evolved together: the state
+  vectors, the average activities and the adjacency lists of all the replicas
+  are stored in stacked arrays and advanced step by step inside a single
+  compiled kernel, so the Python overhead is paid once for the whole ensemble.
+
+  Parameters
+  ----------
+    n : int
+      Size of each replica (number of neurons).
+      It must be greater or equal than 1
+
+    alpha : float
+      Temporal memory of the model.
+      It must be between 0 (no memory) and 1 (full memory)
+
+    betas : array-like of float
+      Inverse temperatures of the model: the ensemble contains `replicas`
+      networks for each of them.
+      They must be greater or equal than 0
+
+    replicas : int
+      Number of independent replicas for each value of beta.
+      It must be greater or equal than 1
+
+    tau : int
+      Number of steps for the evolution time scale.
+      It must be greater of equal than 1
+
+    sigma_init : BaseState, default=ZerosState()
+      State vector initializer (applied to each replica)
+
+    C_init : BaseConnectivity, default=ZerosConnectivity()
+      Connectivity matrix initializer (applied to each replica)
+
+    seed : int, SeedSequence or Generator, default=None
+      Seed of the random number generator shared by all the replicas
+  '''
+
+  def __init__ (self, n, alpha, betas, replicas, tau,
+                sigma_init=ZerosState(), C_init=ZerosConnectivity(), seed=None):
+
+    self.n          = n
+    self.alpha      = alpha
+    self.betas      = np.asarray(betas, dtype=np.float64).ravel()
+    self.replicas   = replicas
+    self.tau        = tau
+    self.sigma_init = sigma_init
+    self.C_init     = C_init
+    self.seed       = seed
+
+    self._check_parameters()
+    self._set_initial_conditions()
+
+
+  def __repr__ (self):
+
+    class_name = self.__class__.__qualname__
+    params = list(self.__init__.__code__.co_varnames)
+    params.remove('self')
+    args = ', '.join([f'{key}={getattr(self, key)}' for key in params])
+
+    return f'{class_name}({args})'
+
+
+  def __len__ (self):
+    return self.betas.size * self.replicas
+
+
+  def _check_parameters (self):
+
+    if not np.issubdtype(type(self.n), int):
+      raise TypeError('Invalid "n" passed. "n" must be an int.')
+
+    if not self.n >= 1:
+      raise ValueError('Invalid "n" passed. "n" must be greater or equal than 1.')
+
+    if not 0. <= self.alpha <= 1.:
+      raise ValueError('Invalid "alpha" passed. "alpha" must be a float in [0,1].')
+
+    if not self.betas.size >= 1:
+      raise ValueError('Invalid "betas" passed. "betas" must contain at least one value.')
+
+    if not (self.betas >= 0.).all():
+      raise ValueError('Invalid "betas" passed. "betas" must be floats greater or equal that 0.')
+
+    if not np.issubdtype(type(self.replicas), int):
+      raise TypeError('Invalid "replicas" passed. "replicas" must be an int.')
+
+    if not self.replicas >= 1:
+      raise ValueError('Invalid "replicas" passed. "replicas" must be greater or equal that 1.')
+
+    if not np.issubdtype(type(self.tau), int):
+      raise TypeError('Invalid "tau" passed. "tau" must be an int.')
+
+    if not self.tau >= 1:
+      raise ValueError('Invalid "tau" passed. "tau" must be greater or equal that 1.')
+
+
+  def _set_initial_conditions (self):
+
+    size = len(self)
+    self.rng = np.random.default_rng(self.seed)
+    self.sigma = np.empty(shape=(size,self.n), dtype=np.int8)
+    adjacencies = []
+
+    for r in range(size):
+      self.sigma[r] = self.sigma_init.get(size=self.n, rng=self.rng)
+      row, col, data = self.C_init.get_sparse(n=self.n, rng=self.rng)
+      adjacencies.append(AdjacencyList.from_coo(n=self.n, row=row, col=col, data=data, dtype=np.int8))
+
+    capacity = max(adjacency.capacity for adjacency in adjacencies)
+    for adjacency in adjacencies:
+      adjacency.grow(capacity=capacity)
+
+    self.index = np.stack([adjacency.index for adjacency in adjacencies])
+    self.weight = np.stack([adjacency.weight for adjacency in adjacencies])
+    self.count = np.stack([adjacency.count for adjacency in adjacencies])
+    self.capacity = capacity
+    self._probKey = None
+
+    self.avgActivity = self.sigma.astype(np.float32)
+    self.epsilon = 1e-9
+
+    links = [adjacency.tocoo().data for adjacency in adjacencies]
+    self.linksPlus = np.array([np.sum(l == 1) for l in links], dtype=np.int64)
+    self.linksMinus = np.array([np.sum(l == -1) for l in links], dtype=np.int64)
+
+
+  def _grow (self):
+
+    capacity = min(2 * self.capacity, self.n)
+    pad = ((0,0), (0,0), (0,capacity - self.capacity))
+
+    self.index = np.pad(self.index, pad_width=pad)
+    self.weight = np.pad(self.weight, pad_width=pad)
+    self.capacity = capacity
+
+
+  def get_connectivity (self, b, r):
+
+    '''
+    Return the adjacency list of the r-th replica for the b-th value of beta
+    (a copy of the corresponding slice of the stacked arrays).
+    '''
+
+    k = b * self.replicas + r
+    adjacency = AdjacencyList(n=self.n, capacity=self.capacity, dtype=self.weight.dtype)
+    adjacency.index[:] = self.index[k]
+    adjacency.weight[:] = self.weight[k]
+    adjacency.count[:] = self.count[k]
+
+    return adjacency
+
+
+  def _firing_probabilities (self):
+
+    # firing probabilities of each replica (see Network._firing_probabilities), rebuilt only
+    # when the betas or the capacity change
+    key = (tuple(self.betas), self.replicas, self.capacity)
+
+    if self._probKey != key:
+      probs = [firing_probabilities(beta=beta, bound=self.capacity) for beta in self.betas]
+      self._probs = np.repeat(np.array(probs), self.replicas, axis=0)
+      self._probKey = key
+
+    return self._probs
+
+
+  def run (self, evolution_steps, progressbar=True, chunk_size=1000):
+
+    '''
+    Evolve all the replicas for the given number of steps.
+    The returned arrays have shape (len(betas), replicas, evolution_steps).
+    '''
+
+    size = len(self)
+    avgActive = np.empty(shape=(size,evolution_steps), dtype=np.float32)
+    degPlus = np.empty(shape=(size,evolution_steps), dtype=np.float32)
+    degMinus = np.empty(shape=(size,evolution_steps), dtype=np.float32)
+    done = 0
+
+    with tqdm(total=evolution_steps, desc='Simulation: ', disable=(not progressbar), ncols=100) as pbar:
+
+      while done < evolution_steps:
+
+        steps = min(chunk_size, evolution_steps - done)
+        steps = evolve_ensemble(evolution_steps=steps, n=self.n, alpha=self.alpha,
+                                probs=self._firing_probabilities(), tau=self.tau,
+                                epsilon=self.epsilon,
+                                sigma=self.sigma, avgActivity=self.avgActivity,
+                                index=self.index, weight=self.weight, count=self.count,
+                                linksPlus=self.linksPlus, linksMinus=self.linksMinus,
+                                avgActive=avgActive[:, done:], degPlus=degPlus[:, done:],
+                                degMinus=degMinus[:, done:], rng=self.rng)
+
+        # the kernel stops early when a row of an adjacency list is full
+        if self.count.max(initial=0) >= self.capacity:
+          self._grow()
+
+        done += steps
+        pbar.update(steps)
+
+    avgActive /= (self.tau * self.n)
+    degPlus /= self.n
+    degMinus /= self.n
+    branchPar = np.empty(shape=(size,evolution_steps), dtype=np.float64)
+    for k in range(size):
+      branchPar[k] = compute_branching_par(avgActive[k])
+
+    shape = (self.betas.size, self.replicas, evolution_steps)
+
+    return degPlus.reshape(shape), degMinus.reshape(shape), branchPar.reshape(shape)
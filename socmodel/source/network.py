@@ -1,12 +1,43 @@
+import os
+import json
 import numpy as np
+from tqdm import tqdm
 from scipy import sparse
-from tqdm import trange
 
 from socmodel.source.state import ZerosState
 from socmodel.source.connectivity import ZerosConnectivity
+from socmodel.source.adjacency import AdjacencyList
+from socmodel.source.profiling import Profiler
+from socmodel.source.profiling import NullProfiler
 from socmodel.source.numbafunc import compute_signal
+from socmodel.source.numbafunc import compute_signal_dense
+from socmodel.source.numbafunc import firing_probabilities
 from socmodel.source.numbafunc import update_state
+from socmodel.source.numbafunc import update_state_active
+from socmodel.source.numbafunc import propagate_flips
 from socmodel.source.numbafunc import update_average_activity
+from socmodel.source.numbafunc import update_average_activity_active
+from socmodel.source.numbafunc import flush_average_activity
+from socmodel.source.numbafunc import get_bit
+from socmodel.source.numbafunc import pack_state
+from socmodel.source.numbafunc import unpack_state
+from socmodel.source.numbafunc import compute_signal_packed
+from socmodel.source.numbafunc import update_state_packed
+from socmodel.source.numbafunc import update_average_activity_packed
+from socmodel.source.numbafunc import compute_signal_parallel
+from socmodel.source.numbafunc import compute_signal_dense_parallel
+from socmodel.source.numbafunc import update_state_parallel
+from socmodel.source.numbafunc import update_average_activity_parallel
+from socmodel.source.numbafunc import compute_signal_packed_parallel
+from socmodel.source.numbafunc import update_state_packed_parallel
+from socmodel.source.numbafunc import update_average_activity_packed_parallel
+from socmodel.source.numbafunc import evolve_connectivity
+from socmodel.source.numbafunc import evolve_connectivity_active
+from socmodel.source.numbafunc import update_link
+from socmodel.source.numbafunc import update_degrees
+from socmodel.source.numbafunc import count_degrees
+from socmodel.source.numbafunc import evolve
+from socmodel.source.numbafunc import evolve_parallel
 from socmodel.source.numbafunc import compute_branching_par
 
 import warnings
@@ -41,10 +72,76 @@ class Network:
 
     C_init : BaseConnectivity, default=ZerosConnectivity()
       Connectivity matrix initializer
+
+    seed : int, SeedSequence or Generator, default=None
+      Seed of the random number generator owned by the network (passed to
+      np.random.default_rng). It drives the initializers and all the Numba
+      kernels, so two networks built with the same seed evolve identically
+
+    update : str, default='full'
+      State update strategy: "full" recomputes the input signal of all the
+      neurons over all the links at each step of state evolution,
+      "incremental" keeps the signal vector resident and only updates it along
+      the out-links of the neurons that flipped their state (and along the
+      link changed by the connectivity evolution). The two strategies produce
+      exactly the same evolution.
+      "active" keeps the signal resident too, and only visits the neurons
+      with a positive signal (the out-neighbours of the active neurons): the
+      rare firings of the other neurons are drawn by geometric skipping, and
+      the average activity of the inactive neurons is decayed lazily, so that
+      the cost of a step of state evolution follows the activity of the
+      network instead of n: it pays off when only a small fraction of the
+      neurons is active (its random memory accesses make it slower than "full"
+      at high activity). The evolution has exactly the same law, but it uses
+      the random numbers differently. It requires packed=False
+
+    packed : bool, default=False
+      Store the state vector bit-packed in uint64 words (64 neurons per word,
+      the number of active neurons given by popcount) instead of one int8 for
+      each neuron. The evolution is exactly the same.
+      In both cases the sigma attribute is a read-only int8 array (a copy of
+      the unpacked state if packed): the state is changed by assigning a new
+      array to it
+
+    parallel : bool, default=False
+      Run the state evolution on all the threads available to Numba (see
+      numba.set_num_threads), one block of rows for each thread. The neurons
+      draw their random numbers from a counter-based generator keyed once for
+      each step of state evolution, so the evolution does not depend on the
+      number of threads, but it differs from the serial one.
+      It requires update="full"
+
+    backend : str, default='auto'
+      Storage of the connectivity used by the kernels: "sparse" uses the
+      adjacency list only, "dense" also keeps a dense int8 n x n copy of C,
+      so that the signal is a vectorized matrix-vector product and the
+      checks of the link mutations take constant time. The adjacency list
+      is kept in both cases and the random numbers are used in the same way,
+      so the evolution does not depend on the backend.
+      "auto" switches between the two at the start of every chunk of a run,
+      from n and the current link density (see denseMaxN, denseOn and
+      denseOff). The dense backend requires packed=False
+
+    memmap_dir : str, default=None
+      Directory (created if needed) where the column indices and the weights
+      of the adjacency lists, the state vector and the average activity are
+      stored as memory-mapped .npy files, overwriting the files of a previous
+      network: a network larger than the available memory can then be run,
+      at the speed of the page cache. The kernels read the rows of the
+      adjacency lists in order, and the connectivity is never converted to a
+      scipy matrix during a run
   '''
 
+  # policy of backend="auto": the dense copy is used with the full update for n up to
+  # denseMaxN, switched on above a link density of denseOn and off below denseOff (the
+  # dense product beats the sparse one from a density of about 0.1)
+  denseMaxN = 8192
+  denseOn   = 0.15
+  denseOff  = 0.075
+
   def __init__ (self, n, alpha, beta, tau,
-                sigma_init=ZerosState(), C_init=ZerosConnectivity()):
+                sigma_init=ZerosState(), C_init=ZerosConnectivity(), seed=None,
+                update='full', packed=False, parallel=False, backend='auto', memmap_dir=None):
 
     self.n          = n
     self.alpha      = alpha
@@ -52,6 +149,12 @@ class Network:
     self.tau        = tau
     self.sigma_init = sigma_init
     self.C_init     = C_init
+    self.seed       = seed
+    self.update     = update
+    self.packed     = packed
+    self.parallel   = parallel
+    self.backend    = backend
+    self.memmap_dir = memmap_dir
 
     self._check_parameters()
     self._set_initial_conditions()
@@ -87,112 +190,856 @@ class Network:
     if not self.tau >= 1:
       raise ValueError('Invalid "tau" passed. "tau" must be greater or equal that 1.')
 
+    if self.update not in ('full', 'incremental', 'active'):
+      raise ValueError('Invalid "update" passed. "update" must be "full", "incremental" or "active".')
+
+    if not isinstance(self.packed, (bool, np.bool_)):
+      raise TypeError('Invalid "packed" passed. "packed" must be a bool.')
+
+    if not isinstance(self.parallel, (bool, np.bool_)):
+      raise TypeError('Invalid "parallel" passed. "parallel" must be a bool.')
+
+    if self.parallel and self.update != 'full':
+      raise ValueError('Invalid "parallel" passed. The parallel state evolution requires update="full".')
+
+    if self.packed and self.update == 'active':
+      raise ValueError('Invalid "packed" passed. The active update requires packed=False.')
+
+    if self.backend not in ('sparse', 'dense', 'auto'):
+      raise ValueError('Invalid "backend" passed. "backend" must be "sparse", "dense" or "auto".')
+
+    if self.packed and self.backend == 'dense':
+      raise ValueError('Invalid "backend" passed. The dense backend requires packed=False.')
+
+    if self.memmap_dir is not None and not isinstance(self.memmap_dir, (str, os.PathLike)):
+      raise TypeError('Invalid "memmap_dir" passed. "memmap_dir" must be a path.')
+
+
+  @property
+  def sigma (self):
+
+    if self.packed:
+      sigma = np.empty(self.n, dtype=np.int8)
+      unpack_state(n=self.n, words=self.words, sigma=sigma)
+    else:
+      sigma = self._sigma.view()
+
+    sigma.flags.writeable = False
+
+    return sigma
+
+
+  @sigma.setter
+  def sigma (self, sigma):
+
+    # the unused representation is an empty array, so the kernels always get both
+    sigma = np.asarray(sigma, dtype=np.int8)
+
+    if self.packed:
+      self._sigma = np.empty(0, dtype=np.int8)
+      self.words = np.empty(-(-self.n // 64), dtype=np.uint64)
+      pack_state(n=self.n, sigma=sigma, words=self.words)
+    else:
+      self._sigma = self._store('sigma', sigma, getattr(self, '_sigma', None))
+      self.words = np.empty(0, dtype=np.uint64)
+
+    # a resident signal (and the list of the active neurons) must follow the new state
+    if getattr(self, 'Cout', None) is not None:
+      self._compute_signal()
+      self._set_active()
+
+
+  def _memmap_path (self, name):
+
+    # path of a memory-mapped array in memmap_dir (None without memmap_dir)
+    if self.memmap_dir is None:
+      return None
+
+    os.makedirs(self.memmap_dir, exist_ok=True)
+    return os.path.join(self.memmap_dir, name)
+
+
+  def _store (self, name, values, current=None):
+
+    # copy of values, in the file name.npy of memmap_dir if it is set: an array already
+    # mapped there (current) is overwritten in place, so values can be a view of it
+    values = np.asarray(values)
+
+    if self.memmap_dir is None:
+      return values.copy()
+
+    if not (isinstance(current, np.memmap) and current.shape == values.shape
+            and current.dtype == values.dtype):
+      current = np.lib.format.open_memmap(self._memmap_path(f'{name}.npy'), mode='w+',
+                                          dtype=values.dtype, shape=values.shape)
+    current[:] = values
+
+    return current
+
 
   def _set_initial_conditions (self):
 
-    self.sigma = self.sigma_init.get(size=self.n)
-    self.C = sparse.coo_matrix(self.C_init.get(shape=(self.n,self.n)))
+    self.rng = np.random.default_rng(self.seed)
+    self.sigma = self.sigma_init.get(size=self.n, rng=self.rng)
+    row, col, data = self.C_init.get_sparse(n=self.n, rng=self.rng)
+    self.C = AdjacencyList.from_coo(n=self.n, row=row, col=col, data=data, dtype=np.int8,
+                                    path=self._memmap_path('C'))
+    del row, col, data
 
-    self.avgActivity = np.empty(self.n, dtype=np.float32)
-    self.avgActivity = self.sigma
+    self.avgActivity = self._store('avgActivity', self.sigma.astype(np.float32))
     self.epsilon = 1e-9
 
-    self.linksPlus = np.sum(self.C == 1)
-    self.linksMinus = np.sum(self.C == -1)
+    self.step = 0
+    self.lastActive = 0.
+    self.profiler = NullProfiler()
 
+    self._set_degrees()
+    self.linksPlus = int(self.degrees[0].sum(dtype=np.int64))
+    self.linksMinus = int(self.degrees[1].sum(dtype=np.int64))
+    self._set_signal()
 
-  def _update_state (self, numActive):
 
-    signal = compute_signal(n=self.n, sigma=self.sigma,
-                            C=self.C.data, i=self.C.row, j=self.C.col)
+  def _set_degrees (self):
 
-    return update_state(n=self.n, beta=self.beta, signal=signal, numActive=numActive)
+    # numbers of positive and negative links of each row (in) and column (out) of C
+    self.degrees = np.zeros(shape=(4,self.n), dtype=np.int32)
+    count_degrees(index=self.C.index, weight=self.C.weight, count=self.C.count,
+                  degrees=self.degrees)
 
 
-  def _update_average_activity (self):
+  def _set_signal (self):
 
-    return update_average_activity(n=self.n, sigma=self.sigma, alpha=self.alpha,
-                                   avgActivity=self.avgActivity)
+    # the full update recomputes the signal before using it, the incremental and active ones
+    # keep it resident together with the out-links and the flipped neurons of each substep
+    incremental = self.update != 'full'
+    self.signal = np.zeros(self.n, dtype=np.int32)
+    self.Cout = self.C.transpose(path=self._memmap_path('Cout')) if incremental else None
+    self.flips = np.empty(self.n if incremental else 0, dtype=np.int32)
+    self._probKey = None
+    self.dense = np.empty(shape=(0,0), dtype=np.int8)
+    self._set_backend()
 
+    if incremental:
+      self._compute_signal()
 
-  def _evolve_state (self):
+    self._set_active()
 
-    numActive = 0
 
-    for _ in range(self.tau):
-      self.sigma, numActive = self._update_state(numActive=numActive)
-      self.avgActivity = self._update_average_activity()
+  def _use_dense (self):
 
-    return numActive
+    if self.backend != 'auto':
+      return self.backend == 'dense'
 
+    if self.packed or self.update != 'full' or self.n > self.denseMaxN:
+      return False
 
-  def _add_random_linkPlus (self, i):
+    density = (self.linksPlus + self.linksMinus) / self.n**2
+    return density >= (self.denseOff if self.dense.size > 0 else self.denseOn)
 
-    indices = np.where(self.C[i].toarray()[0] == 0)[0]
-    indices = indices[indices != i]
 
-    if indices.size:
-      j = np.random.choice(indices)
-      self.C[i,j] = 1
-      self.linksPlus += 1
+  def _set_backend (self):
 
+    # dense copy of C, an empty array with the sparse backend: it is built (or dropped)
+    # when the backend changes, and then kept up to date by the link mutation kernels
+    dense = self._use_dense()
 
-  def _add_random_linkMinus (self, i):
+    if dense and self.dense.size == 0:
+      self.dense = np.zeros(shape=(self.n,self.n), dtype=np.int8)
+      coo = self.C.tocoo()
+      self.dense[coo.row, coo.col] = coo.data
+      self.profiler.count('backend')
+    elif not dense and self.dense.size > 0:
+      self.dense = np.empty(shape=(0,0), dtype=np.int8)
+      self.profiler.count('backend')
 
-    indices = np.where(self.C[i].toarray()[0] == 0)[0]
-    indices = indices[indices != i]
 
-    if indices.size:
-      j = np.random.choice(indices)
-      self.C[i,j] = -1
-      self.linksMinus += 1
+  def _set_active (self):
 
+    # lists of the active neurons, lazy average activity and marks of the active update
+    # (see update_state_active), empty arrays otherwise
+    active = self.update == 'active'
+    self.active = np.zeros(shape=(2,self.n+1) if active else (0,0), dtype=np.int32)
+    self.updated = np.zeros(self.n+1 if active else 0, dtype=np.int64)
+    self.mark = np.zeros(self.n if active else 0, dtype=np.int8)
 
-  def _remove_random_link (self, i):
+    if active:
+      indices = np.flatnonzero(self._sigma)
+      self.active[0,0] = indices.size
+      self.active[0,1:indices.size+1] = indices
 
-    indices = self.C[i].nonzero()[1]
 
-    if indices.size:
-      j = np.random.choice(indices)
-      l = self.C[i,j]
-      if l == 1: self.linksPlus -= 1
-      if l == -1: self.linksMinus -= 1
-      self.C[i,j] = 0
+  def _set_active_order (self, indices):
 
+    # list of the active neurons in the order of a checkpoint or of the cloned network
+    self.active[0,0] = indices.size
+    self.active[0,1:indices.size+1] = indices
 
-  def _evolve_connectivity (self):
 
-    i = np.random.randint(low=0, high=self.n)
-    A = self.avgActivity[i]
+  def _firing_probabilities (self):
+
+    # table of the firing probability of each value of the signal: the weights are 1 or -1,
+    # so the signal of a neuron is bounded by the capacity of C in absolute value
+    # the table is rebuilt only when beta or the capacity change
+    key = (self.beta, self.C.capacity)
+
+    if self._probKey != key:
+      self._prob = firing_probabilities(beta=float(self.beta), bound=self.C.capacity)
+      self._probKey = key
 
-    if A < self.epsilon:
-      self._add_random_linkPlus(i)
+    return self._prob
 
-    elif A > (1. - self.epsilon):
-      self._add_random_linkMinus(i)
 
+  def _compute_signal (self):
+
+    if self.packed:
+      _compute_signal = compute_signal_packed_parallel if self.parallel else compute_signal_packed
+      _compute_signal(n=self.n, words=self.words, index=self.C.index,
+                      weight=self.C.weight, count=self.C.count, signal=self.signal)
+    elif self.dense.size > 0:
+      _compute_signal = compute_signal_dense_parallel if self.parallel else compute_signal_dense
+      _compute_signal(n=self.n, sigma=self._sigma, dense=self.dense, signal=self.signal)
     else:
-      self._remove_random_link(i)
+      _compute_signal = compute_signal_parallel if self.parallel else compute_signal
+      _compute_signal(n=self.n, sigma=self._sigma, index=self.C.index,
+                      weight=self.C.weight, count=self.C.count, signal=self.signal)
 
 
-  def run (self, evolution_steps, progressbar=True):
+  def _update_state (self, numActive):
 
-    avgActive = np.empty(evolution_steps, dtype=np.float32)
-    degPlus = np.empty(evolution_steps, dtype=np.float32)
-    degMinus = np.empty(evolution_steps, dtype=np.float32)
+    if self.update == 'full':
+      self._compute_signal()
+
+    prob = self._firing_probabilities()
+
+    if self.update == 'active':
+      numActive, numFlips = update_state_active(prob=prob, signal=self.signal, sigma=self._sigma,
+                                                numActive=numActive, rng=self.rng,
+                                                flips=self.flips, active=self.active,
+                                                mark=self.mark, outIndex=self.Cout.index,
+                                                outWeight=self.Cout.weight,
+                                                outCount=self.Cout.count)
+
+    elif self.parallel and self.packed:
+      return update_state_packed_parallel(n=self.n, prob=prob, signal=self.signal,
+                                          words=self.words, numActive=numActive, rng=self.rng)
+
+    elif self.parallel:
+      return update_state_parallel(n=self.n, prob=prob, signal=self.signal,
+                                   sigma=self._sigma, numActive=numActive, rng=self.rng)
+
+    elif self.packed:
+      numActive, numFlips = update_state_packed(n=self.n, prob=prob, signal=self.signal,
+                                                words=self.words, numActive=numActive,
+                                                rng=self.rng, flips=self.flips)
+    else:
+      numActive, numFlips = update_state(n=self.n, prob=prob, signal=self.signal,
+                                         sigma=self._sigma, numActive=numActive,
+                                         rng=self.rng, flips=self.flips)
 
-    for i in trange(evolution_steps, desc='Simulation: ', disable=(not progressbar), ncols=100):
+    if self.update != 'full':
+      propagate_flips(numFlips=numFlips, flips=self.flips, signal=self.signal,
+                      outIndex=self.Cout.index, outWeight=self.Cout.weight,
+                      outCount=self.Cout.count)
 
-      avgActive[i] = self._evolve_state()
-      self.C = self.C.tocsr()
-      self._evolve_connectivity()
-      self.C = self.C.tocoo()
+    return numActive
+
+
+  def _update_average_activity (self):
+
+    if self.update == 'active':
+      update_average_activity_active(alpha=self.alpha, avgActivity=self.avgActivity,
+                                     active=self.active, updated=self.updated)
+    elif self.packed:
+      _update = update_average_activity_packed_parallel if self.parallel else update_average_activity_packed
+      _update(n=self.n, words=self.words, alpha=self.alpha, avgActivity=self.avgActivity)
+    else:
+      _update = update_average_activity_parallel if self.parallel else update_average_activity
+      _update(n=self.n, sigma=self._sigma, alpha=self.alpha, avgActivity=self.avgActivity)
+
+
+  def _evolve_state (self, substepActive=None):
+
+    numActive = 0
+
+    for t in range(self.tau):
+      prevActive = numActive
+      numActive = self._update_state(numActive=numActive)
+      self._update_average_activity()
+      if substepActive is not None and substepActive.size > 0:
+        substepActive[t] = numActive - prevActive
+
+    return numActive
+
+
+  def _evolve_connectivity (self):
+
+    if self.update == 'active':
+      i, j, dPlus, dMinus = evolve_connectivity_active(n=self.n, epsilon=self.epsilon,
+                                                       alpha=self.alpha,
+                                                       avgActivity=self.avgActivity,
+                                                       updated=self.updated, index=self.C.index,
+                                                       weight=self.C.weight, count=self.C.count,
+                                                       dense=self.dense, rng=self.rng)
+    else:
+      i, j, dPlus, dMinus = evolve_connectivity(n=self.n, epsilon=self.epsilon,
+                                                avgActivity=self.avgActivity,
+                                                index=self.C.index, weight=self.C.weight,
+                                                count=self.C.count, dense=self.dense,
+                                                rng=self.rng)
+    self.linksPlus += dPlus
+    self.linksMinus += dMinus
+    update_degrees(i=i, j=j, dPlus=dPlus, dMinus=dMinus, degrees=self.degrees)
+    if self.C.reserve(i):
+      self.profiler.count('grow')
+
+    if self.update != 'full' and j >= 0:
+      sigmaj = get_bit(self.words, j) if self.packed else self._sigma[j]
+      update_link(i=i, j=j, dPlus=dPlus, dMinus=dMinus, sigmaj=sigmaj, signal=self.signal,
+                  outIndex=self.Cout.index, outWeight=self.Cout.weight, outCount=self.Cout.count)
+      if self.Cout.reserve(j):
+        self.profiler.count('grow')
+
+
+  def _run_python (self, avgActive, degPlus, degMinus, substepActive, pbar):
+
+    profiler = self.profiler
+    tau = self.tau
+    self._set_backend()
+
+    for i in range(avgActive.size):
+
+      with profiler.phase('state'):
+        avgActive[i] = self._evolve_state(substepActive=substepActive[i*tau:(i+1)*tau])
+      with profiler.phase('connectivity'):
+        self._evolve_connectivity()
       degPlus[i] = self.linksPlus
       degMinus[i] = self.linksMinus
+      pbar.update(1)
+
+    self._flush_average_activity()
+
+
+  def _flush_average_activity (self):
+
+    # the lazy average activity of the active update is brought up to date at the end of
+    # each chunk, by both engines
+    if self.update == 'active':
+      flush_average_activity(alpha=self.alpha, avgActivity=self.avgActivity, updated=self.updated)
+
+
+  def _run_numba (self, avgActive, degPlus, degMinus, substepActive, pbar):
+
+    evolution_steps = avgActive.size
+    incremental = self.update != 'full'
+    evolution = evolve_parallel if self.parallel else evolve
+    done = 0
+    self._set_backend()
+
+    while done < evolution_steps:
+
+      Cout = self.Cout if incremental else AdjacencyList(n=0)
+
+      with self.profiler.phase('kernel'):
+        steps, self.linksPlus, self.linksMinus = evolution(
+            evolution_steps=evolution_steps-done, n=self.n, alpha=self.alpha,
+            prob=self._firing_probabilities(),
+            tau=self.tau, epsilon=self.epsilon, sigma=self._sigma, words=self.words,
+            packed=self.packed, avgActivity=self.avgActivity, index=self.C.index,
+            weight=self.C.weight, count=self.C.count, dense=self.dense, degrees=self.degrees,
+            linksPlus=self.linksPlus,
+            linksMinus=self.linksMinus, avgActive=avgActive[done:], degPlus=degPlus[done:],
+            degMinus=degMinus[done:], substepActive=substepActive[done*self.tau:],
+            rng=self.rng, incremental=incremental,
+            signal=self.signal, flips=self.flips, outIndex=Cout.index, outWeight=Cout.weight,
+            outCount=Cout.count, active=self.active, updated=self.updated, mark=self.mark)
+
+      # the kernel stops early when a row of an adjacency list is full
+      with self.profiler.phase('grow'):
+        if self.C.count.max(initial=0) >= self.C.capacity:
+          self.C.grow()
+          self.profiler.count('grow')
+        if incremental and self.Cout.count.max(initial=0) >= self.Cout.capacity:
+          self.Cout.grow()
+          self.profiler.count('grow')
+
+      done += steps
+      pbar.update(steps)
+
+    self._flush_average_activity()
+
+
+  def save_checkpoint (self, path):
+
+    '''
+    Save the current state of the network (state vector, average activity,
+    connectivity, link counters, evolution step, activity of the last step and
+    random generator state) to an uncompressed .npz file: the connectivity is stored as the raw row
+    counts, column indices and weights of the adjacency list.
+    The file is written to a temporary path and then moved, so an existing
+    checkpoint is never left half-written.
+    '''
+
+    mask = np.arange(self.C.capacity) < self.C.count[:, None]
+    tmp_path = f'{path}.tmp'
+
+    # the active update visits the out-links and the active neurons in their stored order
+    order = {}
+    if self.update == 'active':
+      outMask = np.arange(self.Cout.capacity) < self.Cout.count[:, None]
+      order = dict(outCount=self.Cout.count, outIndex=self.Cout.index[outMask],
+                   outWeight=self.Cout.weight[outMask], active=self.active[0,1:self.active[0,0]+1])
+
+    with open(tmp_path, 'wb') as file:
+      np.savez(file, n=self.n, alpha=self.alpha, beta=self.beta, tau=self.tau,
+               epsilon=self.epsilon, step=self.step, update=self.update,
+               packed=self.packed, parallel=self.parallel, backend=self.backend,
+               linksPlus=self.linksPlus, linksMinus=self.linksMinus, lastActive=self.lastActive,
+               sigma=self.sigma, avgActivity=self.avgActivity,
+               count=self.C.count, index=self.C.index[mask], weight=self.C.weight[mask],
+               rng=json.dumps(self.rng.bit_generator.state), **order)
+
+    os.replace(tmp_path, path)
+
+
+  @classmethod
+  def load_checkpoint (cls, path, memmap_dir=None):
+
+    '''
+    Restore a network saved by save_checkpoint: its evolution continues
+    exactly as the one of the original network would have.
+    The initializers are not stored (and not run), so sigma_init, C_init and
+    seed are set to None. The restored network keeps its arrays in
+    memmap_dir if it is given (see Network), in memory otherwise.
+    '''
+
+    with np.load(path) as data:
+
+      net = cls.__new__(cls)
+      net.n          = int(data['n'])
+      net.alpha      = float(data['alpha'])
+      net.beta       = float(data['beta'])
+      net.tau        = int(data['tau'])
+      net.sigma_init = None
+      net.C_init     = None
+      net.seed       = None
+      net.update     = str(data['update'])
+      net.packed     = bool(data['packed'])
+      net.parallel   = bool(data['parallel'])
+      net.backend    = str(data['backend']) if 'backend' in data else 'auto'
+      net.memmap_dir = memmap_dir
+      net._check_parameters()
+
+      net.sigma = data['sigma']
+      net.avgActivity = net._store('avgActivity', data['avgActivity'])
+      net.epsilon = float(data['epsilon'])
+      net.step = int(data['step'])
+      net.lastActive = float(data['lastActive'])
+      net.profiler = NullProfiler()
+      net.linksPlus = int(data['linksPlus'])
+      net.linksMinus = int(data['linksMinus'])
+
+      row = np.repeat(np.arange(net.n), data['count'])
+      net.C = AdjacencyList.from_coo(n=net.n, row=row, col=data['index'],
+                                     data=data['weight'], dtype=data['weight'].dtype,
+                                     path=net._memmap_path('C'))
+      net._set_degrees()
+      net._set_signal()
+
+      if 'active' in data:
+        row = np.repeat(np.arange(net.n), data['outCount'])
+        net.Cout = AdjacencyList.from_coo(n=net.n, row=row, col=data['outIndex'],
+                                          data=data['outWeight'], dtype=data['outWeight'].dtype,
+                                          path=net._memmap_path('Cout'))
+        net._set_active_order(data['active'])
+
+      state = json.loads(str(data['rng']))
+      net.rng = np.random.Generator(getattr(np.random, state['bit_generator'])())
+      net.rng.bit_generator.state = state
+
+    return net
+
+
+  def clone (self, **params):
+
+    '''
+    Return a copy of the network with some parameters changed, starting from
+    its current state vector, average activity, connectivity and evolution
+    step (e.g. to continue the evolution at a different beta without paying
+    the transient again). The buffers are copied, so the two networks evolve
+    independently; the initializers are not run.
+
+    Parameters
+    ----------
+      **params
+        New values of the constructor parameters alpha, beta, tau, update,
+        packed, parallel, backend, memmap_dir and seed. Without a seed, the
+        clone gets a copy of the random generator state, so that the clone
+        of a network with the same parameters evolves exactly as the network
+        itself. The clone of a memory-mapped network needs its own memmap_dir
+    '''
+
+    allowed = {'alpha', 'beta', 'tau', 'update', 'packed', 'parallel', 'backend', 'memmap_dir',
+               'seed'}
+    if not set(params) <= allowed:
+      invalid = ', '.join(sorted(set(params) - allowed))
+      raise ValueError(f'Invalid parameters passed: {invalid}. Only {", ".join(sorted(allowed))} can be changed.')
+
+    net = self.__class__.__new__(self.__class__)
+    net.n          = self.n
+    net.alpha      = params.get('alpha', self.alpha)
+    net.beta       = params.get('beta', self.beta)
+    net.tau        = params.get('tau', self.tau)
+    net.sigma_init = self.sigma_init
+    net.C_init     = self.C_init
+    net.seed       = params.get('seed', self.seed)
+    net.update     = params.get('update', self.update)
+    net.packed     = params.get('packed', self.packed)
+    net.parallel   = params.get('parallel', self.parallel)
+    net.backend    = params.get('backend', self.backend)
+    net.memmap_dir = params.get('memmap_dir', self.memmap_dir)
+    net._check_parameters()
+
+    if net.memmap_dir is not None and self.memmap_dir is not None:
+      if os.path.abspath(net.memmap_dir) == os.path.abspath(self.memmap_dir):
+        raise ValueError('Invalid "memmap_dir" passed. The clone cannot share the "memmap_dir" of the network.')
+
+    net.sigma = self.sigma
+    net.avgActivity = net._store('avgActivity', self.avgActivity)
+    net.epsilon = self.epsilon
+    net.step = self.step
+    net.lastActive = self.lastActive
+    net.profiler = NullProfiler()
+    net.linksPlus = self.linksPlus
+    net.linksMinus = self.linksMinus
+
+    net.C = self.C.copy(path=net._memmap_path('C'))
+    net.degrees = self.degrees.copy()
+    net._set_signal()
+
+    if self.update == 'active' and net.update == 'active':
+      net.Cout = self.Cout.copy(path=net._memmap_path('Cout'))
+      net._set_active_order(self.active[0,1:self.active[0,0]+1])
+
+    if 'seed' in params:
+      net.rng = np.random.default_rng(params['seed'])
+    else:
+      net.rng = np.random.Generator(type(self.rng.bit_generator)())
+      net.rng.bit_generator.state = self.rng.bit_generator.state
 
-    avgActive /= (self.tau * self.n)
-    degPlus /= self.n
-    degMinus /= self.n
-    branchPar = compute_branching_par(avgActive)
+    return net
+
+
+  def iter_run (self, evolution_steps, chunk_size=1000, progressbar=True, engine='python',
+                checkpoint_every=None, checkpoint_path=None, profile=False, avalanches=None,
+                recorders=None, until_converged=None):
+
+    '''
+    Evolve the network in chunks of evolution steps, yielding the observables
+    of each chunk as soon as it is completed, so that the memory footprint
+    does not depend on the total number of steps.
+
+    Parameters
+    ----------
+      evolution_steps : int
+        Total number of steps for the connectivity evolution
+
+      chunk_size : int, default=1000
+        Number of evolution steps of each chunk
+
+      progressbar : bool, default=True
+        Show the progress bar
+
+      engine : str, default='python'
+        Simulation engine (see Network.run)
+
+      checkpoint_every : int, default=None
+        Save a checkpoint to checkpoint_path after each chunk that completes
+        a multiple of checkpoint_every evolution steps (counted by self.step).
+        The checkpoint is saved when the generator is resumed, i.e. after the
+        chunk has been consumed
+
+      checkpoint_path : str, default=None
+        Path of the checkpoint file (see Network.save_checkpoint)
+
+      profile : bool, default=False
+        Measure the time spent in each phase of the run (see
+        Network.profile_report). The measurements are reset at the start of
+        every run
+
+      avalanches : AvalancheDetector, default=None
+        Detector fed with the number of active neurons of every substep of
+        the state evolution (see socmodel.source.avalanche), so that the
+        avalanche statistics are accumulated without storing the trace
+
+      recorders : list of BaseRecorder, default=None
+        Recorders of the observables, each with its own sampling stride (see
+        socmodel.source.recorders). The chunks are also cut at the multiples
+        of the strides of the snapshot recorders
+
+      until_converged : StationarityCriterion, default=None
+        Stop after the chunk where the criterion is met, evolution_steps being
+        the maximum number of steps (see socmodel.source.convergence). The
+        criterion is reset at the start of the run, and the chunks are also
+        cut at the end of its windows
+
+    Yields
+    ------
+      (degPlus, degMinus, branchPar) arrays of length chunk_size (shorter for
+      the last chunk): the concatenation of all the chunks is equal to the
+      output of Network.run
+    '''
+
+    if engine not in ('python', 'numba'):
+      raise ValueError('Invalid "engine" passed. "engine" must be "python" or "numba".')
+
+    if checkpoint_every is not None:
+      if not checkpoint_every >= 1:
+        raise ValueError('Invalid "checkpoint_every" passed. "checkpoint_every" must be greater or equal than 1.')
+      if checkpoint_path is None:
+        raise ValueError('Invalid "checkpoint_path" passed. A path is required with "checkpoint_every".')
+
+    if not chunk_size >= 1:
+      raise ValueError('Invalid "chunk_size" passed. "chunk_size" must be greater or equal than 1.')
+
+    _run = self._run_python if engine == 'python' else self._run_numba
+    self.profiler = profiler = Profiler() if profile else NullProfiler()
+
+    # the first element holds the activity of the previous step (of the previous run too)
+    avgActive = np.zeros(min(chunk_size, evolution_steps) + 1, dtype=np.float32)
+    avgActive[0] = self.lastActive
+    done = 0
+
+    # activity of each substep of a chunk, only recorded for the avalanche detector
+    substeps = min(chunk_size, evolution_steps) * self.tau if avalanches is not None else 0
+    substepActive = np.empty(substeps, dtype=np.int32)
+
+    # the snapshot recorders read the network at the end of the chunks
+    recorders = list(recorders) if recorders is not None else []
+    strides = [recorder.stride for recorder in recorders if recorder.snapshot]
+    align = int(np.gcd.reduce(strides)) if strides else None
+
+    if until_converged is not None:
+      until_converged.reset()
+
+    with tqdm(total=evolution_steps, desc='Simulation: ', disable=(not progressbar), ncols=100) as pbar:
+
+      while done < evolution_steps:
+
+        steps = min(chunk_size, evolution_steps - done)
+        if align is not None:
+          steps = min(steps, align - self.step % align)
+        if until_converged is not None:
+          steps = min(steps, until_converged.window - done % until_converged.window)
+        degPlus = np.empty(steps, dtype=np.float32)
+        degMinus = np.empty(steps, dtype=np.float32)
+        profiler.count('allocations', 2)
+        _run(avgActive=avgActive[1:steps+1], degPlus=degPlus, degMinus=degMinus,
+             substepActive=substepActive, pbar=pbar)
+
+        if avalanches is not None:
+          with profiler.phase('avalanches'):
+            avalanches.update(substepActive[:steps*self.tau])
+
+        with profiler.phase('observables'):
+          avgActive[1:steps+1] /= (self.tau * self.n)
+          degPlus /= self.n
+          degMinus /= self.n
+          branchPar = compute_branching_par(avgActive[:steps+1])[1:]
+
+        avgActive[0] = avgActive[steps]
+        self.lastActive = float(avgActive[0])
+        done += steps
+        self.step += steps
+
+        chunk = {'step': np.arange(self.step - steps + 1, self.step + 1), 'Kplus': degPlus,
+                 'Kminus': degMinus, 'activity': avgActive[1:steps+1], 'branchPar': branchPar}
+
+        if recorders:
+          with profiler.phase('recorders'):
+            for recorder in recorders:
+              recorder.record(self, chunk)
+
+        if until_converged is not None:
+          with profiler.phase('convergence'):
+            converged = until_converged.update(chunk)
+
+        yield degPlus, degMinus, branchPar
+
+        if checkpoint_every is not None:
+          if self.step // checkpoint_every > (self.step - steps) // checkpoint_every:
+            with profiler.phase('checkpoint'):
+              self.save_checkpoint(checkpoint_path)
+
+        if until_converged is not None and converged:
+          break
+
+
+  def run (self, evolution_steps, progressbar=True, engine='python',
+           checkpoint_every=None, checkpoint_path=None, profile=False, avalanches=None,
+           recorders=None, until_converged=None):
+
+    '''
+    Parameters
+    ----------
+      evolution_steps : int
+        Number of steps for the connectivity evolution (each of them preceded
+        by tau steps of state evolution)
+
+      progressbar : bool, default=True
+        Show the progress bar
+
+      engine : str, default='python'
+        Simulation engine: "python" runs the evolution loop in Python calling
+        the Numba kernels for each phase, "numba" runs the whole loop inside a
+        single compiled kernel. Both consume the same random number stream
+
+      checkpoint_every : int, default=None
+        Save a checkpoint every checkpoint_every evolution steps
+
+      checkpoint_path : str, default=None
+        Path of the checkpoint file (see Network.save_checkpoint)
+
+      profile : bool, default=False
+        Measure the time spent in each phase of the run (see
+        Network.profile_report)
+
+      avalanches : AvalancheDetector, default=None
+        Detector of the avalanches of the state evolution (see Network.iter_run)
+
+      recorders : list of BaseRecorder, default=None
+        Recorders of the observables (see socmodel.source.recorders). If they
+        are given, the observables of every step are not stored: the run is
+        evolved in chunks of 1000 steps (or checkpoint_every) and the
+        recorders are returned
+
+      until_converged : StationarityCriterion, default=None
+        Stop as soon as the observables are stationary according to the
+        criterion (see socmodel.source.convergence), evolution_steps being the
+        maximum number of steps
+
+    Returns
+    -------
+      (degPlus, degMinus, branchPar) arrays of length evolution_steps (or of
+      the number of steps run until convergence), or the list of recorders if
+      they are given. With until_converged, the number of steps at which the
+      convergence was declared (None if it was not) is appended to the output
+    '''
+
+    kwargs = dict(progressbar=progressbar, engine=engine, checkpoint_every=checkpoint_every,
+                  checkpoint_path=checkpoint_path, profile=profile, avalanches=avalanches,
+                  until_converged=until_converged)
+
+    if recorders is not None:
+      recorders = list(recorders)
+      chunk_size = checkpoint_every if checkpoint_every is not None else 1000
+      for _ in self.iter_run(evolution_steps=evolution_steps, chunk_size=chunk_size,
+                             recorders=recorders, **kwargs):
+        pass
+      if until_converged is not None:
+        return recorders, until_converged.converged
+      return recorders
+
+    degPlus = np.empty(evolution_steps, dtype=np.float32)
+    degMinus = np.empty(evolution_steps, dtype=np.float32)
+    branchPar = np.empty(evolution_steps, dtype=np.float64)
+    chunk_size = checkpoint_every if checkpoint_every is not None else max(evolution_steps, 1)
+    done = 0
+
+    for chunk in self.iter_run(evolution_steps=evolution_steps, chunk_size=chunk_size, **kwargs):
+      steps = chunk[0].size
+      degPlus[done:done+steps], degMinus[done:done+steps], branchPar[done:done+steps] = chunk
+      done += steps
+
+    if until_converged is not None:
+      return degPlus[:done], degMinus[:done], branchPar[:done], until_converged.converged
 
     return degPlus, degMinus, branchPar
+
+
+  def profile_report (self):
+
+    '''
+    Return the measurements of the last run started with profile=True.
+
+    Returns
+    -------
+      dict with the keys:
+        phases : for each phase, its total wall time in seconds ("time"),
+          number of calls ("calls") and mean time per call ("mean"). The
+          phases are "state" and "connectivity" (python engine, once per
+          evolution step), "kernel" and "grow" (numba engine, once per call
+          of the compiled loop), "observables", "avalanches", "recorders",
+          "convergence" and "checkpoint" (once per chunk)
+        counters : "allocations" of the output buffers, "grow"
+          reallocations of the adjacency lists and "backend" switches of
+          the backend "auto"
+        nnz, capacity : current number of links and row capacity of the
+          connectivity matrix
+        step : current evolution step
+    '''
+
+    return {**self.profiler.report(), 'nnz': self.C.nnz, 'capacity': self.C.capacity,
+            'step': self.step}
+
+
+  def degree_stats (self):
+
+    '''
+    Return the degrees of the neurons, maintained incrementally during the
+    runs, so that the cost is O(n). The in-degree of neuron i counts the
+    links C[i,j] != 0 (its inputs in the signal), the out-degree of neuron j
+    counts the links C[i,j] != 0 of column j.
+
+    Returns
+    -------
+      dict with the keys "inPlus", "inMinus", "in", "outPlus", "outMinus" and
+      "out" (positive, negative and all links), each holding a dict with:
+        degrees : array of length n with the degree of each neuron
+        mean : mean degree
+        hist : histogram of the degrees (np.bincount of degrees)
+    '''
+
+    inPlus, inMinus, outPlus, outMinus = self.degrees.astype(np.int64)
+    degrees = {'inPlus': inPlus, 'inMinus': inMinus, 'in': inPlus + inMinus,
+               'outPlus': outPlus, 'outMinus': outMinus, 'out': outPlus + outMinus}
+
+    return {key: {'degrees': value, 'mean': float(value.mean()), 'hist': np.bincount(value)}
+            for key, value in degrees.items()}
+
+
+  def motif_stats (self):
+
+    '''
+    Compute the statistics of the excitatory (positive) and inhibitory
+    (negative) motifs from the sparse structure of C, in O(nnz) memory.
+
+    Returns
+    -------
+      dict with the keys:
+        reciprocal : numbers of pairs of neurons linked in both directions,
+          by sign of the two links ("plusPlus", "minusMinus", "plusMinus")
+        clustering : mean local clustering coefficient of the undirected
+          graphs of the positive ("plus"), negative ("minus") and all ("all")
+          links
+    '''
+
+    coo = self.C.tocoo()
+    graphs = {}
+    for key, mask in [('plus', coo.data == 1), ('minus', coo.data == -1), ('all', coo.data != 0)]:
+      graphs[key] = sparse.csr_matrix((np.ones(np.count_nonzero(mask), dtype=np.int64),
+                                       (coo.row[mask], coo.col[mask])), shape=(self.n,self.n))
+
+    P, M = graphs['plus'], graphs['minus']
+    reciprocal = {'plusPlus': P.multiply(P.T).nnz // 2, 'minusMinus': M.multiply(M.T).nnz // 2,
+                  'plusMinus': P.multiply(M.T).nnz}
+
+    clustering = {}
+    for key, A in graphs.items():
+      U = ((A + A.T) > 0).astype(np.int64)
+      k = np.asarray(U.sum(axis=1)).ravel()
+      triangles = np.asarray((U @ U).multiply(U).sum(axis=1)).ravel() / 2
+      pairs = k * (k - 1) / 2
+      local = np.divide(triangles, pairs, out=np.zeros(self.n), where=(pairs > 0))
+      clustering[key] = float(local.mean())
+
+    return {'reciprocal': reciprocal, 'clustering': clustering}
@@ -1,54 +1,846 @@
+import types
 import numpy as np
-from numba import njit, stencil
+from numba import njit, prange
+
+
+ONE = np.uint64(1)
 
 
 # signal = np.dot(C, sigma)
-@njit
-def compute_signal (n, sigma, C, i, j):
+@njit(cache=True)
+def compute_signal (n, sigma, index, weight, count, signal):
+
+  for i in prange(n):
+    s = 0
+    for k in range(count[i]):
+      s += weight[i,k] * sigma[index[i,k]]
+    signal[i] = s
+
+
+# signal = np.dot(C, sigma), with C stored as a dense int8 matrix (the inner loop is vectorized)
+@njit(cache=True)
+def compute_signal_dense (n, sigma, dense, signal):
+
+  for i in prange(n):
+    s = np.int32(0)
+    row = dense[i]
+    for j in range(n):
+      s += np.int32(row[j]) * np.int32(sigma[j])
+    signal[i] = s
+
 
-  signal = np.zeros(n, dtype=np.int32)
+# f(s) = 1 / (1 + exp(-2 beta (s - 1/2))) for s in [-bound, bound], stored in prob[s + bound]
+@njit(cache=True)
+def firing_probabilities (beta, bound):
 
-  for k in range(C.size):
-    signal[i[k]] += C[k] * sigma[j[k]]
+  prob = np.empty(2*bound + 1, dtype=np.float64)
 
-  return signal
+  for k in range(prob.size):
+    prob[k] = 1./ (1. + np.exp(-2.*beta * ((k - bound)-0.5)))
+
+  return prob
 
 
 # state = 1, with prob=f(signal)
 #       = 0, with 1-prob
-@njit
-def update_state (n, beta, signal, numActive):
+# f is tabulated by firing_probabilities, over a range of the signal that contains signal
+# the flipped neurons are recorded in flips (j if 0->1, ~j if 1->0) unless it is empty
+@njit(cache=True)
+def update_state (n, prob, signal, sigma, numActive, rng, flips):
 
-  newSigma = np.zeros(n, dtype=np.int8)
-  rand = np.random.rand(n)
+  offset = prob.size // 2
+  record = flips.size > 0
+  numFlips = 0
 
   for i in range(n):
-    if rand[i] < 1./ (1. + np.exp(-2.*beta * (signal[i]-0.5))):
-      newSigma[i] = 1
-      numActive += 1
+    s = 1 if rng.random() < prob[signal[i] + offset] else 0
+    if record and s != sigma[i]:
+      flips[numFlips] = i if s else ~i
+      numFlips += 1
+    sigma[i] = s
+    numActive += s
+
+  return numActive, numFlips
+
 
-  return newSigma, numActive
+# signal += C * (newSigma - sigma) along the out-links of the flipped neurons
+@njit(cache=True)
+def propagate_flips (numFlips, flips, signal, outIndex, outWeight, outCount):
+
+  for f in range(numFlips):
+    j = flips[f]
+    d = 1
+    if j < 0:
+      j = ~j
+      d = -1
+    for k in range(outCount[j]):
+      signal[outIndex[j,k]] += outWeight[j,k] * d
 
 
 # A(t+1) = sigma*(1-alpha) + A(t)*alpha
-@njit
+@njit(cache=True)
 def update_average_activity (n, sigma, alpha, avgActivity):
 
-  newAvgActivity = np.empty(n, dtype=np.float32)
   par = 1. - alpha
 
+  for i in prange(n):
+    avgActivity[i] = sigma[i]*par + avgActivity[i]*alpha
+
+
+# bit-packed state: bit b of words[w] is the state of neuron 64*w + b
+@njit(cache=True)
+def get_bit (words, i):
+  return np.int64((words[i >> 6] >> np.uint64(i & 63)) & ONE)
+
+
+@njit(cache=True)
+def pack_state (n, sigma, words):
+
+  words[:] = 0
+
   for i in range(n):
-    newAvgActivity[i] = sigma[i]*par + avgActivity[i]*alpha
+    if sigma[i]:
+      words[i >> 6] |= ONE << np.uint64(i & 63)
+
+
+@njit(cache=True)
+def unpack_state (n, words, sigma):
+
+  for i in range(n):
+    sigma[i] = get_bit(words, i)
+
+
+# number of 1 bits of a 64-bit word (SWAR)
+@njit(cache=True)
+def popcount (x):
+
+  x = x - ((x >> ONE) & np.uint64(0x5555555555555555))
+  x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+  x = (x + (x >> np.uint64(4))) & np.uint64(0x0f0f0f0f0f0f0f0f)
+
+  return np.int64((x * np.uint64(0x0101010101010101)) >> np.uint64(56))
+
+
+@njit(cache=True)
+def count_active (words):
+
+  numActive = 0
+  for w in range(words.size):
+    numActive += popcount(words[w])
+
+  return numActive
+
+
+@njit(cache=True)
+def compute_signal_packed (n, words, index, weight, count, signal):
+
+  for i in prange(n):
+    s = 0
+    for k in range(count[i]):
+      s += weight[i,k] * get_bit(words, index[i,k])
+    signal[i] = s
+
+
+# same as update_state, one 64-bit word at a time
+@njit(cache=True)
+def update_state_packed (n, prob, signal, words, numActive, rng, flips):
+
+  offset = prob.size // 2
+  record = flips.size > 0
+  numFlips = 0
+
+  for w in range(words.size):
+
+    old = words[w]
+    new = np.uint64(0)
+
+    for b in range(min(64, n - 64*w)):
+      i = 64*w + b
+      if rng.random() < prob[signal[i] + offset]:
+        new |= ONE << np.uint64(b)
+
+    if record and new != old:
+      for b in range(min(64, n - 64*w)):
+        s = (new >> np.uint64(b)) & ONE
+        if s != (old >> np.uint64(b)) & ONE:
+          i = 64*w + b
+          flips[numFlips] = i if s else ~i
+          numFlips += 1
+
+    words[w] = new
+    numActive += popcount(new)
+
+  return numActive, numFlips
+
+
+@njit(cache=True)
+def update_average_activity_packed (n, words, alpha, avgActivity):
+
+  par = 1. - alpha
+
+  for i in prange(n):
+    avgActivity[i] = get_bit(words, i)*par + avgActivity[i]*alpha
+
+
+# counter-based uniform in [0,1): splitmix64 hash of key + i, so each neuron gets its own
+# random number whatever the thread that draws it
+@njit(cache=True)
+def random_uniform (key, i):
+
+  z = key + np.uint64(i) * np.uint64(0x9e3779b97f4a7c15)
+  z = (z ^ (z >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+  z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+  z = z ^ (z >> np.uint64(31))
+
+  return (z >> np.uint64(11)) * (1. / 9007199254740992.)
+
+
+# same as update_state, on all the available threads: a single key is drawn from rng for
+# each substep, so the result does not depend on the number of threads
+@njit(parallel=True, cache=True)
+def update_state_parallel (n, prob, signal, sigma, numActive, rng):
+
+  offset = prob.size // 2
+  key = np.uint64(rng.integers(0, np.iinfo(np.int64).max))
+
+  for i in prange(n):
+    s = 1 if random_uniform(key, i) < prob[signal[i] + offset] else 0
+    sigma[i] = s
+    numActive += s
+
+  return numActive
+
+
+@njit(parallel=True, cache=True)
+def update_state_packed_parallel (n, prob, signal, words, numActive, rng):
+
+  offset = prob.size // 2
+  key = np.uint64(rng.integers(0, np.iinfo(np.int64).max))
+
+  for w in prange(words.size):
+    new = np.uint64(0)
+    for b in range(min(64, n - 64*w)):
+      i = 64*w + b
+      if random_uniform(key, i) < prob[signal[i] + offset]:
+        new |= ONE << np.uint64(b)
+    words[w] = new
+    numActive += popcount(new)
+
+  return numActive
+
+
+# copy of a kernel under another name, compiled with the given options and with some of
+# the globals it calls replaced: the on-disk cache is indexed by the name of the function,
+# so a plain recompilation of func.py_func would share (and overwrite) the entries of func
+def variant (func, suffix, parallel=False, **replace):
+  py_func = func.py_func
+  copy = types.FunctionType(py_func.__code__, dict(py_func.__globals__, **replace),
+                            py_func.__name__ + suffix, py_func.__defaults__, py_func.__closure__)
+  copy.__qualname__ = py_func.__qualname__ + suffix
+  return njit(parallel=parallel, cache=True)(copy)
+
+
+# parallel variants of the row-wise kernels (prange is a plain range in the serial ones)
+compute_signal_parallel = variant(compute_signal, '_parallel', parallel=True)
+compute_signal_dense_parallel = variant(compute_signal_dense, '_parallel', parallel=True)
+compute_signal_packed_parallel = variant(compute_signal_packed, '_parallel', parallel=True)
+update_average_activity_parallel = variant(update_average_activity, '_parallel', parallel=True)
+update_average_activity_packed_parallel = variant(update_average_activity_packed, '_parallel', parallel=True)
+
+
+# C[i,j] = w, with j drawn uniformly among the columns such that C[i,j] = 0
+# dense is either empty or a dense copy of C, kept up to date, that answers C[i,j] = 0
+# in O(1): the same j is drawn in both cases
+@njit(cache=True)
+def add_random_link (n, i, w, index, weight, count, dense, rng):
+
+  c = count[i]
+  mirror = dense.size > 0
+
+  if c >= n - 1:
+    return -1
+
+  if 2 * c < n - 1:
+    # rejection sampling: less than 2 expected trials
+    while True:
+      j = rng.integers(0, n)
+      if j == i:
+        continue
+      linked = False
+      if mirror:
+        linked = dense[i,j] != 0
+      else:
+        for k in range(c):
+          if index[i,k] == j:
+            linked = True
+            break
+      if not linked:
+        break
+
+  else:
+    if mirror:
+      linked = dense[i] != 0
+    else:
+      linked = np.zeros(n, dtype=np.bool_)
+      for k in range(c):
+        linked[index[i,k]] = True
+    linked[i] = True
+    r = rng.integers(0, n - 1 - c)
+    for j in range(n):
+      if not linked[j]:
+        if r == 0:
+          break
+        r -= 1
+
+  index[i,c] = j
+  weight[i,c] = w
+  count[i] = c + 1
+  if mirror:
+    dense[i,j] = w
+
+  return j
+
+
+# C[i,j] = 0, with j drawn uniformly among the columns such that C[i,j] != 0
+@njit(cache=True)
+def remove_random_link (i, index, weight, count, dense, rng):
+
+  c = count[i]
+
+  if c == 0:
+    return -1, 0
+
+  k = rng.integers(0, c)
+  j = index[i,k]
+  w = weight[i,k]
+  index[i,k] = index[i,c-1]
+  weight[i,k] = weight[i,c-1]
+  count[i] = c - 1
+  if dense.size > 0:
+    dense[i,j] = 0
+
+  return j, w
+
+
+# C[i,j] = w, for a known pair (i,j) such that C[i,j] = 0
+@njit(cache=True)
+def insert_link (i, j, w, index, weight, count):
+
+  c = count[i]
+  index[i,c] = j
+  weight[i,c] = w
+  count[i] = c + 1
+
+
+# C[i,j] = 0, for a known pair (i,j)
+@njit(cache=True)
+def delete_link (i, j, index, weight, count):
+
+  c = count[i]
+
+  for k in range(c):
+    if index[i,k] == j:
+      index[i,k] = index[i,c-1]
+      weight[i,k] = weight[i,c-1]
+      count[i] = c - 1
+      break
+
+
+# i drawn uniformly: add a link if A[i] ~ 0 (+1) or A[i] ~ 1 (-1), remove one otherwise
+@njit(cache=True)
+def evolve_connectivity (n, epsilon, avgActivity, index, weight, count, dense, rng):
+
+  i = rng.integers(0, n)
+  j, dPlus, dMinus = rewire(n, i, avgActivity[i], epsilon, index, weight, count, dense, rng)
+
+  return i, j, dPlus, dMinus
+
+
+# same as evolve_connectivity, with the lazy average activity of the active update (the one
+# of i is brought up to date before it is read)
+@njit(cache=True)
+def evolve_connectivity_active (n, epsilon, alpha, avgActivity, updated, index, weight, count,
+                                dense, rng):
+
+  i = rng.integers(0, n)
+  refresh_average_activity(i, alpha, avgActivity, updated)
+  j, dPlus, dMinus = rewire(n, i, avgActivity[i], epsilon, index, weight, count, dense, rng)
+
+  return i, j, dPlus, dMinus
+
+
+# connectivity change of the row i, given A = A[i]
+@njit(cache=True)
+def rewire (n, i, A, epsilon, index, weight, count, dense, rng):
+
+  dPlus = 0
+  dMinus = 0
+
+  if A < epsilon:
+    j = add_random_link(n, i, 1, index, weight, count, dense, rng)
+    if j >= 0: dPlus = 1
+
+  elif A > (1. - epsilon):
+    j = add_random_link(n, i, -1, index, weight, count, dense, rng)
+    if j >= 0: dMinus = 1
+
+  else:
+    j, w = remove_random_link(i, index, weight, count, dense, rng)
+    if w == 1: dPlus = -1
+    if w == -1: dMinus = -1
+
+  return j, dPlus, dMinus
+
+
+# degrees = (in+, in-, out+, out-): the links of row i and of column j follow the change of C[i,j]
+@njit(cache=True)
+def update_degrees (i, j, dPlus, dMinus, degrees):
 
-  return newAvgActivity
+  if j >= 0:
+    degrees[0,i] += dPlus
+    degrees[1,i] += dMinus
+    degrees[2,j] += dPlus
+    degrees[3,j] += dMinus
 
 
-@stencil
+# degrees = (in+, in-, out+, out-) of all the neurons, reading the rows of C in order (so that
+# memory-mapped rows are streamed once)
+@njit(cache=True)
+def count_degrees (index, weight, count, degrees):
+
+  for i in range(count.size):
+    for k in range(count[i]):
+      j = index[i,k]
+      if weight[i,k] == 1:
+        degrees[0,i] += 1
+        degrees[2,j] += 1
+      elif weight[i,k] == -1:
+        degrees[1,i] += 1
+        degrees[3,j] += 1
+
+
+# number of links of each column of an adjacency list
+@njit(cache=True)
+def count_columns (index, count, columns):
+
+  for i in range(count.size):
+    for k in range(count[i]):
+      columns[index[i,k]] += 1
+
+
+# adjacency list of the transpose of C (with enough capacity): the rows of C are read in order,
+# so each row of the transpose lists its links by increasing column
+@njit(cache=True)
+def transpose_links (index, weight, count, outIndex, outWeight, outCount):
+
+  for i in range(count.size):
+    for k in range(count[i]):
+      j = index[i,k]
+      c = outCount[j]
+      outIndex[j,c] = i
+      outWeight[j,c] = weight[i,k]
+      outCount[j] = c + 1
+
+
+# signal[i] += dC[i,j] * sigma[j], and the out-links of j follow the change of C[i,j]
+@njit(cache=True)
+def update_link (i, j, dPlus, dMinus, sigmaj, signal, outIndex, outWeight, outCount):
+
+  dC = dPlus - dMinus
+  signal[i] += dC * sigmaj
+
+  if dPlus + dMinus > 0:
+    insert_link(j, i, dC, outIndex, outWeight, outCount)
+  else:
+    delete_link(j, i, outIndex, outWeight, outCount)
+
+
+# active update: with the signal resident, a neuron can have signal > 0 only if one of its
+# positive in-links comes from an active neuron, so these neurons are found among the
+# out-neighbours of the active ones and each fires with probability f(signal). Every other
+# neuron fires with probability f(signal) <= f(0): the candidates are drawn at rate f(0)
+# by geometric skipping and each is accepted with probability f(signal) / f(0) (thinning)
+# active[0] holds the number of active neurons in active[0,0] and their indices after it,
+# active[1] receives the new active neurons from the front and the neurons with signal > 0
+# that do not fire from the back; mark is zero outside this kernel
+# it returns numActive incremented by the new number of active neurons, and the flips
+@njit(cache=True)
+def update_state_active (prob, signal, sigma, numActive, rng, flips, active, mark,
+                         outIndex, outWeight, outCount):
+
+  n = sigma.size
+  offset = prob.size // 2
+  numOld = active[0,0]
+  numNew = 0
+  numQuiet = 0
+
+  # neurons with signal > 0 (mark = 1, or 2 if they fire)
+  for a in range(1, numOld + 1):
+    j = active[0,a]
+    for k in range(outCount[j]):
+      i = outIndex[j,k]
+      if outWeight[j,k] > 0 and mark[i] == 0 and signal[i] > 0:
+        if rng.random() < prob[signal[i] + offset]:
+          mark[i] = 2
+          numNew += 1
+          active[1,numNew] = i
+        else:
+          mark[i] = 1
+          active[1,n-numQuiet] = i
+          numQuiet += 1
+
+  # neurons with signal <= 0
+  q = prob[offset]
+  if q > 0.:
+    logq = np.log1p(-q)
+    i = -1
+    while True:
+      skip = np.log(1. - rng.random()) / logq
+      if skip >= n - 1 - i:
+        break
+      i += 1 + int(skip)
+      if mark[i] == 0 and rng.random() * q < prob[signal[i] + offset]:
+        mark[i] = 2
+        numNew += 1
+        active[1,numNew] = i
+
+  numFlips = 0
+
+  for a in range(1, numOld + 1):
+    j = active[0,a]
+    if mark[j] != 2:
+      sigma[j] = 0
+      flips[numFlips] = ~j
+      numFlips += 1
+
+  for a in range(1, numNew + 1):
+    i = active[1,a]
+    if sigma[i] == 0:
+      sigma[i] = 1
+      flips[numFlips] = i
+      numFlips += 1
+
+  for a in range(numQuiet):
+    mark[active[1,n-a]] = 0
+
+  for a in range(1, numNew + 1):
+    i = active[1,a]
+    mark[i] = 0
+    active[0,a] = i
+
+  active[0,0] = numNew
+
+  return numActive + numNew, numFlips
+
+
+# lazy average activity of the active update: updated[i] is the substep up to which A[i] is
+# up to date, updated[n] the current substep, and while i is inactive
+# A[i](t) = A[i](updated[i]) * alpha^(t - updated[i])
+@njit(cache=True)
+def decay (A, alpha, d):
+
+  if d == 0:
+    return A
+  if d == 1:
+    return A * alpha
+
+  return A * alpha**d
+
+
+@njit(cache=True)
+def refresh_average_activity (i, alpha, avgActivity, updated):
+
+  t = updated[-1]
+  avgActivity[i] = decay(avgActivity[i], alpha, t - updated[i])
+  updated[i] = t
+
+
+# A = sigma*(1-alpha) + A*alpha, only for the active neurons (see refresh_average_activity)
+@njit(cache=True)
+def update_average_activity_active (alpha, avgActivity, active, updated):
+
+  par = 1. - alpha
+  t = updated[-1]
+
+  for a in range(1, active[0,0] + 1):
+    i = active[0,a]
+    avgActivity[i] = par + decay(avgActivity[i], alpha, t - updated[i])*alpha
+    updated[i] = t + 1
+
+  updated[-1] = t + 1
+
+
+# bring the whole lazy average activity up to date
+@njit(cache=True)
+def flush_average_activity (alpha, avgActivity, updated):
+
+  for i in range(avgActivity.size):
+    refresh_average_activity(i, alpha, avgActivity, updated)
+
+
+# tau steps of state evolution: the state is either sigma or, if packed, words (the other
+# one is unused)
+@njit(cache=True)
+def evolve_state (n, alpha, prob, tau, sigma, words, packed, avgActivity, index, weight, count,
+                  dense, rng, incremental, signal, flips, outIndex, outWeight, outCount, active,
+                  updated, mark, substepActive):
+
+  numActive = 0
+
+  for t in range(tau):
+
+    prevActive = numActive
+
+    if packed:
+      if not incremental:
+        compute_signal_packed(n, words, index, weight, count, signal)
+      numActive, numFlips = update_state_packed(n, prob, signal, words, numActive, rng, flips)
+      update_average_activity_packed(n, words, alpha, avgActivity)
+    elif active.size > 0:
+      numActive, numFlips = update_state_active(prob, signal, sigma, numActive, rng, flips, active,
+                                                mark, outIndex, outWeight, outCount)
+      update_average_activity_active(alpha, avgActivity, active, updated)
+    else:
+      if not incremental and dense.size > 0:
+        compute_signal_dense(n, sigma, dense, signal)
+      elif not incremental:
+        compute_signal(n, sigma, index, weight, count, signal)
+      numActive, numFlips = update_state(n, prob, signal, sigma, numActive, rng, flips)
+      update_average_activity(n, sigma, alpha, avgActivity)
+
+    if incremental:
+      propagate_flips(numFlips, flips, signal, outIndex, outWeight, outCount)
+
+    if substepActive.size > 0:
+      substepActive[t] = numActive - prevActive
+
+  return numActive
+
+
+# same as evolve_state with the parallel kernels (full update only): it is a separate
+# function so that the serial loop never compiles them
+@njit(cache=True)
+def evolve_state_parallel (n, alpha, prob, tau, sigma, words, packed, avgActivity, index, weight,
+                           count, dense, rng, incremental, signal, flips, outIndex, outWeight,
+                           outCount, active, updated, mark, substepActive):
+
+  numActive = 0
+
+  for t in range(tau):
+
+    prevActive = numActive
+
+    if packed:
+      compute_signal_packed_parallel(n, words, index, weight, count, signal)
+      numActive = update_state_packed_parallel(n, prob, signal, words, numActive, rng)
+      update_average_activity_packed_parallel(n, words, alpha, avgActivity)
+    else:
+      if dense.size > 0:
+        compute_signal_dense_parallel(n, sigma, dense, signal)
+      else:
+        compute_signal_parallel(n, sigma, index, weight, count, signal)
+      numActive = update_state_parallel(n, prob, signal, sigma, numActive, rng)
+      update_average_activity_parallel(n, sigma, alpha, avgActivity)
+
+    if substepActive.size > 0:
+      substepActive[t] = numActive - prevActive
+
+  return numActive
+
+
+# full evolution loop: it stops early if a row of an adjacency list gets full
+# the activity of each substep is recorded in substepActive, unless it is empty
+# the active update (with a resident signal) is used if active is not empty
+@njit(cache=True)
+def evolve (evolution_steps, n, alpha, prob, tau, epsilon, sigma, words, packed, avgActivity,
+            index, weight, count, dense, degrees, linksPlus, linksMinus, avgActive, degPlus,
+            degMinus, substepActive, rng, incremental, signal, flips, outIndex, outWeight,
+            outCount, active, updated, mark):
+
+  capacity = index.shape[1]
+  outCapacity = outIndex.shape[1]
+
+  for step in range(evolution_steps):
+
+    numActive = evolve_state(n, alpha, prob, tau, sigma, words, packed, avgActivity,
+                             index, weight, count, dense, rng, incremental,
+                             signal, flips, outIndex, outWeight, outCount, active, updated,
+                             mark, substepActive[step*tau:(step+1)*tau])
+
+    if active.size > 0:
+      i, j, dPlus, dMinus = evolve_connectivity_active(n, epsilon, alpha, avgActivity, updated,
+                                                       index, weight, count, dense, rng)
+    else:
+      i, j, dPlus, dMinus = evolve_connectivity(n, epsilon, avgActivity, index, weight, count,
+                                                dense, rng)
+    linksPlus += dPlus
+    linksMinus += dMinus
+    update_degrees(i, j, dPlus, dMinus, degrees)
+
+    avgActive[step] = numActive
+    degPlus[step] = linksPlus
+    degMinus[step] = linksMinus
+
+    if incremental and j >= 0:
+      sigmaj = get_bit(words, j) if packed else sigma[j]
+      update_link(i, j, dPlus, dMinus, sigmaj, signal, outIndex, outWeight, outCount)
+      if outCount[j] >= outCapacity and outCapacity < n:
+        return step + 1, linksPlus, linksMinus
+
+    if count[i] >= capacity and capacity < n:
+      return step + 1, linksPlus, linksMinus
+
+  return evolution_steps, linksPlus, linksMinus
+
+
+# same as evolve with evolve_state_parallel (a dispatcher passed as an argument would be
+# typed by its identity, which cannot be cached across processes)
+evolve_parallel = variant(evolve, '_parallel', evolve_state=evolve_state_parallel)
+
+
+# evolution loop of a stack of independent networks, advanced together step by step
+@njit(cache=True)
+def evolve_ensemble (evolution_steps, n, alpha, probs, tau, epsilon, sigma, avgActivity,
+                     index, weight, count, linksPlus, linksMinus, avgActive, degPlus, degMinus,
+                     rng):
+
+  capacity = index.shape[2]
+  signal = np.empty(n, dtype=np.int32)
+  flips = np.empty(0, dtype=np.int32)
+  dense = np.empty((0, 0), dtype=np.int8)
+  full = False
+
+  for step in range(evolution_steps):
+
+    for r in range(probs.shape[0]):
+
+      numActive = 0
+      for _ in range(tau):
+        compute_signal(n, sigma[r], index[r], weight[r], count[r], signal)
+        numActive, numFlips = update_state(n, probs[r], signal, sigma[r], numActive, rng, flips)
+        update_average_activity(n, sigma[r], alpha, avgActivity[r])
+
+      i, _, dPlus, dMinus = evolve_connectivity(n, epsilon, avgActivity[r],
+                                                index[r], weight[r], count[r], dense, rng)
+      linksPlus[r] += dPlus
+      linksMinus[r] += dMinus
+
+      avgActive[r,step] = numActive
+      degPlus[r,step] = linksPlus[r]
+      degMinus[r,step] = linksMinus[r]
+
+      if count[r,i] >= capacity and capacity < n:
+        full = True
+
+    if full:
+      return step + 1
+
+  return evolution_steps
+
+
+# avalanche: maximal run of substeps with activity above threshold
+# size = sum_t (A(t) - threshold), duration = number of substeps
+# state holds the size and the duration of the avalanche in progress, so that it
+# can continue across calls; moments accumulates (N, sum ln x) of the sizes and
+# of the durations x >= xmin
+@njit(cache=True)
+def detect_avalanches (activity, threshold, xmin, state, sizeHist, durationHist, moments):
+
+  for t in range(activity.size):
+
+    excess = activity[t] - threshold
+
+    if excess > 0:
+      state[0] += excess
+      state[1] += 1
+
+    elif state[1] > 0:
+      size, duration = state[0], state[1]
+      sizeHist[log2_bin(size)] += 1
+      durationHist[log2_bin(duration)] += 1
+      if size >= xmin:
+        moments[0] += 1
+        moments[1] += np.log(size)
+      if duration >= xmin:
+        moments[2] += 1
+        moments[3] += np.log(duration)
+      state[0] = 0
+      state[1] = 0
+
+
+# floor(log2(x)) for x >= 1
+@njit(cache=True)
+def log2_bin (x):
+
+  b = 0
+  while x > 1:
+    x >>= 1
+    b += 1
+
+  return b
+
+
+# lambda(t) = A(t) / A(t-1)
+@njit(cache=True)
 def compute_branching_par (arr):
 
-  par = 0.
+  par = np.zeros(arr.size, dtype=np.float64)
 
-  if arr[-1] != 0:
-    par = arr[0] / arr[-1]
+  for t in range(1, arr.size):
+    if arr[t-1] != 0:
+      par[t] = arr[t] / arr[t-1]
 
   return par
+
+
+# preferential attachment: each new node t >= m links to m distinct older nodes, drawn with
+# probability proportional to their degree (uniform draws from the list of link endpoints)
+@njit(cache=True)
+def barabasi_albert (n, m, rng):
+
+  size = m * (n - m)
+  src = np.empty(size, dtype=np.int64)
+  dst = np.empty(size, dtype=np.int64)
+  endpoints = np.empty(2 * size, dtype=np.int64)
+  chosen = np.arange(m)
+  e = 0
+
+  for t in range(m, n):
+
+    if t > m:
+      c = 0
+      while c < m:
+        x = endpoints[rng.integers(0, 2 * e)]
+        linked = False
+        for q in range(c):
+          if chosen[q] == x:
+            linked = True
+            break
+        if not linked:
+          chosen[c] = x
+          c += 1
+
+    for q in range(m):
+      src[e] = t
+      dst[e] = chosen[q]
+      endpoints[2*e] = t
+      endpoints[2*e+1] = chosen[q]
+      e += 1
+
+  return src, dst
+
+
+# sums over the pairs (x[t], x[t+k]) of a block, for k = 1, ..., kmax:
+# out[:,k-1] += (N, sum x[t], sum x[t+k], sum x[t]^2, sum x[t] x[t+k])
+@njit(cache=True)
+def lagged_moments (x, kmax, out):
+
+  for k in range(1, kmax + 1):
+    for t in range(x.size - k):
+      a = x[t]
+      b = x[t+k]
+      out[0,k-1] += 1.
+      out[1,k-1] += a
+      out[2,k-1] += b
+      out[3,k-1] += a * a
+      out[4,k-1] += a * b
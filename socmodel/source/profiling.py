@@ -0,0 +1,83 @@
+import time
+from contextlib import nullcontext
+
+
+class Profiler:
+
+  '''
+  Accumulator of the wall time and of the number of calls of the phases of a
+  simulation, plus named event counters (e.g. the reallocations of the
+  adjacency lists).
+  A phase is timed by entering the context manager returned by phase(name).
+  '''
+
+  def __init__ (self):
+
+    self.times    = {}
+    self.calls    = {}
+    self.counters = {}
+    self._phases  = {}
+
+
+  def phase (self, name):
+
+    if name not in self._phases:
+      self._phases[name] = _Phase(self, name)
+      self.times[name] = 0.
+      self.calls[name] = 0
+
+    return self._phases[name]
+
+
+  def count (self, name, value=1):
+    self.counters[name] = self.counters.get(name, 0) + value
+
+
+  def report (self):
+
+    '''
+    Return the accumulated measurements as a dict with the keys "phases" (for
+    each phase, its total time in seconds, number of calls and mean time per
+    call) and "counters".
+    '''
+
+    phases = {name: {'time': self.times[name], 'calls': self.calls[name],
+                     'mean': self.times[name] / max(self.calls[name], 1)}
+              for name in self.times}
+
+    return {'phases': phases, 'counters': dict(self.counters)}
+
+
+class _Phase:
+
+  __slots__ = ('profiler', 'name', 'start')
+
+  def __init__ (self, profiler, name):
+    self.profiler = profiler
+    self.name = name
+
+  def __enter__ (self):
+    self.start = time.perf_counter()
+
+  def __exit__ (self, *args):
+    self.profiler.times[self.name] += time.perf_counter() - self.start
+    self.profiler.calls[self.name] += 1
+
+
+class NullProfiler:
+
+  '''
+  Profiler that measures nothing: its phases are a shared no-op context
+  manager, so an unprofiled run pays a single method call per phase.
+  '''
+
+  _phase = nullcontext()
+
+  def phase (self, name):
+    return self._phase
+
+  def count (self, name, value=1):
+    pass
+
+  def report (self):
+    return {'phases': {}, 'counters': {}}
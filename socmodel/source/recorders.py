@@ -0,0 +1,230 @@
+import numpy as np
+
+
+class BaseRecorder ():
+
+  '''
+  Base class of the recorders of the observables of a run (see Network.run).
+  A recorder stores the value of its observable after every evolution step
+  that is a multiple of stride (counted by Network.step), keeping either all
+  the values, the last size values (ring buffer) or a uniform random sample
+  of size values (reservoir sampling).
+  Subclasses implement _observe(net, chunk), which returns the values of the
+  observable for the steps of a chunk: chunk is a dict of arrays holding,
+  for each selected step, its index "step" and the observables "Kplus",
+  "Kminus", "activity" and "branchPar" (as returned by Network.run).
+  Snapshot recorders (snapshot = True) read the state of the network instead,
+  so they are called at the end of the chunks, which are cut at the multiples
+  of their stride.
+
+  Parameters
+  ----------
+    stride : int, default=1
+      Sampling stride in evolution steps
+
+    mode : str, default='all'
+      "all" keeps every sample, "ring" keeps the last size samples,
+      "reservoir" keeps a uniform random sample of size samples
+
+    size : int, default=None
+      Number of samples kept by the "ring" and "reservoir" modes
+
+    seed : int or np.random.Generator, default=None
+      Seed of the reservoir sampling
+  '''
+
+  snapshot = False
+
+  def __init__ (self, stride=1, mode='all', size=None, seed=None):
+
+    if not stride >= 1:
+      raise ValueError('Invalid "stride" passed. "stride" must be greater or equal than 1.')
+
+    if mode not in ('all', 'ring', 'reservoir'):
+      raise ValueError('Invalid "mode" passed. "mode" must be "all", "ring" or "reservoir".')
+
+    if mode != 'all' and (size is None or not size >= 1):
+      raise ValueError(f'Invalid "size" passed. "size" must be greater or equal than 1 in "{mode}" mode.')
+
+    self.stride = int(stride)
+    self.mode   = mode
+    self.size   = size
+    self.rng    = np.random.default_rng(seed)
+
+    # number of samples offered to the buffer
+    self.seen = 0
+    self._steps  = [] if mode == 'all' else None
+    self._values = [] if mode == 'all' else None
+
+
+  def __repr__ (self):
+    class_name = self.__class__.__qualname__
+    return f'{class_name}(stride={self.stride}, mode={self.mode}, size={self.size}, seen={self.seen})'
+
+
+  def record (self, net, chunk):
+
+    '''
+    Store the samples of a chunk of evolution steps of net.
+
+    Parameters
+    ----------
+      net : Network
+        Network at the end of the chunk
+
+      chunk : dict of arrays
+        Index and observables of each step of the chunk
+    '''
+
+    if self.snapshot:
+      if net.step % self.stride == 0 and chunk['step'].size > 0:
+        self._store(np.array([net.step]), self._observe(net, None)[None])
+    else:
+      mask = chunk['step'] % self.stride == 0
+      if mask.any():
+        selected = {key: values[mask] for key, values in chunk.items()}
+        self._store(selected['step'], self._observe(net, selected))
+
+
+  def _observe (self, net, chunk):
+    raise NotImplementedError
+
+
+  def _store (self, steps, values):
+
+    if self.mode == 'all':
+      self._steps.append(steps)
+      self._values.append(values)
+      self.seen += steps.size
+      return
+
+    if self._values is None:
+      self._steps = np.zeros(self.size, dtype=np.int64)
+      self._values = np.zeros((self.size,) + values.shape[1:], dtype=values.dtype)
+
+    if self.mode == 'ring':
+      # only the last size samples of the chunk can survive
+      skip = max(steps.size - self.size, 0)
+      slots = (self.seen + skip + np.arange(steps.size - skip)) % self.size
+      self._steps[slots] = steps[skip:]
+      self._values[slots] = values[skip:]
+      self.seen += steps.size
+      return
+
+    # reservoir sampling (algorithm R): sample t replaces a random slot with probability size/(t+1)
+    fill = min(max(self.size - self.seen, 0), steps.size)
+    self._steps[self.seen:self.seen+fill] = steps[:fill]
+    self._values[self.seen:self.seen+fill] = values[:fill]
+
+    t = self.seen + np.arange(fill, steps.size)
+    slots = self.rng.integers(0, t + 1) if t.size > 0 else t
+    for k in np.flatnonzero(slots < self.size):
+      self._steps[slots[k]] = steps[fill+k]
+      self._values[slots[k]] = values[fill+k]
+
+    self.seen += steps.size
+
+
+  @property
+  def steps (self):
+
+    '''
+    Evolution steps of the kept samples, in increasing order.
+    '''
+
+    return self._collect()[0]
+
+
+  @property
+  def values (self):
+
+    '''
+    Kept samples, ordered by evolution step.
+    '''
+
+    return self._collect()[1]
+
+
+  def _collect (self):
+
+    if self.mode == 'all':
+      if not self._steps:
+        return np.zeros(0, dtype=np.int64), None
+      return np.concatenate(self._steps), np.concatenate(self._values)
+
+    kept = min(self.seen, self.size)
+    if kept == 0:
+      return np.zeros(0, dtype=np.int64), None
+
+    order = np.argsort(self._steps[:kept], kind='stable')
+    return self._steps[order], self._values[order]
+
+
+class DegreeRecorder (BaseRecorder):
+
+  '''
+  Record the mean number of positive and negative links per neuron: each
+  sample is the pair (Kplus, Kminus).
+  '''
+
+  def _observe (self, net, chunk):
+    return np.stack([chunk['Kplus'], chunk['Kminus']], axis=1)
+
+
+class LinkRecorder (BaseRecorder):
+
+  '''
+  Record the number of positive and negative links: each sample is the pair
+  (linksPlus, linksMinus).
+  '''
+
+  def _observe (self, net, chunk):
+    links = np.stack([chunk['Kplus'], chunk['Kminus']], axis=1).astype(np.float64) * net.n
+    return np.rint(links).astype(np.int64)
+
+
+class ActivityRecorder (BaseRecorder):
+
+  '''
+  Record the mean activity of the network over the tau substeps of the state
+  evolution preceding each connectivity step.
+  '''
+
+  def _observe (self, net, chunk):
+    return chunk['activity'].copy()
+
+
+class BranchingRecorder (BaseRecorder):
+
+  '''
+  Record the branching parameter (see Network.run).
+  '''
+
+  def _observe (self, net, chunk):
+    return chunk['branchPar'].copy()
+
+
+class InDegreeRecorder (BaseRecorder):
+
+  '''
+  Record the histogram of the in-degrees of the neurons (see
+  Network.degree_stats): each sample is an array of length n + 1 whose k-th
+  entry is the number of neurons with k incoming links (of either sign).
+  '''
+
+  snapshot = True
+
+  def _observe (self, net, chunk):
+    return np.bincount(net.degrees[0] + net.degrees[1], minlength=net.n + 1)
+
+
+class StateRecorder (BaseRecorder):
+
+  '''
+  Record snapshots of the state vector sigma.
+  '''
+
+  snapshot = True
+
+  def _observe (self, net, chunk):
+    return net.sigma.copy()
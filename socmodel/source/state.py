@@ -5,6 +5,8 @@ class BaseState ():
 
   '''
   Base class for state vector initialization.
+  Subclasses implement get(size, rng=None), where rng is a seed or a
+  np.random.Generator (see np.random.default_rng).
   '''
 
 
@@ -18,7 +20,7 @@ class ZerosState (BaseState):
   def __init__ (self):
     super(ZerosState, self).__init__()
 
-  def get (self, size):
+  def get (self, size, rng=None):
     return np.zeros(shape=size, dtype=np.int8)
 
 
@@ -32,7 +34,7 @@ class OnesState (BaseState):
   def __init__ (self):
     super(OnesState, self).__init__()
 
-  def get (self, size):
+  def get (self, size, rng=None):
     return np.ones(shape=size, dtype=np.int8)
 
 
@@ -48,5 +50,6 @@ class RandomState (BaseState):
     self.p = p
     super(RandomState, self).__init__()
 
-  def get (self, size):
-    return np.where(np.random.rand(size) < self.p, 1, 0).astype(np.int8)
+  def get (self, size, rng=None):
+    rng = np.random.default_rng(rng)
+    return np.where(rng.random(size) < self.p, 1, 0).astype(np.int8)
@@ -0,0 +1,140 @@
+import os
+import numpy as np
+
+
+class TrajectoryWriter:
+
+  '''
+  Append-only writer of simulation observables to a .npy file holding a 1-D
+  structured array (one field for each observable).
+  The header is rewritten in place after each append, so the file is always a
+  valid .npy file that can be opened with np.load(path, mmap_mode='r') while
+  the simulation is still running.
+
+  Parameters
+  ----------
+    path : str
+      Path of the .npy file
+
+    fields : sequence of str, default=('Kplus', 'Kminus', 'branchPar')
+      Names of the observables, in the order they are passed to append
+
+    dtype : numpy dtype or sequence of numpy dtypes, default=(np.float32, np.float32, np.float64)
+      Data type of the observables, either shared by all the fields or one for
+      each of them (the default matches the arrays returned by Network.run)
+
+    mode : str, default='w'
+      "w" creates a new file (overwriting any existing one), "a" appends to an
+      existing trajectory file (created if missing)
+  '''
+
+  magic = b'\x93NUMPY\x01\x00'
+
+  def __init__ (self, path, fields=('Kplus', 'Kminus', 'branchPar'),
+                dtype=(np.float32, np.float32, np.float64), mode='w'):
+
+    if mode not in ('w', 'a'):
+      raise ValueError('Invalid "mode" passed. "mode" must be "w" or "a".')
+
+    dtypes = list(dtype) if isinstance(dtype, (list, tuple)) else [dtype] * len(fields)
+    if len(dtypes) != len(fields):
+      raise ValueError('Invalid "dtype" passed. "dtype" must have one element for each field.')
+
+    self.path   = path
+    self.dtype  = np.dtype(list(zip(fields, dtypes)))
+    self.length = 0
+
+    # reserve room for the largest possible shape, so the data offset never changes
+    self.header_size = len(self._header(length=np.iinfo(np.int64).max))
+
+    if mode == 'a' and os.path.exists(path):
+      existing = np.load(path, mmap_mode='r')
+      if existing.dtype != self.dtype:
+        raise ValueError(f'Invalid "fields" passed. The file "{path}" stores {existing.dtype}.')
+      self.length = existing.shape[0]
+      self.header_size = existing.offset
+      del existing
+      self._file = open(path, 'r+b')
+      self._file.seek(0, os.SEEK_END)
+
+    else:
+      self._file = open(path, 'w+b')
+      self._file.write(self._header(length=0, size=self.header_size))
+      self._file.flush()
+
+
+  def __enter__ (self):
+    return self
+
+
+  def __exit__ (self, *args):
+    self.close()
+
+
+  def _header (self, length, size=None):
+
+    header = {'descr': np.lib.format.dtype_to_descr(self.dtype),
+              'fortran_order': False,
+              'shape': (length,)}
+    header = repr(header).encode('latin1')
+    preamble = len(self.magic) + 2
+
+    if size is None:
+      size = -(-(preamble + len(header) + 1) // 64) * 64
+
+    header += b' ' * (size - preamble - len(header) - 1) + b'\n'
+
+    # the header length is a little-endian unsigned short, whatever the platform
+    return self.magic + np.array(len(header), dtype='<u2').tobytes() + header
+
+
+  def append (self, *observables):
+
+    '''
+    Append a chunk of observables (one array for each field, all of the same
+    length) to the end of the file.
+    '''
+
+    if len(observables) != len(self.dtype.names):
+      raise ValueError(f'Invalid observables passed. Expected {len(self.dtype.names)} arrays.')
+
+    chunk = np.empty(len(observables[0]), dtype=self.dtype)
+    for field, values in zip(self.dtype.names, observables):
+      chunk[field] = values
+
+    self._file.seek(0, os.SEEK_END)
+    self._file.write(chunk.tobytes())
+    self.length += chunk.size
+
+    self._file.seek(0)
+    self._file.write(self._header(length=self.length, size=self.header_size))
+    self._file.flush()
+
+
+  def truncate (self, length):
+
+    '''
+    Drop the records beyond the given length, e.g. the ones written after the
+    last checkpoint of a simulation that is going to be resumed.
+    '''
+
+    self.length = min(self.length, length)
+    self._file.truncate(self.header_size + self.length * self.dtype.itemsize)
+
+    self._file.seek(0)
+    self._file.write(self._header(length=self.length, size=self.header_size))
+    self._file.flush()
+
+
+  def close (self):
+    self._file.close()
+
+
+def load_trajectory (path):
+
+  '''
+  Open a trajectory written by TrajectoryWriter as a read-only memory-mapped
+  structured array.
+  '''
+
+  return np.load(path, mmap_mode='r')
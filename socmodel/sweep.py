@@ -0,0 +1,238 @@
+import itertools
+import os
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tqdm import tqdm
+
+from socmodel.source.network import Network
+
+
+def make_grid (grid, **params):
+
+  '''
+  Expand a grid over the Network constructor parameters into the list of its
+  points (cartesian product of the given values), in row-major order.
+  The keyword arguments are fixed parameters shared by all the points.
+  '''
+
+  keys = list(grid.keys())
+  points = []
+
+  for values in itertools.product(*[grid[key] for key in keys]):
+    point = dict(params)
+    point.update(zip(keys, values))
+    points.append(point)
+
+  return points
+
+
+def run_point (params, evolution_steps, seed, engine='numba', until_converged=None):
+
+  '''
+  Run a single simulation of a Network seeded with the given SeedSequence.
+  '''
+
+  net = Network(**params, seed=seed)
+  return net.run(evolution_steps=evolution_steps, progressbar=False, engine=engine,
+                 until_converged=until_converged)
+
+
+def iter_sweep (grid, evolution_steps, seed=None, max_workers=None, engine='numba',
+                until_converged=None, **params):
+
+  '''
+  Run a simulation for each point of the grid over the Network constructor
+  parameters on a pool of processes, yielding the results as they finish.
+
+  Parameters
+  ----------
+    grid : dict
+      Map from Network constructor parameter names to the sequences of values
+      to sweep over
+
+    evolution_steps : int
+      Number of evolution steps of each simulation
+
+    seed : int or SeedSequence, default=None
+      Root seed: each point gets its own child SeedSequence spawned from it,
+      so the results do not depend on the number of workers or on the order
+      of completion
+
+    max_workers : int, default=None
+      Number of worker processes (default is the number of processors)
+
+    engine : str, default='numba'
+      Simulation engine passed to Network.run
+
+    until_converged : StationarityCriterion, default=None
+      Stop each simulation when its observables are stationary, evolution_steps
+      being the maximum number of steps (see Network.run)
+
+    **params
+      Fixed Network constructor parameters shared by all the points (with
+      memmap_dir, each point gets its own subdirectory of it)
+
+  Yields
+  ------
+    (k, point, (degPlus, degMinus, branchPar)) for each completed point, k
+    being the index of the point in the grid. With until_converged, the
+    arrays stop at the convergence and the number of steps at which it was
+    declared (None if it was not) is appended to them
+  '''
+
+  points = make_grid(grid, **params)
+  root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+  seeds = root.spawn(len(points))
+
+  # the memory-mapped networks of the points run at the same time, each in its own subdirectory
+  if params.get('memmap_dir') is not None:
+    for k, point in enumerate(points):
+      point['memmap_dir'] = os.path.join(params['memmap_dir'], str(k))
+
+  # spawned workers do not inherit the threads started by the Numba kernels of the parent
+  context = multiprocessing.get_context('spawn')
+
+  with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+
+    futures = {executor.submit(run_point, point, evolution_steps, s, engine, until_converged) : k
+               for k, (point, s) in enumerate(zip(points, seeds))}
+
+    for future in as_completed(futures):
+      k = futures[future]
+      yield k, points[k], future.result()
+
+
+def make_records (grid, points, evolution_steps, until_converged=None):
+
+  '''
+  Allocate the structured array of the results of a sweep over the points of
+  grid (see sweep).
+  '''
+
+  fields = []
+
+  for key in grid.keys():
+    values = np.asarray(list(grid[key]))
+    dtype = values.dtype if values.dtype.kind in 'biuf' else object
+    fields.append((key, dtype))
+
+  fields += [(name, np.float32, (evolution_steps,)) for name in ('Kplus', 'Kminus')]
+  fields += [('branchPar', np.float64, (evolution_steps,))]
+  if until_converged is not None:
+    fields += [('converged', np.int64)]
+
+  return np.empty(len(points), dtype=fields)
+
+
+def fill_record (records, k, point, result, until_converged=None):
+
+  '''
+  Store the point and the result of Network.run in the k-th record, padding
+  the time series with nan after the convergence.
+  '''
+
+  for key in records.dtype.names:
+    if key in point:
+      records[key][k] = point[key]
+
+  for name, values in zip(('Kplus', 'Kminus', 'branchPar'), result):
+    records[name][k] = np.nan
+    records[name][k][:values.size] = values
+
+  if until_converged is not None:
+    records['converged'][k] = result[3] if result[3] is not None else -1
+
+
+def sweep (grid, evolution_steps, seed=None, max_workers=None, engine='numba',
+           progressbar=True, until_converged=None, **params):
+
+  '''
+  Run iter_sweep and collect its results in a structured array with one
+  record for each point of the grid (in grid order): one field for each swept
+  parameter, plus the fields "Kplus", "Kminus" and "branchPar" holding the
+  corresponding time series of length evolution_steps.
+  With until_converged, the time series are padded with nan after the
+  convergence, and the field "converged" holds the number of steps at which
+  it was declared (-1 if it was not).
+  '''
+
+  points = make_grid(grid, **params)
+  records = make_records(grid, points, evolution_steps, until_converged)
+
+  results = iter_sweep(grid, evolution_steps, seed=seed, max_workers=max_workers,
+                       engine=engine, until_converged=until_converged, **params)
+
+  for k, point, result in tqdm(results, total=len(points), desc='Running simulations',
+                               disable=(not progressbar), ncols=100):
+    fill_record(records, k, point, result, until_converged)
+
+  return records
+
+
+def continuation_sweep (param, values, evolution_steps, seed=None, engine='numba',
+                        progressbar=True, until_converged=None, **params):
+
+  '''
+  Sweep a Network parameter by continuation: the first point starts from the
+  initializers, and each following point starts from the final state of the
+  previous one (see Network.clone), so that only the first point pays the
+  full transient. The points run in sequence, in the given order.
+
+  Parameters
+  ----------
+    param : str
+      Name of the swept parameter (alpha, beta or tau)
+
+    values : sequence
+      Values of the swept parameter, in the order they are visited (adjacent
+      values should be close, so that the previous state is a good start)
+
+    evolution_steps : int
+      Number of evolution steps of each point (the maximum number of steps
+      with until_converged)
+
+    seed : int or SeedSequence, default=None
+      Root seed: each point draws its random numbers from its own child
+      SeedSequence spawned from it
+
+    engine : str, default='numba'
+      Simulation engine passed to Network.run
+
+    progressbar : bool, default=True
+      Show the progress bar
+
+    until_converged : StationarityCriterion, default=None
+      Stop each point when its observables are stationary (see Network.run)
+
+    **params
+      Fixed Network constructor parameters (with memmap_dir, the networks
+      of consecutive points alternate between two of its subdirectories)
+
+  Returns
+  -------
+    structured array with one record for each value, as returned by sweep
+  '''
+
+  grid = {param: values}
+  points = make_grid(grid, **params)
+  records = make_records(grid, points, evolution_steps, until_converged)
+
+  root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+  seeds = root.spawn(len(points))
+  net = None
+
+  for k in tqdm(range(len(points)), desc='Running simulations', disable=(not progressbar), ncols=100):
+    if net is None:
+      net = Network(**points[k], seed=seeds[k])
+    elif params.get('memmap_dir') is None:
+      net = net.clone(**{param: points[k][param]}, seed=seeds[k])
+    else:
+      # a memory-mapped network is cloned to the other of two subdirectories of memmap_dir
+      memmap_dir = os.path.join(params['memmap_dir'], str(k % 2))
+      net = net.clone(**{param: points[k][param]}, seed=seeds[k], memmap_dir=memmap_dir)
+    result = net.run(evolution_steps=evolution_steps, progressbar=False, engine=engine,
+                     until_converged=until_converged)
+    fill_record(records, k, points[k], result, until_converged)
+
+  return records
@@ -0,0 +1,262 @@
+import numpy as np
+
+from socmodel.source.numbafunc import lagged_moments
+
+
+def iter_blocks (x, block_size):
+
+  '''
+  Yield the consecutive blocks of block_size elements of a 1-D array (the
+  last one can be shorter) as float64 arrays, so that a memory-mapped
+  trajectory is read one block at a time.
+  '''
+
+  for start in range(0, len(x), block_size):
+    yield np.asarray(x[start:start+block_size], dtype=np.float64)
+
+
+def block_moments (x, kmax, block_size=100000):
+
+  '''
+  Compute, for each block of block_size elements of x and for each lag
+  k = 1, ..., kmax, the sums over the pairs (x[t], x[t+k]) inside the block
+  needed by the regression of x[t+k] on x[t]: the number of pairs, the sums
+  of x[t] and of x[t+k], the sum of x[t]^2 and the sum of x[t] x[t+k].
+  The pairs across two blocks are neglected.
+
+  Parameters
+  ----------
+    x : array_like
+      1-D time series (e.g. a memory-mapped trajectory field)
+
+    kmax : int
+      Largest lag
+
+    block_size : int, default=100000
+      Number of elements of each block
+
+  Returns
+  -------
+    array of shape (number of blocks, 5, kmax)
+  '''
+
+  if not kmax >= 1:
+    raise ValueError('Invalid "kmax" passed. "kmax" must be greater or equal than 1.')
+
+  if not block_size > kmax:
+    raise ValueError('Invalid "block_size" passed. "block_size" must be greater than "kmax".')
+
+  moments = np.zeros(shape=(-(-len(x) // block_size), 5, kmax), dtype=np.float64)
+
+  for b, block in enumerate(iter_blocks(x, block_size)):
+    lagged_moments(block, kmax, moments[b])
+
+  return moments
+
+
+def regression_slopes (moments):
+
+  '''
+  Slopes r_k of the linear regressions of x[t+k] on x[t] from the sums
+  returned by block_moments (summed over the blocks, or for a single block).
+  '''
+
+  N, Sx, Sy, Sxx, Sxy = moments
+  with np.errstate(invalid='ignore', divide='ignore'):
+    return (Sxy - Sx * Sy / N) / (Sxx - Sx**2 / N)
+
+
+def branching_ratio (x, window):
+
+  '''
+  Conventional estimator of the branching ratio, the slope of the linear
+  regression of the activity x[t+1] on x[t], computed over consecutive
+  windows of window steps.
+
+  Parameters
+  ----------
+    x : array_like
+      1-D activity time series
+
+    window : int
+      Number of steps of each window
+
+  Returns
+  -------
+    array with the estimate of each window (nan if the activity is constant)
+  '''
+
+  return regression_slopes(block_moments(x, kmax=1, block_size=window).transpose(1, 0, 2))[:,0]
+
+
+def fit_exponential (rk, k):
+
+  '''
+  Fit r_k = b m^k, starting from the log-linear fit of the positive r_k.
+  Return (m, b).
+  '''
+
+  from scipy.optimize import curve_fit
+
+  positive = rk > 0
+  if positive.sum() >= 2:
+    slope, intercept = np.polyfit(k[positive], np.log(rk[positive]), deg=1)
+    p0 = (np.exp(slope), np.exp(intercept))
+  else:
+    p0 = (0.5, 1.)
+
+  try:
+    (m, b), _ = curve_fit(lambda k, m, b: b * m**k, k, rk, p0=p0, maxfev=10000)
+  except RuntimeError:
+    m, b = p0
+
+  return m, b
+
+
+def mr_estimator (x, kmax=40, block_size=100000):
+
+  '''
+  Multistep regression (MR) estimator of the branching ratio (Wilting and
+  Priesemann, 2018): the slopes r_k of the regressions of x[t+k] on x[t] are
+  fitted with r_k = b m^k, so that m is not biased by subsampling (which only
+  scales the r_k by the constant b).
+
+  Parameters
+  ----------
+    x : array_like
+      1-D activity time series (e.g. a memory-mapped trajectory field)
+
+    kmax : int, default=40
+      Largest lag
+
+    block_size : int, default=100000
+      Number of elements read at a time
+
+  Returns
+  -------
+    dict with the keys "m" (branching ratio), "b", "k" (lags) and "rk"
+    (regression slopes)
+  '''
+
+  moments = block_moments(x, kmax=kmax, block_size=block_size).sum(axis=0)
+  return _mr_fit(moments)
+
+
+def _mr_fit (moments):
+
+  rk = regression_slopes(moments)
+  k = np.arange(1, rk.size + 1, dtype=np.float64)
+  valid = np.isfinite(rk)
+  m, b = fit_exponential(rk[valid], k[valid])
+
+  return {'m': m, 'b': b, 'k': k, 'rk': rk}
+
+
+def autocorrelation (x, max_lag, block_size=100000):
+
+  '''
+  Autocorrelation function rho_k of x for k = 0, ..., max_lag, the Pearson
+  correlation of the pairs (x[t], x[t+k]), accumulated block by block.
+  '''
+
+  moments = block_moments(x, kmax=max_lag, block_size=block_size).sum(axis=0)
+  N, Sx, Sy, Sxx, Sxy = moments
+  Syy = _lagged_squares(x, max_lag, block_size)
+
+  with np.errstate(invalid='ignore', divide='ignore'):
+    covariance = Sxy / N - (Sx / N) * (Sy / N)
+    variance = np.sqrt((Sxx / N - (Sx / N)**2) * (Syy / N - (Sy / N)**2))
+    rho = covariance / variance
+
+  return np.concatenate([[1.], rho])
+
+
+def _lagged_squares (x, kmax, block_size):
+
+  # sum of x[t+k]^2 over the pairs of block_moments
+  Syy = np.zeros(kmax, dtype=np.float64)
+
+  for block in iter_blocks(x, block_size):
+    squares = np.cumsum(block[::-1]**2)[::-1]
+    k = np.arange(1, kmax + 1)
+    Syy[k < block.size] += squares[k[k < block.size]]
+
+  return Syy
+
+
+def integrated_autocorrelation_time (x, max_lag=1000, c=5., block_size=100000):
+
+  '''
+  Integrated autocorrelation time tau = 1 + 2 sum_{k=1}^{M} rho_k, with the
+  automatic window of Sokal: M is the smallest lag such that M >= c tau(M).
+
+  Returns
+  -------
+    (tau, M), M being max_lag if the window condition is never met
+  '''
+
+  rho = autocorrelation(x, max_lag=max_lag, block_size=block_size)
+  tau = 1. + 2. * np.cumsum(rho[1:])
+  lags = np.arange(1, max_lag + 1)
+  window = np.flatnonzero(lags >= c * tau)
+  M = int(lags[window[0]]) if window.size > 0 else max_lag
+
+  return float(tau[M-1]), M
+
+
+def block_bootstrap (x, block_size, estimator='mean', num_samples=1000, kmax=40, seed=None):
+
+  '''
+  Block bootstrap error bars: x is split in non-overlapping blocks of
+  block_size steps (longer than its autocorrelation time), and the estimator
+  is recomputed on num_samples resamplings of the blocks with replacement.
+  Only the sums of each block are kept in memory, so x can be a memory-mapped
+  trajectory larger than RAM.
+
+  Parameters
+  ----------
+    x : array_like
+      1-D time series
+
+    block_size : int
+      Number of steps of each block
+
+    estimator : str, default='mean'
+      "mean", "branching_ratio" (conventional estimator over the whole
+      series) or "mr" (m of the multistep regression estimator)
+
+    num_samples : int, default=1000
+      Number of bootstrap samples
+
+    kmax : int, default=40
+      Largest lag of the "mr" estimator
+
+    seed : int or np.random.Generator, default=None
+      Seed of the resampling
+
+  Returns
+  -------
+    (estimate, standard error, array of the bootstrap estimates)
+  '''
+
+  if estimator not in ('mean', 'branching_ratio', 'mr'):
+    raise ValueError('Invalid "estimator" passed. "estimator" must be "mean", "branching_ratio" or "mr".')
+
+  if estimator == 'mean':
+    sums = np.array([[block.size, block.sum()] for block in iter_blocks(x, block_size)])
+    evaluate = lambda s: s[1] / s[0]
+  else:
+    lags = 1 if estimator == 'branching_ratio' else kmax
+    sums = block_moments(x, kmax=lags, block_size=block_size).reshape(-(-len(x) // block_size), -1)
+    if estimator == 'branching_ratio':
+      evaluate = lambda s: regression_slopes(s.reshape(5, 1))[0]
+    else:
+      evaluate = lambda s: _mr_fit(s.reshape(5, lags))['m']
+
+  # each bootstrap sample draws every block a multinomial number of times
+  rng = np.random.default_rng(seed)
+  blocks = sums.shape[0]
+  weights = rng.multinomial(blocks, np.full(blocks, 1. / blocks), size=num_samples)
+  samples = np.array([evaluate(s) for s in weights @ sums])
+
+  return evaluate(sums.sum(axis=0)), float(np.std(samples, ddof=1)), samples
@@ -0,0 +1,85 @@
+import os
+import numpy as np
+
+from hypothesis import strategies as st
+from hypothesis import given, settings
+
+from socmodel.source.adjacency import AdjacencyList
+
+
+@given(n = st.integers(min_value=1, max_value=100),
+       p = st.floats(min_value=0., max_value=1.),)
+def test_from_dense (n, p):
+
+  np_C = np.random.choice([-1,0,1], size=(n,n), p=[p/2,1.-p,p/2]).astype(np.int8)
+  C = AdjacencyList.from_dense(np_C)
+
+  assert (C.toarray() == np_C).all()
+  assert C.nnz == np.sum(np_C != 0)
+  assert (C.count == np.sum(np_C != 0, axis=1)).all()
+  assert (C.count < C.capacity).all() or C.capacity == n
+
+
+@given(n        = st.integers(min_value=1, max_value=100),
+       p        = st.floats(min_value=0., max_value=1.),
+       capacity = st.integers(min_value=1, max_value=200),)
+def test_grow (n, p, capacity):
+
+  np_C = np.where(np.random.rand(n,n) < p, 1, 0).astype(np.int8)
+  C = AdjacencyList.from_dense(np_C)
+  old_capacity = C.capacity
+  C.grow(capacity=capacity)
+
+  assert C.capacity == min(max(capacity, old_capacity), n)
+  assert (C.toarray() == np_C).all()
+
+
+@given(n = st.integers(min_value=1, max_value=100),
+       p = st.floats(min_value=0., max_value=1.),)
+def test_copy (n, p):
+
+  np_C = np.where(np.random.rand(n,n) < p, 1, 0).astype(np.int8)
+  C1 = AdjacencyList.from_dense(np_C)
+  C2 = C1.copy()
+  C2.count[:] = 0
+
+  assert (C1.toarray() == np_C).all()
+  assert C2.nnz == 0 and C2.capacity == C1.capacity
+
+
+@given(n = st.integers(min_value=1, max_value=100),
+       p = st.floats(min_value=0., max_value=1.),)
+@settings(deadline=None)
+def test_transpose (n, p):
+
+  np_C = np.random.choice([-1,0,1], size=(n,n), p=[p/2,1.-p,p/2]).astype(np.int8)
+  C = AdjacencyList.from_dense(np_C).transpose()
+
+  assert (C.toarray() == np_C.T).all()
+  assert (C.count < C.capacity).all() or C.capacity == n
+  for i in range(n):
+    assert (np.diff(C.index[i,:C.count[i]]) > 0).all()
+
+
+@given(n = st.integers(min_value=1, max_value=100),
+       p = st.floats(min_value=0., max_value=1.),)
+@settings(deadline=None, max_examples=20)
+def test_memmap (tmp_path_factory, n, p):
+
+  path = str(tmp_path_factory.mktemp('adjacency') / 'C')
+  np_C = np.random.choice([-1,0,1], size=(n,n), p=[p/2,1.-p,p/2]).astype(np.int8)
+  row, col = np.nonzero(np_C)
+  C = AdjacencyList.from_coo(n=n, row=row, col=col, data=np_C[row,col], path=path)
+
+  assert isinstance(C.index, np.memmap) and isinstance(C.weight, np.memmap)
+  assert (C.toarray() == np_C).all()
+
+  # the grown arrays replace the files, which hold the raw rows
+  C.grow()
+  assert (C.toarray() == np_C).all()
+  assert (np.load(f'{path}.index.npy') == C.index).all()
+  assert (np.load(f'{path}.weight.npy') == C.weight).all()
+  assert not os.path.exists(f'{path}.index.tmp.npy')
+
+  assert (C.transpose(path=f'{path}T').toarray() == np_C.T).all()
+  assert (C.copy().toarray() == np_C).all()
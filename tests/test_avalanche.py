@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from hypothesis import strategies as st
+from hypothesis import given, settings
+
+from socmodel.source.avalanche import AvalancheDetector
+from socmodel.source.state import RandomState
+from socmodel.source.connectivity import RandomConnectivity
+from socmodel.source.network import Network
+
+
+def reference_avalanches (activity, threshold):
+
+  sizes, durations = [], []
+  size = duration = 0
+
+  for a in activity:
+    if a > threshold:
+      size += a - threshold
+      duration += 1
+    elif duration > 0:
+      sizes.append(size)
+      durations.append(duration)
+      size = duration = 0
+
+  return np.array(sizes, dtype=np.int64), np.array(durations, dtype=np.int64)
+
+
+@given(activity  = st.lists(st.integers(min_value=0, max_value=20), max_size=300),
+       threshold = st.integers(min_value=0, max_value=10),
+       splits    = st.lists(st.integers(min_value=0, max_value=300), max_size=5),)
+@settings(deadline=None)
+def test_AvalancheDetector (activity, threshold, splits):
+
+  activity = np.array(activity, dtype=np.int32)
+  sizes, durations = reference_avalanches(activity, threshold)
+
+  detector = AvalancheDetector(threshold=threshold)
+  for chunk in np.split(activity, sorted(splits)):
+    detector.update(chunk)
+
+  edges, sizeHist, durationHist = detector.histograms()
+
+  assert detector.count == sizes.size
+  assert (sizeHist == np.histogram(sizes, bins=edges)[0]).all()
+  assert (durationHist == np.histogram(durations, bins=edges)[0]).all()
+  assert np.isclose(detector.moments[1], np.log(sizes).sum())
+  assert np.isclose(detector.moments[3], np.log(durations).sum())
+
+  with pytest.raises(ValueError):
+    AvalancheDetector(threshold=-1)
+  with pytest.raises(ValueError):
+    AvalancheDetector(xmin=0)
+
+
+def test_exponents ():
+
+  # durations of 1 substep separated by quiescent substeps, with zeta-distributed sizes
+  rng = np.random.default_rng(0)
+  sizes = rng.zipf(2.5, size=100000)
+  activity = np.zeros(2 * sizes.size, dtype=np.int64)
+  activity[::2] = sizes
+
+  detector = AvalancheDetector(xmin=10)
+  detector.update(activity)
+  (a, error), (b, _) = detector.exponents()['size'], detector.exponents()['duration']
+
+  assert abs(a - 2.5) < 0.1
+  assert 0. < error < 0.1
+  assert np.isnan(b)
+
+
+@given(engine = st.sampled_from(['python', 'numba']),
+       packed = st.booleans(),
+       update = st.sampled_from(['full', 'incremental']),
+       steps  = st.integers(min_value=1, max_value=100),
+       seed   = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=20)
+def test_network_avalanches (engine, packed, update, steps, seed):
+
+  kwargs = dict(n=100, alpha=0.2, beta=10., tau=5, sigma_init=RandomState(),
+                C_init=RandomConnectivity(pPlus=0.02, pMinus=0.02), seed=seed,
+                packed=packed, update=update)
+
+  detector1 = AvalancheDetector(threshold=2)
+  result1 = Network(**kwargs).run(evolution_steps=steps, progressbar=False, engine='python',
+                                  avalanches=detector1)
+
+  detector2 = AvalancheDetector(threshold=2)
+  chunks = list(Network(**kwargs).iter_run(evolution_steps=steps, chunk_size=7,
+                                           progressbar=False, engine=engine,
+                                           avalanches=detector2))
+  result2 = Network(**kwargs).run(evolution_steps=steps, progressbar=False, engine=engine)
+
+  for k, (arr1, arr2) in enumerate(zip(result1, result2)):
+    assert (arr1 == arr2).all()
+    assert (arr1 == np.concatenate([chunk[k] for chunk in chunks])).all()
+
+  assert (detector1.state == detector2.state).all()
+  assert (detector1.sizeHist == detector2.sizeHist).all()
+  assert (detector1.durationHist == detector2.durationHist).all()
+  assert (detector1.moments == detector2.moments).all()
@@ -1,11 +1,16 @@
 import numpy as np
+import pytest
 
 from hypothesis import strategies as st
-from hypothesis import given
+from hypothesis import given, settings
 
 from socmodel.source.connectivity import ZerosConnectivity
 from socmodel.source.connectivity import OnesConnectivity
 from socmodel.source.connectivity import RandomConnectivity
+from socmodel.source.connectivity import LatticeConnectivity
+from socmodel.source.connectivity import WattsStrogatzConnectivity
+from socmodel.source.connectivity import BarabasiAlbertConnectivity
+from socmodel.source.connectivity import EdgeListConnectivity
 
 
 @given(size = st.integers(min_value=1, max_value=1e3),)
@@ -41,3 +46,178 @@ def test_RandomConnectivity (size, pPlus, pMinus):
 
   assert (connectivity[I] == 0).all()
   assert ((connectivity[~I] == -1) | (connectivity[~I] == 0) | (connectivity[~I] == 1)).all()
+
+
+@given(size = st.integers(min_value=1, max_value=1e2),
+       seed = st.integers(min_value=0, max_value=2**31),)
+def test_RandomConnectivity_seed (size, seed):
+
+  connectivity1 = RandomConnectivity().get(shape=(size,size), rng=seed)
+  connectivity2 = RandomConnectivity().get(shape=(size,size), rng=np.random.default_rng(seed))
+
+  assert (connectivity1 == connectivity2).all()
+
+
+@given(size   = st.integers(min_value=1, max_value=200),
+       pPlus  = st.floats(min_value=0., max_value=0.5),
+       pMinus = st.floats(min_value=0., max_value=0.5),
+       seed   = st.integers(min_value=0, max_value=2**31),)
+def test_RandomConnectivity_sparse (size, pPlus, pMinus, seed):
+
+  initializer = RandomConnectivity(pPlus=pPlus, pMinus=pMinus)
+  row, col, data = initializer.get_sparse(n=size, rng=seed)
+
+  assert (row != col).all()
+  assert ((data == 1) | (data == -1)).all()
+  assert (np.lexsort((col, row)) == np.arange(row.size)).all()
+  assert np.unique(row.astype(np.int64) * size + col).size == row.size
+
+  for arr1, arr2 in zip((row, col, data), initializer.get_sparse(n=size, rng=np.random.default_rng(seed))):
+    assert (arr1 == arr2).all()
+
+
+def test_RandomConnectivity_large ():
+
+  # the sparse initialization never builds the dense 10^5 x 10^5 matrix
+  n, p = 10**5, 5e-5
+  row, col, data = RandomConnectivity(pPlus=p, pMinus=p).get_sparse(n=n, rng=0)
+  expected = 2 * p * n * (n - 1)
+
+  assert abs(row.size - expected) < 5 * np.sqrt(expected)
+  assert abs(np.sum(data == 1) - np.sum(data == -1)) < 5 * np.sqrt(expected)
+  assert (row != col).all()
+
+
+@given(size = st.integers(min_value=1, max_value=1e2),)
+def test_get_sparse (size):
+
+  for initializer in (ZerosConnectivity(), OnesConnectivity(), OnesConnectivity(negative=True)):
+    connectivity = initializer.get(shape=(size,size))
+    row, col, data = initializer.get_sparse(n=size)
+    dense = np.zeros(shape=(size,size), dtype=np.int8)
+    dense[row,col] = data
+    assert (dense == connectivity).all()
+    assert (np.lexsort((col, row)) == np.arange(row.size)).all()
+
+
+def check_sparse (n, row, col, data):
+
+  assert (row != col).all()
+  assert ((data == 1) | (data == -1)).all()
+  assert (np.lexsort((col, row)) == np.arange(row.size)).all()
+  assert np.unique(row.astype(np.int64) * n + col).size == row.size
+  assert ((row >= 0) & (row < n) & (col >= 0) & (col < n)).all()
+
+
+@given(width    = st.integers(min_value=1, max_value=30),
+       height   = st.integers(min_value=1, max_value=30),
+       periodic = st.booleans(),
+       pMinus   = st.floats(min_value=0., max_value=1.),
+       seed     = st.integers(min_value=0, max_value=2**31),)
+def test_LatticeConnectivity (width, height, periodic, pMinus, seed):
+
+  n = width * height
+  initializer = LatticeConnectivity(width=width, periodic=periodic, pMinus=pMinus)
+  row, col, data = initializer.get_sparse(n=n, rng=seed)
+  check_sparse(n, row, col, data)
+
+  # the links are the pairs at distance 1 on the grid (on the torus if periodic)
+  (r1, c1), (r2, c2) = np.divmod(row, width), np.divmod(col, width)
+  dr, dc = np.abs(r1 - r2), np.abs(c1 - c2)
+  if periodic:
+    dr, dc = np.minimum(dr, height - dr), np.minimum(dc, width - dc)
+  assert (dr + dc == 1).all()
+
+  connectivity = initializer.get(shape=(n,n), rng=seed)
+  assert (np.abs(connectivity) == np.abs(connectivity).T).all()
+  if periodic and width > 2 and height > 2:
+    assert (np.abs(connectivity).sum(axis=1) == 4).all()
+
+  with pytest.raises(ValueError):
+    LatticeConnectivity(width=n + 1).get_sparse(n=n)
+
+
+@given(n    = st.integers(min_value=6, max_value=300),
+       k    = st.sampled_from([2, 4]),
+       p    = st.floats(min_value=0., max_value=1.),
+       seed = st.integers(min_value=0, max_value=2**31),)
+def test_WattsStrogatzConnectivity (n, k, p, seed):
+
+  row, col, data = WattsStrogatzConnectivity(k=k, p=p).get_sparse(n=n, rng=seed)
+  check_sparse(n, row, col, data)
+
+  # rewiring preserves the number of links of each row
+  assert (np.bincount(row, minlength=n) == k).all()
+  assert (data == 1).all()
+
+  if p == 0.:
+    distance = np.abs(row.astype(np.int64) - col)
+    assert (np.minimum(distance, n - distance) <= k // 2).all()
+
+  with pytest.raises(ValueError):
+    WattsStrogatzConnectivity(k=3)
+  with pytest.raises(ValueError):
+    WattsStrogatzConnectivity(k=4).get_sparse(n=5)
+
+
+@given(n      = st.integers(min_value=2, max_value=300),
+       m      = st.integers(min_value=1, max_value=5),
+       pMinus = st.floats(min_value=0., max_value=1.),
+       seed   = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None)
+def test_BarabasiAlbertConnectivity (n, m, pMinus, seed):
+
+  if not m < n:
+    with pytest.raises(ValueError):
+      BarabasiAlbertConnectivity(m=m).get_sparse(n=n)
+    return
+
+  initializer = BarabasiAlbertConnectivity(m=m, pMinus=pMinus)
+  row, col, data = initializer.get_sparse(n=n, rng=seed)
+  check_sparse(n, row, col, data)
+
+  # every added neuron has m links to older neurons, set in both directions
+  assert row.size == 2 * m * (n - m)
+  older = row > col
+  assert (np.bincount(row[older], minlength=n)[m:] == m).all()
+  assert (np.bincount(row[older], minlength=n)[:m] == 0).all()
+
+  for arr1, arr2 in zip((row, col, data), initializer.get_sparse(n=n, rng=seed)):
+    assert (arr1 == arr2).all()
+
+
+def test_BarabasiAlbert_degrees ():
+
+  # the degree distribution has a heavy tail, P(k) ~ k^-3
+  row, _, _ = BarabasiAlbertConnectivity(m=3).get_sparse(n=20000, rng=0)
+  degrees = np.bincount(row)
+
+  assert degrees.min() == 3
+  assert degrees.max() > 100
+
+
+def test_EdgeListConnectivity (tmp_path):
+
+  row = np.array([0, 2, 1, 2, 3, 0])
+  col = np.array([1, 0, 1, 0, 2, 3])
+  data = np.array([1, -1, 1, 1, 1, -1])
+  expected = (np.array([0, 0, 2, 3]), np.array([1, 3, 0, 2]), np.array([1, -1, -1, 1]))
+
+  np.savez(tmp_path / 'edges.npz', row=row, col=col, data=data)
+  np.savetxt(tmp_path / 'edges.txt', np.stack([row, col, data], axis=1), fmt='%d')
+
+  for initializer in (EdgeListConnectivity(row=row, col=col, data=data),
+                      EdgeListConnectivity(path=tmp_path / 'edges.npz'),
+                      EdgeListConnectivity(path=str(tmp_path / 'edges.txt'))):
+    for arr1, arr2 in zip(initializer.get_sparse(n=4), expected):
+      assert (arr1 == arr2).all()
+
+  row, col, data = EdgeListConnectivity(row=row, col=col, pMinus=1.).get_sparse(n=4)
+  assert (data == -1).all() and row.size == 4
+
+  with pytest.raises(ValueError):
+    EdgeListConnectivity(row=row, col=col, data=np.zeros(row.size))
+  with pytest.raises(ValueError):
+    EdgeListConnectivity(row=row, col=col[:-1])
+  with pytest.raises(ValueError):
+    EdgeListConnectivity(row=row, col=col).get_sparse(n=3)
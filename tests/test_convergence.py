@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from hypothesis import strategies as st
+from hypothesis import given, settings
+
+from socmodel.source.state import RandomState
+from socmodel.source.connectivity import RandomConnectivity
+from socmodel.source.network import Network
+from socmodel.source.convergence import StationarityCriterion
+
+
+def make_chunk (values):
+  return {key: values for key in ('Kplus', 'Kminus', 'branchPar', 'activity')}
+
+
+@given(window   = st.integers(min_value=1, max_value=50),
+       patience = st.integers(min_value=1, max_value=4),
+       splits   = st.lists(st.integers(min_value=0, max_value=1000), max_size=10),)
+def test_StationarityCriterion (window, patience, splits):
+
+  # a ramp followed by a plateau: stationary from the first window entirely on the plateau
+  plateau = 10 * window
+  values = np.minimum(np.arange(1000, dtype=np.float64), plateau) / plateau
+
+  criterion = StationarityCriterion(window=window, rtol=0., atol=1e-12, patience=patience)
+  for chunk in np.split(values, sorted(splits)):
+    if criterion.update(make_chunk(chunk)):
+      break
+
+  expected = (11 + patience) * window
+  assert criterion.converged == (expected if expected <= 1000 else None)
+  assert len(criterion.means) == min(expected, 1000) // window
+
+  for k, (mean, variance) in enumerate(zip(criterion.means, criterion.variances)):
+    window_values = values[k*window:(k+1)*window]
+    assert np.allclose(mean, window_values.mean())
+    assert np.allclose(variance, window_values.var(), atol=1e-12)
+
+  criterion.reset()
+  assert criterion.converged is None and criterion.steps == 0 and criterion.means == []
+
+
+def test_StationarityCriterion_parameters ():
+
+  with pytest.raises(ValueError):
+    StationarityCriterion(window=0)
+  with pytest.raises(ValueError):
+    StationarityCriterion(rtol=-1.)
+  with pytest.raises(ValueError):
+    StationarityCriterion(patience=0)
+  with pytest.raises(ValueError):
+    StationarityCriterion(observables=('Kin',))
+
+
+@given(engine = st.sampled_from(['python', 'numba']),
+       window = st.integers(min_value=1, max_value=50),
+       seed   = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=20)
+def test_until_converged (engine, window, seed):
+
+  kwargs = dict(n=50, alpha=0.2, beta=10., tau=3, sigma_init=RandomState(),
+                C_init=RandomConnectivity(pPlus=0.02, pMinus=0.02), seed=seed)
+  result = Network(**kwargs).run(evolution_steps=300, progressbar=False, engine=engine)
+
+  # loose tolerances converge after patience + 1 windows
+  criterion = StationarityCriterion(window=window, atol=np.inf, patience=2)
+  net = Network(**kwargs)
+  *truncated, converged = net.run(evolution_steps=300, progressbar=False, engine=engine,
+                                  until_converged=criterion)
+  expected = 3 * window
+
+  assert converged == (expected if expected <= 300 else None)
+  assert net.step == min(expected, 300)
+  for arr1, arr2 in zip(result, truncated):
+    assert (arr1[:net.step] == arr2).all()
+
+  # strict tolerances stop at the maximum number of steps
+  criterion = StationarityCriterion(window=window, rtol=0., atol=0., observables=('activity',))
+  *full, converged = Network(**kwargs).run(evolution_steps=300, progressbar=False, engine=engine,
+                                           until_converged=criterion)
+  assert converged is None or converged <= 300
+  assert full[0].size == (300 if converged is None else converged)
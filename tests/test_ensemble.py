@@ -0,0 +1,72 @@
+import numpy as np
+
+from hypothesis import strategies as st
+from hypothesis import given, settings
+
+from socmodel.source.state import ZerosState
+from socmodel.source.state import OnesState
+from socmodel.source.state import RandomState
+
+from socmodel.source.connectivity import ZerosConnectivity
+from socmodel.source.connectivity import OnesConnectivity
+from socmodel.source.connectivity import RandomConnectivity
+
+from socmodel.source.network import Network
+from socmodel.source.ensemble import NetworkEnsemble
+
+
+sigma_initializers = [ZerosState, OnesState, RandomState]
+C_initializers = [ZerosConnectivity, OnesConnectivity, RandomConnectivity]
+
+
+
+@given(n          = st.integers(min_value=1, max_value=200),
+       beta       = st.floats(min_value=0., max_value=20.),
+       sigma_init = st.sampled_from(sigma_initializers),
+       C_init     = st.sampled_from(C_initializers),
+       seed       = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=30)
+def test_single_replica (n, beta, sigma_init, C_init, seed):
+
+  net = Network(n=n, alpha=0.2, beta=beta, tau=5,
+                sigma_init=sigma_init(), C_init=C_init(), seed=seed)
+  ens = NetworkEnsemble(n=n, alpha=0.2, betas=[beta], replicas=1, tau=5,
+                        sigma_init=sigma_init(), C_init=C_init(), seed=seed)
+
+  result1 = net.run(evolution_steps=300, progressbar=False, engine='numba')
+  result2 = ens.run(evolution_steps=300, progressbar=False)
+
+  for arr1, arr2 in zip(result1, result2):
+    assert arr1.dtype == arr2.dtype
+    assert (arr1 == arr2[0,0]).all()
+
+  assert (net.sigma == ens.sigma[0]).all()
+  assert (net.avgActivity == ens.avgActivity[0]).all()
+  assert (net.C.toarray() == ens.get_connectivity(0, 0).toarray()).all()
+
+
+
+@given(n          = st.integers(min_value=1, max_value=100),
+       betas      = st.lists(st.floats(min_value=0., max_value=20.), min_size=1, max_size=4),
+       replicas   = st.integers(min_value=1, max_value=3),
+       sigma_init = st.sampled_from(sigma_initializers),
+       C_init     = st.sampled_from(C_initializers),)
+@settings(deadline=None, max_examples=30)
+def test_simulation (n, betas, replicas, sigma_init, C_init):
+
+  ens = NetworkEnsemble(n=n, alpha=0.2, betas=betas, replicas=replicas, tau=5,
+                        sigma_init=sigma_init(), C_init=C_init())
+  print(ens)
+
+  Kplus, Kminus, branchPar = ens.run(evolution_steps=200, progressbar=False)
+
+  assert Kplus.shape == Kminus.shape == branchPar.shape == (len(betas), replicas, 200)
+  assert ((ens.sigma == 0) | (ens.sigma == 1)).all()
+
+  for b in range(len(betas)):
+    for r in range(replicas):
+      C = ens.get_connectivity(b, r).toarray()
+      assert ((C == -1) | (C == 0) | (C == 1)).all()
+      assert (C[np.eye(n, dtype=bool)] == 0).all()
+      assert np.sum(C == 1) == round(Kplus[b,r,-1] * n)
+      assert np.sum(C == -1) == round(Kminus[b,r,-1] * n)
@@ -1,4 +1,8 @@
+import os
+import sys
+import subprocess
 import numpy as np
+import pytest
 
 from hypothesis import strategies as st
 from hypothesis import given, settings
@@ -10,6 +14,9 @@ from socmodel.source.state import RandomState
 from socmodel.source.connectivity import ZerosConnectivity
 from socmodel.source.connectivity import OnesConnectivity
 from socmodel.source.connectivity import RandomConnectivity
+from socmodel.source.connectivity import LatticeConnectivity
+from socmodel.source.connectivity import WattsStrogatzConnectivity
+from socmodel.source.connectivity import BarabasiAlbertConnectivity
 
 from socmodel.source.network import Network
 
@@ -69,7 +76,6 @@ def test_connectivity_evolution (n, alpha, beta, tau, sigma_init, C_init, steps)
 
   net = Network(n=n, alpha=alpha, beta=beta, tau=tau,
                 sigma_init=sigma_init(), C_init=C_init())
-  net.C = net.C.tocsr()
 
   for _ in range(steps):
 
@@ -100,3 +106,508 @@ def test_simulation (sigma_init, C_init):
   C = net.C.toarray()
   assert ((net.sigma == 0) | (net.sigma == 1)).all()
   assert ((C == -1) | (C == 0) | (C == 1)).all()
+
+
+
+@given(n          = st.integers(min_value=1, max_value=200),
+       beta       = st.floats(min_value=0., max_value=20.),
+       sigma_init = st.sampled_from(sigma_initializers),
+       C_init     = st.sampled_from(C_initializers),
+       seed       = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=30)
+def test_numba_engine (n, beta, sigma_init, C_init, seed):
+
+  net1 = Network(n=n, alpha=0.2, beta=beta, tau=5,
+                 sigma_init=sigma_init(), C_init=C_init(), seed=seed)
+  net2 = Network(n=n, alpha=0.2, beta=beta, tau=5,
+                 sigma_init=sigma_init(), C_init=C_init(), seed=seed)
+
+  result1 = net1.run(evolution_steps=500, progressbar=False, engine='python')
+  result2 = net2.run(evolution_steps=500, progressbar=False, engine='numba')
+
+  for arr1, arr2 in zip(result1, result2):
+    assert (arr1 == arr2).all()
+
+  assert (net1.sigma == net2.sigma).all()
+  assert (net1.avgActivity == net2.avgActivity).all()
+  assert (net1.C.toarray() == net2.C.toarray()).all()
+  assert net1.linksPlus == net2.linksPlus
+  assert net1.linksMinus == net2.linksMinus
+
+
+
+@given(n          = st.integers(min_value=1, max_value=200),
+       sigma_init = st.sampled_from(sigma_initializers),
+       C_init     = st.sampled_from(C_initializers),
+       seed       = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=30)
+def test_seed (n, sigma_init, C_init, seed):
+
+  np.random.seed(seed)
+  net1 = Network(n=n, alpha=0.2, beta=10., tau=5,
+                 sigma_init=sigma_init(), C_init=C_init(), seed=seed)
+  result1 = net1.run(evolution_steps=100, progressbar=False)
+
+  np.random.seed(seed + 1)
+  net2 = Network(n=n, alpha=0.2, beta=10., tau=5,
+                 sigma_init=sigma_init(), C_init=C_init(), seed=seed)
+  result2 = net2.run(evolution_steps=100, progressbar=False)
+
+  for arr1, arr2 in zip(result1, result2):
+    assert (arr1 == arr2).all()
+
+  assert (net1.sigma == net2.sigma).all()
+  assert (net1.C.toarray() == net2.C.toarray()).all()
+
+
+
+@given(n          = st.integers(min_value=1, max_value=200),
+       chunk_size = st.integers(min_value=1, max_value=300),
+       engine     = st.sampled_from(['python', 'numba']),
+       seed       = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=30)
+def test_iter_run (n, chunk_size, engine, seed):
+
+  net1 = Network(n=n, alpha=0.2, beta=10., tau=5,
+                 C_init=RandomConnectivity(pPlus=0.01, pMinus=0.01), seed=seed)
+  net2 = Network(n=n, alpha=0.2, beta=10., tau=5,
+                 C_init=RandomConnectivity(pPlus=0.01, pMinus=0.01), seed=seed)
+
+  result1 = net1.run(evolution_steps=300, progressbar=False, engine=engine)
+  chunks = list(net2.iter_run(evolution_steps=300, chunk_size=chunk_size,
+                              progressbar=False, engine=engine))
+
+  assert len(chunks) == -(-300 // chunk_size)
+  assert all(chunk[0].size <= chunk_size for chunk in chunks)
+
+  for k, arr1 in enumerate(result1):
+    arr2 = np.concatenate([chunk[k] for chunk in chunks])
+    assert (arr1 == arr2).all()
+
+
+
+@given(engine = st.sampled_from(['python', 'numba']),
+       steps  = st.integers(min_value=1, max_value=300),
+       packed = st.booleans(),
+       seed   = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=20)
+def test_checkpoint (tmp_path_factory, engine, steps, packed, seed):
+
+  path = tmp_path_factory.mktemp('checkpoint') / 'net.npz'
+
+  net1 = Network(n=100, alpha=0.2, beta=10., tau=5, sigma_init=RandomState(),
+                 C_init=RandomConnectivity(pPlus=0.02, pMinus=0.02), seed=seed)
+  result1 = net1.run(evolution_steps=2*steps, progressbar=False, engine=engine)
+
+  net2 = Network(n=100, alpha=0.2, beta=10., tau=5, sigma_init=RandomState(),
+                 C_init=RandomConnectivity(pPlus=0.02, pMinus=0.02), seed=seed, packed=packed)
+  net2.run(evolution_steps=steps, progressbar=False, engine=engine,
+           checkpoint_every=steps, checkpoint_path=path)
+  net2 = Network.load_checkpoint(path)
+  assert net2.packed == packed
+  result2 = net2.run(evolution_steps=steps, progressbar=False, engine=engine)
+
+  assert net2.step == 2*steps
+  for arr1, arr2 in zip(result1, result2):
+    assert (arr1[steps:] == arr2).all()
+
+  assert (net1.sigma == net2.sigma).all()
+  assert (net1.avgActivity == net2.avgActivity).all()
+  assert (net1.C.toarray() == net2.C.toarray()).all()
+  assert net1.linksPlus == net2.linksPlus
+  assert net1.linksMinus == net2.linksMinus
+  assert (net1.degrees == net2.degrees).all()
+
+
+
+@given(engine = st.sampled_from(['python', 'numba']),
+       steps  = st.integers(min_value=1, max_value=200),
+       beta   = st.floats(min_value=0., max_value=20.),
+       packed = st.booleans(),
+       seed   = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=20)
+def test_clone (tmp_path_factory, engine, steps, beta, packed, seed):
+
+  path = tmp_path_factory.mktemp('clone') / 'net.npz'
+
+  net1 = Network(n=100, alpha=0.2, beta=10., tau=5, sigma_init=RandomState(),
+                 C_init=RandomConnectivity(pPlus=0.02, pMinus=0.02), seed=seed)
+  net1.run(evolution_steps=steps, progressbar=False, engine=engine)
+  net1.save_checkpoint(path)
+
+  # the clone continues exactly as the network, and leaves it untouched
+  net2 = net1.clone()
+  result2 = net2.run(evolution_steps=steps, progressbar=False, engine=engine)
+  result1 = net1.run(evolution_steps=steps, progressbar=False, engine=engine)
+
+  for arr1, arr2 in zip(result1, result2):
+    assert (arr1 == arr2).all()
+  assert (net1.C.toarray() == net2.C.toarray()).all()
+  assert (net1.degrees == net2.degrees).all()
+
+  # a clone with new parameters starts from the state of the network
+  net3 = Network.load_checkpoint(path).clone(beta=beta, packed=packed, update='incremental')
+  net4 = Network.load_checkpoint(path)
+  net4.beta = beta
+  result3 = net3.run(evolution_steps=steps, progressbar=False, engine=engine)
+  result4 = net4.run(evolution_steps=steps, progressbar=False, engine=engine)
+
+  assert net3.step == 2*steps
+  for arr3, arr4 in zip(result3, result4):
+    assert (arr3 == arr4).all()
+  assert (net3.sigma == net4.sigma).all()
+
+  with pytest.raises(ValueError):
+    net1.clone(n=10)
+  with pytest.raises(ValueError):
+    net1.clone(update='incremental', parallel=True)
+
+
+@given(n          = st.integers(min_value=1, max_value=200),
+       beta       = st.floats(min_value=0., max_value=20.),
+       sigma_init = st.sampled_from(sigma_initializers),
+       C_init     = st.sampled_from(C_initializers),
+       engine     = st.sampled_from(['python', 'numba']),
+       seed       = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=30)
+def test_incremental_update (n, beta, sigma_init, C_init, engine, seed):
+
+  net1 = Network(n=n, alpha=0.2, beta=beta, tau=5, sigma_init=sigma_init(),
+                 C_init=C_init(), seed=seed, update='full')
+  net2 = Network(n=n, alpha=0.2, beta=beta, tau=5, sigma_init=sigma_init(),
+                 C_init=C_init(), seed=seed, update='incremental')
+
+  result1 = net1.run(evolution_steps=300, progressbar=False, engine=engine)
+  result2 = net2.run(evolution_steps=300, progressbar=False, engine=engine)
+
+  for arr1, arr2 in zip(result1, result2):
+    assert (arr1 == arr2).all()
+
+  C = net2.C.toarray()
+  assert (net1.sigma == net2.sigma).all()
+  assert (net2.Cout.toarray() == C.T).all()
+  assert (net2.signal == np.dot(C.astype(np.int32), net2.sigma)).all()
+
+  net1.sigma = np.ones(n, dtype=np.int8)
+  net2.sigma = np.ones(n, dtype=np.int8)
+  assert (net2.signal == np.dot(C.astype(np.int32), net2.sigma)).all()
+
+  result1 = net1.run(evolution_steps=100, progressbar=False, engine=engine)
+  result2 = net2.run(evolution_steps=100, progressbar=False, engine=engine)
+
+  for arr1, arr2 in zip(result1, result2):
+    assert (arr1 == arr2).all()
+
+
+@given(n          = st.integers(min_value=1, max_value=200),
+       beta       = st.floats(min_value=0., max_value=20.),
+       sigma_init = st.sampled_from(sigma_initializers),
+       C_init     = st.sampled_from(C_initializers),
+       seed       = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=30)
+def test_active_update (n, beta, sigma_init, C_init, seed):
+
+  nets = [Network(n=n, alpha=0.2, beta=beta, tau=5, sigma_init=sigma_init(),
+                  C_init=C_init(), seed=seed, update='active') for _ in range(2)]
+
+  for steps, sigma in [(300, None), (100, np.ones(n, dtype=np.int8))]:
+
+    if sigma is not None:
+      for net in nets:
+        net.sigma = sigma
+
+    result1 = nets[0].run(evolution_steps=steps, progressbar=False, engine='python')
+    result2 = nets[1].run(evolution_steps=steps, progressbar=False, engine='numba')
+
+    for arr1, arr2 in zip(result1, result2):
+      assert (arr1 == arr2).all()
+
+    assert (nets[0].sigma == nets[1].sigma).all()
+    assert (nets[0].avgActivity == nets[1].avgActivity).all()
+
+    net = nets[1]
+    C = net.C.toarray()
+    assert (net.Cout.toarray() == C.T).all()
+    assert (net.signal == np.dot(C.astype(np.int32), net.sigma)).all()
+    assert (np.sort(net.active[0,1:net.active[0,0]+1]) == np.flatnonzero(net.sigma)).all()
+    assert (net.mark == 0).all()
+    assert (net.updated == net.updated[-1]).all()
+    assert ((net.avgActivity >= 0.) & (net.avgActivity <= 1.)).all()
+
+  with pytest.raises(ValueError):
+    Network(n=n, alpha=0.2, beta=beta, tau=5, update='active', packed=True)
+
+
+@given(n          = st.integers(min_value=1, max_value=200),
+       beta       = st.floats(min_value=0., max_value=20.),
+       sigma_init = st.sampled_from(sigma_initializers),
+       C_init     = st.sampled_from(C_initializers),
+       engine     = st.sampled_from(['python', 'numba']),
+       update     = st.sampled_from(['full', 'incremental']),
+       seed       = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=30)
+def test_packed_state (n, beta, sigma_init, C_init, engine, update, seed):
+
+  net1 = Network(n=n, alpha=0.2, beta=beta, tau=5, sigma_init=sigma_init(),
+                 C_init=C_init(), seed=seed, update=update)
+  net2 = Network(n=n, alpha=0.2, beta=beta, tau=5, sigma_init=sigma_init(),
+                 C_init=C_init(), seed=seed, update=update, packed=True)
+
+  assert net2.words.size == -(-n // 64)
+
+  result1 = net1.run(evolution_steps=300, progressbar=False, engine=engine)
+  result2 = net2.run(evolution_steps=300, progressbar=False, engine=engine)
+
+  for arr1, arr2 in zip(result1, result2):
+    assert (arr1 == arr2).all()
+
+  assert (net1.sigma == net2.sigma).all()
+  assert (net1.avgActivity == net2.avgActivity).all()
+  assert (net1.signal == net2.signal).all()
+
+  for net in (net1, net2):
+    with pytest.raises(ValueError):
+      net.sigma[0] = 1
+
+
+@given(engine = st.sampled_from(['python', 'numba']),
+       update = st.sampled_from(['full', 'incremental', 'active']),
+       seed   = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=20)
+def test_memmap (tmp_path_factory, engine, update, seed):
+
+  root = tmp_path_factory.mktemp('memmap')
+  params = dict(n=200, alpha=0.2, beta=10., tau=5, sigma_init=RandomState(),
+                C_init=RandomConnectivity(pPlus=0.01, pMinus=0.01), update=update)
+
+  # the memory-mapped network evolves as the one in memory, growing its files
+  net1 = Network(**params, seed=seed)
+  net2 = Network(**params, seed=seed, memmap_dir=str(root / 'net'))
+  for net in (net1, net2):
+    net.sigma = np.ones(200, dtype=np.int8)
+  result1 = net1.run(evolution_steps=300, progressbar=False, engine=engine)
+  result2 = net2.run(evolution_steps=300, progressbar=False, engine=engine)
+
+  for arr1, arr2 in zip(result1, result2):
+    assert (arr1 == arr2).all()
+  assert (net1.C.toarray() == net2.C.toarray()).all()
+  assert (net1.avgActivity == net2.avgActivity).all()
+
+  for name, array in [('sigma', net2.sigma), ('avgActivity', net2.avgActivity),
+                      ('C.index', net2.C.index), ('C.weight', net2.C.weight)]:
+    assert isinstance(array, np.memmap)
+    assert (np.load(root / 'net' / f'{name}.npy') == array).all()
+  assert update == 'full' or isinstance(net2.Cout.index, np.memmap)
+
+  # the checkpoints and the clones can be memory-mapped too
+  net2.save_checkpoint(root / 'net.npz')
+  net3 = Network.load_checkpoint(root / 'net.npz', memmap_dir=str(root / 'load'))
+  net4 = net2.clone(memmap_dir=str(root / 'clone'))
+  result1 = net1.run(evolution_steps=100, progressbar=False, engine=engine)
+  for net in (net3, net4):
+    assert isinstance(net.C.index, np.memmap)
+    for arr1, arr2 in zip(result1, net.run(evolution_steps=100, progressbar=False, engine=engine)):
+      assert (arr1 == arr2).all()
+
+  with pytest.raises(ValueError):
+    net2.clone(beta=5.)
+
+
+@given(n          = st.integers(min_value=1, max_value=200),
+       beta       = st.floats(min_value=0., max_value=20.),
+       sigma_init = st.sampled_from(sigma_initializers),
+       C_init     = st.sampled_from(C_initializers),
+       seed       = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=20)
+def test_parallel_state (n, beta, sigma_init, C_init, seed):
+
+  results = []
+  for engine, packed in [('python', False), ('numba', False), ('numba', True)]:
+    net = Network(n=n, alpha=0.2, beta=beta, tau=5, sigma_init=sigma_init(),
+                  C_init=C_init(), seed=seed, packed=packed, parallel=True)
+    results.append((net.run(evolution_steps=100, progressbar=False, engine=engine), net.sigma))
+
+  for result, sigma in results[1:]:
+    for arr1, arr2 in zip(results[0][0], result):
+      assert (arr1 == arr2).all()
+    assert (results[0][1] == sigma).all()
+
+  with pytest.raises(ValueError):
+    Network(n=n, alpha=0.2, beta=beta, tau=5, update='incremental', parallel=True)
+
+
+@given(n          = st.integers(min_value=1, max_value=200),
+       beta       = st.floats(min_value=0., max_value=20.),
+       sigma_init = st.sampled_from(sigma_initializers),
+       C_init     = st.sampled_from(C_initializers),
+       engine     = st.sampled_from(['python', 'numba']),
+       update     = st.sampled_from(['full', 'incremental', 'active']),
+       seed       = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=30)
+def test_dense_backend (n, beta, sigma_init, C_init, engine, update, seed):
+
+  nets = [Network(n=n, alpha=0.2, beta=beta, tau=5, sigma_init=sigma_init(), C_init=C_init(),
+                  seed=seed, update=update, backend=backend) for backend in ('sparse', 'dense')]
+
+  assert nets[0].dense.size == 0
+  results = [net.run(evolution_steps=300, progressbar=False, engine=engine) for net in nets]
+
+  for arr1, arr2 in zip(*results):
+    assert (arr1 == arr2).all()
+  assert (nets[0].sigma == nets[1].sigma).all()
+  assert (nets[0].C.toarray() == nets[1].C.toarray()).all()
+  assert (nets[1].dense == nets[1].C.toarray()).all()
+
+  with pytest.raises(ValueError):
+    Network(n=n, alpha=0.2, beta=beta, tau=5, backend='dense', packed=True)
+
+
+@given(engine = st.sampled_from(['python', 'numba']),
+       seed   = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=10)
+def test_auto_backend (engine, seed):
+
+  net = Network(n=50, alpha=0.2, beta=5., tau=5, sigma_init=RandomState(),
+                C_init=OnesConnectivity(), seed=seed)
+  ref = Network(n=50, alpha=0.2, beta=5., tau=5, sigma_init=RandomState(),
+                C_init=OnesConnectivity(), seed=seed, backend='sparse')
+  assert (net.dense == net.C.toarray()).all()
+
+  # the dense copy is dropped below denseOff and rebuilt above denseOn, at the start of a chunk
+  results = []
+  for denseOff, denseOn, dense in [(2., 2., False), (0., 0., True)]:
+    net.denseOff, net.denseOn = denseOff, denseOn
+    results.append(net.run(evolution_steps=100, progressbar=False, engine=engine, profile=True))
+    assert (net.dense.size > 0) == dense
+    assert net.profile_report()['counters']['backend'] == 1
+  assert (net.dense == net.C.toarray()).all()
+
+  for steps, result in zip([100, 100], results):
+    for arr1, arr2 in zip(result, ref.run(evolution_steps=steps, progressbar=False, engine=engine)):
+      assert (arr1 == arr2).all()
+
+  # only the full update of the unpacked state uses the dense copy
+  for params in [{'update': 'incremental'}, {'packed': True}]:
+    net = Network(n=50, alpha=0.2, beta=5., tau=5, C_init=OnesConnectivity(), **params)
+    assert net.dense.size == 0
+
+
+@given(C_init = st.sampled_from([LatticeConnectivity(width=10, pMinus=0.5),
+                                 WattsStrogatzConnectivity(k=4, p=0.2, pMinus=0.5),
+                                 BarabasiAlbertConnectivity(m=2, pMinus=0.5)]),
+       seed   = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=10)
+def test_structured_connectivity (C_init, seed):
+
+  nets = [Network(n=100, alpha=0.2, beta=10., tau=2, sigma_init=RandomState(), C_init=C_init,
+                  seed=seed) for _ in range(2)]
+
+  # the number of links does not depend on the seed
+  row, _, _ = C_init.get_sparse(n=100, rng=seed)
+  assert nets[0].C.nnz == row.size
+  assert nets[0].linksPlus + nets[0].linksMinus == row.size
+
+  result1 = nets[0].run(evolution_steps=100, progressbar=False, engine='python')
+  result2 = nets[1].run(evolution_steps=100, progressbar=False, engine='numba')
+
+  for arr1, arr2 in zip(result1, result2):
+    assert (arr1 == arr2).all()
+
+
+@given(n      = st.integers(min_value=1, max_value=60),
+       engine = st.sampled_from(['python', 'numba']),
+       update = st.sampled_from(['full', 'incremental', 'active']),
+       steps  = st.integers(min_value=0, max_value=300),
+       seed   = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=30)
+def test_topology_stats (n, engine, update, steps, seed):
+
+  net = Network(n=n, alpha=0.2, beta=10., tau=2, sigma_init=RandomState(),
+                C_init=RandomConnectivity(pPlus=0.1, pMinus=0.1), seed=seed, update=update)
+  net.run(evolution_steps=steps, progressbar=False, engine=engine)
+
+  C = net.C.toarray().astype(np.int64)
+  stats = net.degree_stats()
+  expected = {'inPlus': (C == 1).sum(axis=1), 'inMinus': (C == -1).sum(axis=1), 'in': (C != 0).sum(axis=1),
+              'outPlus': (C == 1).sum(axis=0), 'outMinus': (C == -1).sum(axis=0), 'out': (C != 0).sum(axis=0)}
+
+  for key, degrees in expected.items():
+    assert (stats[key]['degrees'] == degrees).all()
+    assert (stats[key]['hist'] == np.bincount(degrees)).all()
+    assert np.isclose(stats[key]['mean'], degrees.mean())
+
+  P, M = (C == 1).astype(np.int64), (C == -1).astype(np.int64)
+  motifs = net.motif_stats()
+  assert motifs['reciprocal']['plusPlus'] == np.sum(P * P.T) // 2
+  assert motifs['reciprocal']['minusMinus'] == np.sum(M * M.T) // 2
+  assert motifs['reciprocal']['plusMinus'] == np.sum(P * M.T)
+
+  for key, A in [('plus', P), ('minus', M), ('all', P + M)]:
+    U = ((A + A.T) > 0).astype(np.int64)
+    k = U.sum(axis=1)
+    triangles = np.diag(U @ U @ U) / 2
+    local = np.where(k > 1, triangles / np.maximum(k * (k - 1) / 2, 1), 0.)
+    assert np.isclose(motifs['clustering'][key], local.mean())
+
+
+@given(engine = st.sampled_from(['python', 'numba']),
+       steps  = st.integers(min_value=1, max_value=200),
+       seed   = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=20)
+def test_profile (engine, steps, seed):
+
+  net1 = Network(n=50, alpha=0.2, beta=10., tau=5, sigma_init=RandomState(),
+                 C_init=RandomConnectivity(pPlus=0.05, pMinus=0.05), seed=seed)
+  net2 = Network(n=50, alpha=0.2, beta=10., tau=5, sigma_init=RandomState(),
+                 C_init=RandomConnectivity(pPlus=0.05, pMinus=0.05), seed=seed)
+
+  result1 = net1.run(evolution_steps=steps, progressbar=False, engine=engine)
+  result2 = net2.run(evolution_steps=steps, progressbar=False, engine=engine, profile=True)
+
+  for arr1, arr2 in zip(result1, result2):
+    assert (arr1 == arr2).all()
+
+  report = net2.profile_report()
+  phases = ['state', 'connectivity'] if engine == 'python' else ['kernel', 'grow']
+
+  for phase in phases:
+    assert report['phases'][phase]['time'] >= 0.
+  if engine == 'python':
+    assert report['phases']['state']['calls'] == steps
+  assert report['phases']['observables']['calls'] == 1
+  assert report['counters']['allocations'] == 2
+  assert report['counters'].get('grow', 0) >= 0
+  assert report['nnz'] == net2.linksPlus + net2.linksMinus
+  assert report['step'] == steps
+
+  assert net1.profile_report()['phases'] == {}
+
+
+thread_script = """
+import numba
+import numpy as np
+from socmodel.source.network import Network
+from socmodel.source.state import RandomState
+from socmodel.source.connectivity import RandomConnectivity
+
+results = []
+for threads in (1, numba.config.NUMBA_NUM_THREADS):
+  numba.set_num_threads(threads)
+  net = Network(n=500, alpha=0.2, beta=5., tau=5, sigma_init=RandomState(),
+                C_init=RandomConnectivity(pPlus=0.01, pMinus=0.01), seed=3, parallel=True)
+  results.append(net.run(evolution_steps=200, progressbar=False, engine='numba') + (net.sigma,))
+
+for arr1, arr2 in zip(*results):
+  assert (arr1 == arr2).all()
+"""
+
+
+def test_parallel_threads ():
+
+  # the number of threads is fixed when Numba is imported, so the runs go in a subprocess
+  root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+  env = dict(os.environ, NUMBA_NUM_THREADS='4', PYTHONPATH=root)
+
+  process = subprocess.run([sys.executable, '-c', thread_script], env=env, capture_output=True)
+
+  assert process.returncode == 0, process.stderr.decode()
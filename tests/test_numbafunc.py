@@ -1,16 +1,32 @@
+import os
+import sys
+import subprocess
 import numpy as np
-from scipy import sparse
 
 from hypothesis import strategies as st
 from hypothesis import given, settings
 
+from socmodel.source.adjacency import AdjacencyList
+
 from socmodel.source.numbafunc import compute_signal as nb_compute_signal
+from socmodel.source.numbafunc import firing_probabilities as nb_firing_probabilities
 from socmodel.source.numbafunc import update_state as nb_update_state
 from socmodel.source.numbafunc import update_average_activity as nb_update_average_activity
+from socmodel.source.numbafunc import add_random_link as nb_add_random_link
+from socmodel.source.numbafunc import remove_random_link as nb_remove_random_link
+from socmodel.source.numbafunc import pack_state as nb_pack_state
+from socmodel.source.numbafunc import unpack_state as nb_unpack_state
+from socmodel.source.numbafunc import count_active as nb_count_active
+from socmodel.source.numbafunc import compute_signal_packed as nb_compute_signal_packed
+from socmodel.source.numbafunc import update_state_packed as nb_update_state_packed
+from socmodel.source.numbafunc import update_state_parallel as nb_update_state_parallel
+from socmodel.source.numbafunc import update_state_packed_parallel as nb_update_state_packed_parallel
+from socmodel.source.numbafunc import update_state_active as nb_update_state_active
 
 py_compute_signal = nb_compute_signal.py_func
 py_update_state = nb_update_state.py_func
 py_update_average_activity = nb_update_average_activity.py_func
+py_update_state_parallel = nb_update_state_parallel.py_func
 
 
 @given(n     = st.integers(min_value=1, max_value=100),
@@ -22,14 +38,13 @@ def test_compute_signal (n, scale, shift):
   sigma = (np.random.rand(n) * scale + shift).astype(np.int32)
   np_C = (np.random.rand(n,n) * scale + shift).astype(np.int32)
 
-  C_sparse = sparse.coo_matrix(np_C)
-  C = C_sparse.data
-  i = C_sparse.row
-  j = C_sparse.col
+  C = AdjacencyList.from_dense(np_C)
 
   np_result = np.dot(np_C, sigma)
-  nb_result = nb_compute_signal(n=n, sigma=sigma, C=C, i=i, j=j)
-  py_result = py_compute_signal(n=n, sigma=sigma, C=C, i=i, j=j)
+  nb_result = np.empty(n, dtype=np.int64)
+  py_result = np.empty(n, dtype=np.int64)
+  nb_compute_signal(n=n, sigma=sigma, index=C.index, weight=C.weight, count=C.count, signal=nb_result)
+  py_compute_signal(n=n, sigma=sigma, index=C.index, weight=C.weight, count=C.count, signal=py_result)
 
   assert ((np_result == nb_result) & (nb_result == py_result)).all()
 
@@ -41,15 +56,46 @@ def test_compute_signal (n, scale, shift):
 def test_update_state (n, scale, shift):
 
   signal = (np.random.rand(n) * scale + shift).astype(np.int32)
+  sigma = np.random.randint(0, 2, size=n).astype(np.int8)
+  rng = np.random.default_rng()
+
+  prob = nb_firing_probabilities(beta=np.inf, bound=np.abs(signal).max())
 
-  nb_sigma, nb_numActive = nb_update_state(n=n, beta=np.inf, signal=signal, numActive=0)
-  py_sigma, py_numActive = py_update_state(n=n, beta=np.inf, signal=signal, numActive=0)
+  nb_sigma, py_sigma = sigma.copy(), sigma.copy()
+  nb_flips, py_flips = np.empty(n, dtype=np.int32), np.empty(n, dtype=np.int32)
+  nb_numActive, nb_numFlips = nb_update_state(n=n, prob=prob, signal=signal, sigma=nb_sigma,
+                                              numActive=0, rng=rng, flips=nb_flips)
+  py_numActive, py_numFlips = py_update_state(n=n, prob=prob, signal=signal, sigma=py_sigma,
+                                              numActive=0, rng=rng, flips=py_flips)
+
+  assert (nb_sigma == (signal > 0)).all()
 
   assert (nb_sigma == py_sigma).all()
   assert np.sum(nb_sigma) == nb_numActive
   assert nb_numActive == py_numActive
   assert np.sum(py_sigma) == py_numActive
 
+  flipped = np.flatnonzero(nb_sigma != sigma)
+  flips = nb_flips[:nb_numFlips]
+  assert nb_numFlips == py_numFlips == flipped.size
+  assert (np.where(flips < 0, ~flips, flips) == flipped).all()
+  assert ((flips >= 0) == (nb_sigma[flipped] == 1)).all()
+
+
+@given(beta  = st.floats(min_value=0., max_value=20.),
+       bound = st.integers(min_value=0, max_value=1000),)
+@settings(deadline=None)
+def test_firing_probabilities (beta, bound):
+
+  prob = nb_firing_probabilities(beta=beta, bound=bound)
+  signal = np.arange(-bound, bound + 1)
+
+  assert prob.shape == (2*bound + 1,)
+  with np.errstate(over='ignore'):
+    expected = 1. / (1. + np.exp(-2.*beta * (signal - 0.5)))
+  assert np.allclose(prob, expected, rtol=1e-12, atol=0.)
+  assert (np.diff(prob) >= 0.).all()
+
 
 @given(n     = st.integers(min_value=1, max_value=100),
        p     = st.floats(min_value=0., max_value=1.),
@@ -60,7 +106,207 @@ def test_update_average_activity (n, p, alpha):
   sigma = np.where(np.random.rand(n) < p, 1, 0).astype(np.int8)
   avgActivity = np.random.rand(n).astype(np.float32)
 
-  nb_avgActivity = nb_update_average_activity(n=n, sigma=sigma, alpha=alpha, avgActivity=avgActivity)
-  py_avgActivity = py_update_average_activity(n=n, sigma=sigma, alpha=alpha, avgActivity=avgActivity)
+  nb_avgActivity, py_avgActivity = avgActivity.copy(), avgActivity.copy()
+  nb_update_average_activity(n=n, sigma=sigma, alpha=alpha, avgActivity=nb_avgActivity)
+  py_update_average_activity(n=n, sigma=sigma, alpha=alpha, avgActivity=py_avgActivity)
 
   assert (nb_avgActivity == py_avgActivity).all()
+
+
+@given(n      = st.integers(min_value=1, max_value=100),
+       p      = st.floats(min_value=0., max_value=1.),
+       mirror = st.booleans(),)
+@settings(deadline=None)
+def test_add_random_link (n, p, mirror):
+
+  np_C = np.where(np.random.rand(n,n) < p, 1, 0).astype(np.int8)
+  np.fill_diagonal(np_C, val=0)
+  C = AdjacencyList.from_dense(np_C)
+  dense = np_C.copy() if mirror else np.empty(shape=(0,0), dtype=np.int8)
+  rng = np.random.default_rng()
+
+  for i in range(n):
+    j = nb_add_random_link(n=n, i=i, w=-1, index=C.index, weight=C.weight, count=C.count,
+                           dense=dense, rng=rng)
+    new_C = C.toarray()
+    assert (not mirror) or (dense == new_C).all()
+    added = j >= 0
+    assert added == (np.sum(np_C[i] != 0) < n - 1)
+    assert np.sum(new_C[i] == -1) == added
+    assert (not added) or (np_C[i,j] == 0 and new_C[i,j] == -1)
+    assert (new_C[i][np_C[i] == 1] == 1).all()
+    assert new_C[i,i] == 0
+    np_C = new_C
+    C.reserve(i)
+
+
+@given(n      = st.integers(min_value=1, max_value=100),
+       p      = st.floats(min_value=0., max_value=1.),
+       mirror = st.booleans(),)
+@settings(deadline=None)
+def test_remove_random_link (n, p, mirror):
+
+  np_C = np.where(np.random.rand(n,n) < p, 1, -1).astype(np.int8)
+  np.fill_diagonal(np_C, val=0)
+  C = AdjacencyList.from_dense(np_C)
+  dense = np_C.copy() if mirror else np.empty(shape=(0,0), dtype=np.int8)
+  rng = np.random.default_rng()
+
+  for i in range(n):
+    j, removed = nb_remove_random_link(i=i, index=C.index, weight=C.weight, count=C.count,
+                                       dense=dense, rng=rng)
+    new_C = C.toarray()
+    assert (not mirror) or (dense == new_C).all()
+    assert np.sum(new_C[i] != np_C[i]) == (n > 1)
+    assert removed == np.sum(np_C[i] - new_C[i])
+    assert (j < 0) or (np_C[i,j] == removed and new_C[i,j] == 0)
+    np_C = new_C
+
+
+@given(n = st.integers(min_value=1, max_value=300),
+       p = st.floats(min_value=0., max_value=1.),)
+@settings(deadline=None)
+def test_pack_state (n, p):
+
+  sigma = np.where(np.random.rand(n) < p, 1, 0).astype(np.int8)
+  words = np.empty(-(-n // 64), dtype=np.uint64)
+  nb_pack_state(n=n, sigma=sigma, words=words)
+
+  unpacked = np.empty(n, dtype=np.int8)
+  nb_unpack_state(n=n, words=words, sigma=unpacked)
+
+  assert (unpacked == sigma).all()
+  assert nb_count_active(words) == np.sum(sigma)
+
+
+@given(n    = st.integers(min_value=1, max_value=200),
+       beta = st.floats(min_value=0., max_value=20.),
+       seed = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None)
+def test_packed_kernels (n, beta, seed):
+
+  sigma = np.random.randint(0, 2, size=n).astype(np.int8)
+  C = AdjacencyList.from_dense(np.random.randint(-1, 2, size=(n,n)).astype(np.int8))
+  words = np.empty(-(-n // 64), dtype=np.uint64)
+  nb_pack_state(n=n, sigma=sigma, words=words)
+
+  signal = np.empty(n, dtype=np.int32)
+  packed_signal = np.empty(n, dtype=np.int32)
+  nb_compute_signal(n=n, sigma=sigma, index=C.index, weight=C.weight, count=C.count, signal=signal)
+  nb_compute_signal_packed(n=n, words=words, index=C.index, weight=C.weight, count=C.count,
+                           signal=packed_signal)
+  assert (signal == packed_signal).all()
+
+  prob = nb_firing_probabilities(beta=beta, bound=n)
+  flips = np.empty(n, dtype=np.int32)
+  packed_flips = np.empty(n, dtype=np.int32)
+  numActive, numFlips = nb_update_state(n=n, prob=prob, signal=signal, sigma=sigma, numActive=0,
+                                        rng=np.random.default_rng(seed), flips=flips)
+  packed_numActive, packed_numFlips = nb_update_state_packed(n=n, prob=prob, signal=signal,
+                                                             words=words, numActive=0,
+                                                             rng=np.random.default_rng(seed),
+                                                             flips=packed_flips)
+
+  unpacked = np.empty(n, dtype=np.int8)
+  nb_unpack_state(n=n, words=words, sigma=unpacked)
+  assert (unpacked == sigma).all()
+  assert numActive == packed_numActive
+  assert numFlips == packed_numFlips
+  assert (flips[:numFlips] == packed_flips[:numFlips]).all()
+
+
+@given(n    = st.integers(min_value=1, max_value=200),
+       beta = st.floats(min_value=0., max_value=20.),
+       seed = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None)
+def test_update_state_parallel (n, beta, seed):
+
+  signal = np.random.randint(-5, 6, size=n).astype(np.int32)
+  prob = nb_firing_probabilities(beta=beta, bound=5)
+
+  nb_sigma, py_sigma = np.empty(n, dtype=np.int8), np.empty(n, dtype=np.int8)
+  nb_numActive = nb_update_state_parallel(n=n, prob=prob, signal=signal, sigma=nb_sigma,
+                                          numActive=0, rng=np.random.default_rng(seed))
+  py_numActive = py_update_state_parallel(n=n, prob=prob, signal=signal, sigma=py_sigma,
+                                          numActive=0, rng=np.random.default_rng(seed))
+
+  words = np.empty(-(-n // 64), dtype=np.uint64)
+  packed_numActive = nb_update_state_packed_parallel(n=n, prob=prob, signal=signal, words=words,
+                                                     numActive=0, rng=np.random.default_rng(seed))
+  unpacked = np.empty(n, dtype=np.int8)
+  nb_unpack_state(n=n, words=words, sigma=unpacked)
+
+  assert (nb_sigma == py_sigma).all()
+  assert (nb_sigma == unpacked).all()
+  assert nb_numActive == py_numActive == packed_numActive == np.sum(nb_sigma)
+
+
+@given(n    = st.integers(min_value=1, max_value=100),
+       p    = st.floats(min_value=0., max_value=1.),
+       seed = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=30)
+def test_update_state_active (n, p, seed):
+
+  rng = np.random.default_rng(seed)
+  sigma = (rng.random(n) < p).astype(np.int8)
+  C = AdjacencyList.from_dense(rng.integers(-1, 2, size=(n,n)).astype(np.int8))
+  Cout = C.transpose()
+  signal = np.empty(n, dtype=np.int32)
+  nb_compute_signal(n=n, sigma=sigma, index=C.index, weight=C.weight, count=C.count, signal=signal)
+
+  def update (prob, sigma):
+    active = np.zeros(shape=(2,n+1), dtype=np.int32)
+    active[0,0] = sigma.sum()
+    active[0,1:active[0,0]+1] = np.flatnonzero(sigma)
+    mark = np.zeros(n, dtype=np.int8)
+    flips = np.empty(n, dtype=np.int32)
+    numActive, numFlips = nb_update_state_active(prob=prob, signal=signal, sigma=sigma, numActive=0,
+                                                 rng=rng, flips=flips, active=active, mark=mark,
+                                                 outIndex=Cout.index, outWeight=Cout.weight,
+                                                 outCount=Cout.count)
+    assert (mark == 0).all()
+    assert (np.sort(active[0,1:numActive+1]) == np.flatnonzero(sigma)).all()
+    return numActive, flips[:numFlips]
+
+  # at beta = inf the neurons fire if and only if their signal is positive
+  new = sigma.copy()
+  numActive, flips = update(nb_firing_probabilities(beta=np.inf, bound=n), new)
+  assert (new == (signal > 0)).all()
+  assert numActive == new.sum()
+  flipped = np.flatnonzero(new != sigma)
+  assert (np.sort(np.where(flips < 0, ~flips, flips)) == flipped).all()
+  assert ((flips >= 0) == (new[np.where(flips < 0, ~flips, flips)] == 1)).all()
+
+  # otherwise each neuron fires with probability f(signal), whatever its signal
+  prob = nb_firing_probabilities(beta=0.5, bound=n)
+  samples = 2000
+  frequency = np.zeros(n)
+  for _ in range(samples):
+    new = sigma.copy()
+    update(prob, new)
+    frequency += new / samples
+
+  expected = prob[signal + n]
+  assert (np.abs(frequency - expected) < 6 * np.sqrt(expected * (1. - expected) / samples) + 1e-12).all()
+
+
+def test_kernel_cache (tmp_path):
+
+  # the second process loads the compiled kernels from the cache of the first one
+  script = (
+    'import sys\n'
+    'import socmodel.analysis, socmodel.timeseries\n'
+    'assert "matplotlib" not in sys.modules and "scipy.optimize" not in sys.modules\n'
+    'from socmodel.source.network import Network\n'
+    'from socmodel.source.numbafunc import evolve\n'
+    'Network(n=10, alpha=0.2, beta=5., tau=2, seed=0).run(evolution_steps=5, progressbar=False, engine="numba")\n'
+    'print(sum(evolve.stats.cache_hits.values()), sum(evolve.stats.cache_misses.values()))\n'
+  )
+  root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+  env = dict(os.environ, NUMBA_CACHE_DIR=str(tmp_path), PYTHONPATH=root)
+
+  runs = [subprocess.run([sys.executable, '-c', script], env=env, capture_output=True, text=True, check=True)
+          for _ in range(2)]
+
+  assert runs[0].stdout.split() == ['0', '1']
+  assert runs[1].stdout.split() == ['1', '0']
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from hypothesis import strategies as st
+from hypothesis import given, settings
+
+from socmodel.source.state import RandomState
+from socmodel.source.connectivity import RandomConnectivity
+from socmodel.source.network import Network
+from socmodel.source.recorders import DegreeRecorder
+from socmodel.source.recorders import LinkRecorder
+from socmodel.source.recorders import ActivityRecorder
+from socmodel.source.recorders import BranchingRecorder
+from socmodel.source.recorders import InDegreeRecorder
+from socmodel.source.recorders import StateRecorder
+
+
+def make_network (seed):
+  return Network(n=60, alpha=0.2, beta=10., tau=3, sigma_init=RandomState(),
+                 C_init=RandomConnectivity(pPlus=0.03, pMinus=0.03), seed=seed)
+
+
+@given(engine = st.sampled_from(['python', 'numba']),
+       steps  = st.integers(min_value=1, max_value=200),
+       stride = st.integers(min_value=1, max_value=20),
+       size   = st.integers(min_value=1, max_value=30),
+       seed   = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=30)
+def test_step_recorders (engine, steps, stride, size, seed):
+
+  net1 = make_network(seed)
+  degPlus, degMinus, branchPar = net1.run(evolution_steps=steps, progressbar=False, engine=engine)
+
+  recorders = [DegreeRecorder(stride=stride), LinkRecorder(stride=stride),
+               BranchingRecorder(stride=stride), ActivityRecorder(stride=1),
+               DegreeRecorder(stride=stride, mode='ring', size=size),
+               DegreeRecorder(stride=stride, mode='reservoir', size=size, seed=seed)]
+  net2 = make_network(seed)
+  assert net2.run(evolution_steps=steps, progressbar=False, engine=engine,
+                  recorders=recorders) == recorders
+
+  assert (net1.sigma == net2.sigma).all()
+  assert net1.linksPlus == net2.linksPlus
+
+  expected_steps = np.arange(stride, steps + 1, stride)
+  expected = np.stack([degPlus, degMinus], axis=1)[expected_steps-1]
+  links, activity = recorders[1].values, recorders[3].values
+
+  assert (recorders[0].steps == expected_steps).all()
+  if expected_steps.size > 0:
+    assert (recorders[0].values == expected).all()
+    assert (links == np.rint(expected.astype(np.float64) * net1.n)).all()
+    assert (recorders[2].values == branchPar[expected_steps-1]).all()
+  assert activity.size == steps and ((activity >= 0.) & (activity <= 1.)).all()
+
+  # the ring buffer keeps the last samples, the reservoir a subset of them
+  assert (recorders[4].steps == expected_steps[-size:]).all()
+  assert recorders[5].steps.size == min(size, expected_steps.size)
+  assert np.isin(recorders[5].steps, expected_steps).all()
+  assert np.unique(recorders[5].steps).size == recorders[5].steps.size
+  if expected_steps.size > 0:
+    assert (recorders[4].values == expected[-size:]).all()
+    assert (recorders[5].values == expected[recorders[5].steps // stride - 1]).all()
+
+
+@given(engine = st.sampled_from(['python', 'numba']),
+       steps  = st.integers(min_value=1, max_value=100),
+       stride = st.integers(min_value=1, max_value=20),
+       seed   = st.integers(min_value=0, max_value=2**31),)
+@settings(deadline=None, max_examples=20)
+def test_snapshot_recorders (engine, steps, stride, seed):
+
+  sigmas, histograms = [], []
+  net1 = make_network(seed)
+  for _ in net1.iter_run(evolution_steps=steps, chunk_size=1, progressbar=False, engine=engine):
+    if net1.step % stride == 0:
+      Kin = np.abs(net1.C.toarray()).sum(axis=1).astype(np.int64)
+      sigmas.append(net1.sigma.copy())
+      histograms.append(np.bincount(Kin, minlength=net1.n + 1))
+
+  recorders = [StateRecorder(stride=stride), InDegreeRecorder(stride=2*stride, mode='ring', size=2)]
+  net2 = make_network(seed)
+  net2.run(evolution_steps=steps, progressbar=False, engine=engine, recorders=recorders)
+
+  assert (recorders[0].steps == np.arange(stride, steps + 1, stride)).all()
+  assert (recorders[1].steps == np.arange(2*stride, steps + 1, 2*stride)[-2:]).all()
+  if sigmas:
+    assert (recorders[0].values == np.array(sigmas)).all()
+  if len(histograms) > 1:
+    assert (recorders[1].values == np.array(histograms[1::2][-2:])).all()
+
+
+def test_recorder_parameters ():
+
+  with pytest.raises(ValueError):
+    DegreeRecorder(stride=0)
+  with pytest.raises(ValueError):
+    DegreeRecorder(mode='last')
+  with pytest.raises(ValueError):
+    DegreeRecorder(mode='ring')
+  with pytest.raises(ValueError):
+    DegreeRecorder(mode='reservoir', size=0)
@@ -1,3 +1,5 @@
+import numpy as np
+
 from hypothesis import strategies as st
 from hypothesis import given
 
@@ -29,3 +31,13 @@ def test_RandomState (size, p):
   state = RandomState(p=p).get(size=size)
 
   assert ((state == 0) | (state == 1)).all()
+
+
+@given(size = st.integers(min_value=1, max_value=1e4),
+       seed = st.integers(min_value=0, max_value=2**31),)
+def test_RandomState_seed (size, seed):
+
+  state1 = RandomState().get(size=size, rng=seed)
+  state2 = RandomState().get(size=size, rng=np.random.default_rng(seed))
+
+  assert (state1 == state2).all()
@@ -0,0 +1,74 @@
+import numpy as np
+
+from socmodel.source.connectivity import RandomConnectivity
+from socmodel.source.convergence import StationarityCriterion
+from socmodel.sweep import make_grid
+from socmodel.sweep import run_point
+from socmodel.sweep import sweep
+from socmodel.sweep import continuation_sweep
+from socmodel.source.network import Network
+
+
+def test_make_grid ():
+
+  points = make_grid({'beta': [0., 1., 2.], 'tau': [1, 5]}, n=10, alpha=0.2)
+
+  assert len(points) == 6
+  assert points[1] == {'n': 10, 'alpha': 0.2, 'beta': 0., 'tau': 5}
+  assert points[-1] == {'n': 10, 'alpha': 0.2, 'beta': 2., 'tau': 5}
+
+
+def test_sweep ():
+
+  grid = {'beta': [0., 5., 10.], 'alpha': [0.2, 0.5]}
+  params = dict(n=50, tau=5, C_init=RandomConnectivity(pPlus=0.02, pMinus=0.02))
+
+  records1 = sweep(grid, evolution_steps=200, seed=42, max_workers=2, progressbar=False, **params)
+  records2 = sweep(grid, evolution_steps=200, seed=42, max_workers=3, progressbar=False, **params)
+
+  assert records1.shape == (6,)
+  assert (records1['beta'] == [0., 0., 5., 5., 10., 10.]).all()
+  assert (records1['alpha'] == [0.2, 0.5, 0.2, 0.5, 0.2, 0.5]).all()
+  assert records1['Kplus'].shape == (6, 200)
+  assert records1['branchPar'].dtype == np.float64
+
+  for name in ('Kplus', 'Kminus', 'branchPar'):
+    assert (records1[name] == records2[name]).all()
+
+
+def test_sweep_until_converged ():
+
+  grid = {'beta': [0., 10.]}
+  params = dict(n=50, alpha=0.2, tau=5, C_init=RandomConnectivity(pPlus=0.02, pMinus=0.02))
+  criterion = StationarityCriterion(window=20, atol=np.inf)
+
+  records = sweep(grid, evolution_steps=200, seed=42, max_workers=1, progressbar=False,
+                  until_converged=criterion, **params)
+
+  assert (records['converged'] == 60).all()
+  seeds = np.random.SeedSequence(42).spawn(2)
+
+  for k, point in enumerate(make_grid(grid, **params)):
+    result = run_point(point, evolution_steps=200, seed=seeds[k])
+    for name, values in zip(('Kplus', 'Kminus', 'branchPar'), result):
+      assert (records[name][k,:60] == values[:60]).all()
+      assert np.isnan(records[name][k,60:]).all()
+
+
+def test_continuation_sweep ():
+
+  betas = [10., 8., 6.]
+  params = dict(n=50, alpha=0.2, tau=5, C_init=RandomConnectivity(pPlus=0.02, pMinus=0.02))
+
+  records = continuation_sweep('beta', betas, evolution_steps=100, seed=7, progressbar=False, **params)
+  seeds = np.random.SeedSequence(7).spawn(3)
+
+  assert (records['beta'] == betas).all()
+
+  net = None
+  for k, beta in enumerate(betas):
+    net = Network(beta=beta, seed=seeds[k], **params) if net is None else net.clone(beta=beta, seed=seeds[k])
+    degPlus, degMinus, branchPar = net.run(evolution_steps=100, progressbar=False, engine='numba')
+    assert (records['Kplus'][k] == degPlus).all()
+    assert (records['Kminus'][k] == degMinus).all()
+    assert (records['branchPar'][k] == branchPar).all()
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from hypothesis import strategies as st
+from hypothesis import given, settings
+
+from socmodel.timeseries import block_moments
+from socmodel.timeseries import regression_slopes
+from socmodel.timeseries import branching_ratio
+from socmodel.timeseries import mr_estimator
+from socmodel.timeseries import autocorrelation
+from socmodel.timeseries import integrated_autocorrelation_time
+from socmodel.timeseries import block_bootstrap
+
+
+def ar1 (m, size, seed, mean=10.):
+
+  # x[t+1] - mean = m (x[t] - mean) + noise: r_k = m^k and tau_int = (1 + m) / (1 - m)
+  rng = np.random.default_rng(seed)
+  noise = rng.normal(size=size)
+  x = np.empty(size)
+  x[0] = noise[0] / np.sqrt(1. - m**2)
+  for t in range(1, size):
+    x[t] = m * x[t-1] + noise[t]
+  return x + mean
+
+
+@given(size       = st.integers(min_value=2, max_value=500),
+       kmax       = st.integers(min_value=1, max_value=10),
+       block_size = st.integers(min_value=11, max_value=200),)
+@settings(deadline=None)
+def test_block_moments (size, kmax, block_size):
+
+  x = np.random.rand(size)
+  moments = block_moments(x, kmax=kmax, block_size=block_size)
+
+  assert moments.shape == (-(-size // block_size), 5, kmax)
+  for b, start in enumerate(range(0, size, block_size)):
+    block = x[start:start+block_size]
+    for k in range(1, kmax + 1):
+      a, c = block[:max(block.size-k, 0)], block[k:]
+      expected = [a.size, a.sum(), c.sum(), (a*a).sum(), (a*c).sum()]
+      assert np.allclose(moments[b,:,k-1], expected)
+
+  with pytest.raises(ValueError):
+    block_moments(x, kmax=0)
+  with pytest.raises(ValueError):
+    block_moments(x, kmax=10, block_size=10)
+
+
+def test_estimators (tmp_path):
+
+  m = 0.9
+  x = ar1(m, size=200000, seed=0)
+
+  # the estimators read a memory-mapped copy block by block
+  path = tmp_path / 'activity.npy'
+  np.save(path, x)
+  mapped = np.load(path, mmap_mode='r')
+
+  rk = regression_slopes(block_moments(mapped, kmax=5, block_size=10000).sum(axis=0))
+  assert np.allclose(rk, m**np.arange(1, 6), atol=0.01)
+
+  ratios = branching_ratio(mapped, window=20000)
+  assert ratios.shape == (10,)
+  assert np.allclose(ratios, m, atol=0.02)
+
+  # subsampling scales the r_k by b but leaves the MR estimate of m unbiased
+  rng = np.random.default_rng(1)
+  subsampled = 0.1 * x + rng.normal(size=x.size)
+  result = mr_estimator(subsampled, kmax=20, block_size=10000)
+  assert abs(result['m'] - m) < 0.02
+  assert result['b'] < 0.5
+  assert branching_ratio(subsampled, window=x.size)[0] < 0.5
+
+  rho = autocorrelation(mapped, max_lag=10, block_size=10000)
+  assert rho[0] == 1.
+  assert np.allclose(rho, m**np.arange(11), atol=0.02)
+
+  tau, M = integrated_autocorrelation_time(mapped, max_lag=500, block_size=10000)
+  assert abs(tau - (1. + m) / (1. - m)) < 2.
+  assert M >= 5 * tau - 1
+
+
+def test_block_bootstrap ():
+
+  m, size = 0.9, 200000
+  x = ar1(m, size=size, seed=2)
+
+  # the standard error of the mean of an AR(1) process is sqrt(tau_int var / size)
+  mean, error, samples = block_bootstrap(x, block_size=2000, num_samples=500, seed=0)
+  expected = np.sqrt((1. + m) / (1. - m) / (1. - m**2) / size)
+
+  assert mean == pytest.approx(x.mean())
+  assert samples.shape == (500,)
+  assert 0.7 * expected < error < 1.3 * expected
+
+  ratio, error, _ = block_bootstrap(x, block_size=2000, estimator='branching_ratio', num_samples=200, seed=0)
+  assert abs(ratio - m) < 3 * error + 0.005
+  assert 0. < error < 0.01
+
+  ratio, error, _ = block_bootstrap(x, block_size=2000, estimator='mr', kmax=5, num_samples=50, seed=0)
+  assert abs(ratio - m) < 3 * error + 0.005
+
+  with pytest.raises(ValueError):
+    block_bootstrap(x, block_size=2000, estimator='median')
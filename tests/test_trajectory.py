@@ -0,0 +1,65 @@
+import numpy as np
+
+from hypothesis import strategies as st
+from hypothesis import given, settings
+
+from socmodel.source.trajectory import TrajectoryWriter
+from socmodel.source.trajectory import load_trajectory
+
+
+@given(sizes = st.lists(st.integers(min_value=0, max_value=100), max_size=10),)
+@settings(deadline=None)
+def test_TrajectoryWriter (tmp_path_factory, sizes):
+
+  path = tmp_path_factory.mktemp('trajectory') / 'run.npy'
+  chunks = [np.random.rand(3, size).astype(np.float32) for size in sizes]
+
+  with TrajectoryWriter(path) as writer:
+    for k, chunk in enumerate(chunks):
+      writer.append(*chunk)
+      assert load_trajectory(path).shape == (sum(sizes[:k+1]),)
+
+  trajectory = load_trajectory(path)
+  expected = np.concatenate([np.zeros((3,0), dtype=np.float32)] + chunks, axis=1)
+
+  assert trajectory.dtype.names == ('Kplus', 'Kminus', 'branchPar')
+  assert trajectory.dtype['branchPar'] == np.float64
+  for field, values in zip(trajectory.dtype.names, expected):
+    assert (trajectory[field] == values).all()
+
+  with TrajectoryWriter(path, mode='a') as writer:
+    writer.append(*expected[:, :10])
+
+  assert load_trajectory(path).shape == (sum(sizes) + min(sum(sizes), 10),)
+
+
+def test_truncate (tmp_path):
+
+  path = tmp_path / 'run.npy'
+  chunk = np.random.rand(3, 50).astype(np.float32)
+
+  with TrajectoryWriter(path) as writer:
+    writer.append(*chunk)
+    writer.truncate(20)
+    writer.append(*chunk)
+
+  trajectory = load_trajectory(path)
+
+  assert trajectory.shape == (70,)
+  assert (trajectory['Kplus'][:20] == chunk[0,:20]).all()
+  assert (trajectory['Kplus'][20:] == chunk[0]).all()
+
+
+def test_header (tmp_path):
+
+  path = tmp_path / 'run.npy'
+
+  with TrajectoryWriter(path, fields=('a', 'b'), dtype=np.float32) as writer:
+    writer.append(np.arange(5), np.arange(5))
+
+  with open(path, 'rb') as file:
+    np.lib.format.read_magic(file)
+    shape, _, dtype = np.lib.format.read_array_header_1_0(file)
+
+  assert shape == (5,)
+  assert dtype == np.dtype([('a', np.float32), ('b', np.float32)])